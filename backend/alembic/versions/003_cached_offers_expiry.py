@@ -0,0 +1,28 @@
+"""Indexes for cached offer expiry sweeps
+
+Revision ID: 003_cached_offers_expiry
+Revises: 002_add_food_preference
+Create Date: 2024-01-03 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '003_cached_offers_expiry'
+down_revision: Union[str, None] = '002_add_food_preference'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Sweeper scans expired offers in expire_at order
+    op.create_index(op.f('ix_cached_offers_expire_at'), 'cached_offers', ['expire_at'], unique=False)
+    # Sweeper skips offers referenced by a booking (NOT EXISTS lookup by offer_id)
+    op.create_index(op.f('ix_bookings_offer_id'), 'bookings', ['offer_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_bookings_offer_id'), table_name='bookings')
+    op.drop_index(op.f('ix_cached_offers_expire_at'), table_name='cached_offers')
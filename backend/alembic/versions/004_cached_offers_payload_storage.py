@@ -0,0 +1,50 @@
+"""Compress cached offer payloads and keep them out of the main heap
+
+Revision ID: 004_offer_payload_storage
+Revises: 003_cached_offers_expiry
+Create Date: 2024-01-04 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '004_offer_payload_storage'
+down_revision: Union[str, None] = '003_cached_offers_expiry'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Rows larger than this have their payload moved to TOAST, so summary scans only read
+# the narrow columns. The default (~2 KB) keeps most offer payloads inline.
+TOAST_TUPLE_TARGET = 256
+
+
+def upgrade() -> None:
+    # lz4 is faster to compress and decompress than pglz; available from PostgreSQL 14
+    # with lz4 support compiled in. Only newly written payloads are recompressed.
+    op.execute("""
+        DO $$
+        BEGIN
+            IF current_setting('server_version_num')::int >= 140000 THEN
+                ALTER TABLE cached_offers ALTER COLUMN payload SET COMPRESSION lz4;
+            END IF;
+        EXCEPTION WHEN feature_not_supported OR invalid_parameter_value THEN
+            RAISE NOTICE 'lz4 compression unavailable, keeping default payload compression';
+        END
+        $$
+    """)
+    op.execute(f"ALTER TABLE cached_offers SET (toast_tuple_target = {TOAST_TUPLE_TARGET})")
+
+
+def downgrade() -> None:
+    op.execute("ALTER TABLE cached_offers RESET (toast_tuple_target)")
+    op.execute("""
+        DO $$
+        BEGIN
+            IF current_setting('server_version_num')::int >= 140000 THEN
+                ALTER TABLE cached_offers ALTER COLUMN payload SET COMPRESSION default;
+            END IF;
+        END
+        $$
+    """)
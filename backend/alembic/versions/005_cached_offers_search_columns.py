@@ -0,0 +1,54 @@
+"""Derived duration, stops and passenger mix columns for cached offer search
+
+Revision ID: 005_offer_search_columns
+Revises: 004_offer_payload_storage
+Create Date: 2024-01-05 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '005_offer_search_columns'
+down_revision: Union[str, None] = '004_offer_payload_storage'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('cached_offers', sa.Column('duration_minutes', sa.Integer(), nullable=True))
+    op.add_column('cached_offers', sa.Column('stops', sa.Integer(), nullable=True))
+    op.add_column('cached_offers', sa.Column('passenger_mix', sa.String(), nullable=True))
+
+    # Backfill existing offers from their timestamps and stored payloads
+    op.execute("""
+        UPDATE cached_offers SET
+            duration_minutes = GREATEST((EXTRACT(EPOCH FROM arrive_ts - depart_ts) / 60)::int, 0),
+            stops = (
+                SELECT GREATEST(COUNT(*) - 1 + COALESCE(SUM((s->>'numberOfStops')::int), 0), 0)
+                FROM json_array_elements(payload->'itineraries'->0->'segments') s
+            ),
+            passenger_mix = (
+                SELECT format(
+                    '%s-%s-%s',
+                    COUNT(*) FILTER (WHERE COALESCE(t->>'travelerType', 'ADULT') NOT IN ('CHILD', 'HELD_INFANT', 'SEATED_INFANT')),
+                    COUNT(*) FILTER (WHERE t->>'travelerType' = 'CHILD'),
+                    COUNT(*) FILTER (WHERE t->>'travelerType' IN ('HELD_INFANT', 'SEATED_INFANT'))
+                )
+                FROM json_array_elements(payload->'travelerPricings') t
+            )
+    """)
+
+    op.alter_column('cached_offers', 'duration_minutes', nullable=False)
+    op.alter_column('cached_offers', 'stops', nullable=False)
+    op.alter_column('cached_offers', 'passenger_mix', nullable=False)
+    op.create_index('ix_cached_offers_route_depart', 'cached_offers', ['origin', 'destination', 'depart_ts'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_cached_offers_route_depart', table_name='cached_offers')
+    op.drop_column('cached_offers', 'passenger_mix')
+    op.drop_column('cached_offers', 'stops')
+    op.drop_column('cached_offers', 'duration_minutes')
@@ -0,0 +1,32 @@
+"""Shared per-second Amadeus request budget
+
+Revision ID: 006_amadeus_rate_budget
+Revises: 005_offer_search_columns
+Create Date: 2024-01-06 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '006_amadeus_rate_budget'
+down_revision: Union[str, None] = '005_offer_search_columns'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'amadeus_rate_budget',
+        sa.Column('window_second', sa.BigInteger(), nullable=False),
+        sa.Column('used', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('window_second')
+    )
+    # Counters only matter for the current second; skip WAL for this hot table
+    op.execute('ALTER TABLE amadeus_rate_budget SET UNLOGGED')
+
+
+def downgrade() -> None:
+    op.drop_table('amadeus_rate_budget')
@@ -0,0 +1,39 @@
+"""Append-only flight search log
+
+Revision ID: 007_search_log
+Revises: 006_amadeus_rate_budget
+Create Date: 2024-01-07 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '007_search_log'
+down_revision: Union[str, None] = '006_amadeus_rate_budget'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'search_log',
+        sa.Column('id', sa.BigInteger(), autoincrement=True, nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('origin', sa.String(), nullable=False),
+        sa.Column('destination', sa.String(), nullable=False),
+        sa.Column('departure_date', sa.Date(), nullable=False),
+        sa.Column('passenger_mix', sa.String(), nullable=False),
+        sa.Column('source', sa.String(), nullable=False),
+        sa.Column('offer_count', sa.Integer(), nullable=False),
+        sa.Column('latency_ms', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_search_log_created_at', 'search_log', ['created_at'], unique=False, postgresql_using='brin')
+
+
+def downgrade() -> None:
+    op.drop_index('ix_search_log_created_at', table_name='search_log')
+    op.drop_table('search_log')
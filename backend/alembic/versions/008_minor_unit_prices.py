@@ -0,0 +1,92 @@
+"""Integer minor-unit prices and an FX rates table
+
+Revision ID: 008_minor_unit_prices
+Revises: 007_search_log
+Create Date: 2024-01-08 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.services.fx_rate_service import seed_fx_rates
+
+# revision identifiers, used by Alembic.
+revision: str = '008_minor_unit_prices'
+down_revision: Union[str, None] = '007_search_log'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'fx_rates',
+        sa.Column('currency', sa.String(length=3), nullable=False),
+        sa.Column('rate', sa.Numeric(precision=18, scale=8), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False, server_default=sa.text('now()')),
+        sa.PrimaryKeyConstraint('currency')
+    )
+    # INR, the rate previously hard-coded for USD, and any rates given in FX_SEED_RATES
+    seed_fx_rates(op.get_bind())
+
+    # Every price is converted with a stored rate; there is no safe default for a missing one
+    unknown = op.get_bind().execute(sa.text("""
+        SELECT DISTINCT UPPER(COALESCE(currency, 'INR')) AS currency FROM cached_offers
+        UNION
+        SELECT DISTINCT UPPER(COALESCE(currency, 'INR')) FROM bookings
+        EXCEPT
+        SELECT currency FROM fx_rates
+        ORDER BY currency
+    """)).scalars().all()
+    if unknown:
+        raise RuntimeError(
+            f"No FX rate for {', '.join(unknown)}: set FX_SEED_RATES (e.g. FX_SEED_RATES=\"EUR=90.5\", "
+            "INR per unit) and run the migration again"
+        )
+
+    # cached_offers: keep the quoted price, store the INR price in paise
+    op.add_column('cached_offers', sa.Column('price_minor', sa.BigInteger(), nullable=True))
+    op.add_column('cached_offers', sa.Column('source_currency', sa.String(), nullable=True))
+    op.add_column('cached_offers', sa.Column('source_price_minor', sa.BigInteger(), nullable=True))
+    op.execute("""
+        UPDATE cached_offers c SET
+            source_currency = UPPER(COALESCE(c.currency, 'INR')),
+            source_price_minor = ROUND(c.price::numeric * 100),
+            price_minor = ROUND(c.price::numeric * (
+                SELECT f.rate FROM fx_rates f WHERE f.currency = UPPER(COALESCE(c.currency, 'INR'))
+            ) * 100),
+            currency = 'INR'
+    """)
+    op.alter_column('cached_offers', 'price_minor', nullable=False)
+    op.alter_column('cached_offers', 'source_currency', nullable=False)
+    op.alter_column('cached_offers', 'source_price_minor', nullable=False)
+    op.drop_column('cached_offers', 'price')
+
+    # bookings: totals in INR paise
+    op.add_column('bookings', sa.Column('total_amount_minor', sa.BigInteger(), nullable=True))
+    op.execute("""
+        UPDATE bookings b SET
+            total_amount_minor = ROUND(b.total_amount::numeric * (
+                SELECT f.rate FROM fx_rates f WHERE f.currency = UPPER(COALESCE(b.currency, 'INR'))
+            ) * 100),
+            currency = 'INR'
+    """)
+    op.alter_column('bookings', 'total_amount_minor', nullable=False)
+    op.drop_column('bookings', 'total_amount')
+
+
+def downgrade() -> None:
+    op.add_column('bookings', sa.Column('total_amount', sa.Float(), nullable=True))
+    op.execute("UPDATE bookings SET total_amount = total_amount_minor / 100.0")
+    op.alter_column('bookings', 'total_amount', nullable=False)
+    op.drop_column('bookings', 'total_amount_minor')
+
+    op.add_column('cached_offers', sa.Column('price', sa.Float(), nullable=True))
+    op.execute("UPDATE cached_offers SET price = price_minor / 100.0")
+    op.alter_column('cached_offers', 'price', nullable=False)
+    op.drop_column('cached_offers', 'source_price_minor')
+    op.drop_column('cached_offers', 'source_currency')
+    op.drop_column('cached_offers', 'price_minor')
+
+    op.drop_table('fx_rates')
@@ -0,0 +1,41 @@
+"""Return-journey columns for round-trip cached offers
+
+Revision ID: 009_round_trip_offers
+Revises: 008_minor_unit_prices
+Create Date: 2024-01-09 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '009_round_trip_offers'
+down_revision: Union[str, None] = '008_minor_unit_prices'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('cached_offers', sa.Column('return_depart_ts', sa.DateTime(), nullable=True))
+    op.add_column('cached_offers', sa.Column('return_arrive_ts', sa.DateTime(), nullable=True))
+    op.add_column('cached_offers', sa.Column('return_flight_no', sa.String(), nullable=True))
+
+    # Round trips cached before this revision only had their outbound journey parsed
+    op.execute("""
+        UPDATE cached_offers SET
+            return_depart_ts = replace(payload->'itineraries'->1->'segments'->0->'departure'->>'at', 'Z', '')::timestamp,
+            return_arrive_ts = replace(payload->'itineraries'->1->'segments'->-1->'arrival'->>'at', 'Z', '')::timestamp,
+            return_flight_no = concat(
+                payload->'itineraries'->1->'segments'->0->>'carrierCode',
+                payload->'itineraries'->1->'segments'->0->>'number'
+            )
+        WHERE json_array_length(payload->'itineraries') > 1
+    """)
+
+
+def downgrade() -> None:
+    op.drop_column('cached_offers', 'return_flight_no')
+    op.drop_column('cached_offers', 'return_arrive_ts')
+    op.drop_column('cached_offers', 'return_depart_ts')
@@ -0,0 +1,29 @@
+"""Offer source column separating upstream offers from composed ones
+
+Revision ID: 010_offer_source
+Revises: 009_round_trip_offers
+Create Date: 2024-01-10 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '010_offer_source'
+down_revision: Union[str, None] = '009_round_trip_offers'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        'cached_offers',
+        sa.Column('offer_source', sa.String(), nullable=False, server_default='upstream'),
+    )
+    op.execute("UPDATE cached_offers SET offer_source = 'paired' WHERE payload->>'source' = 'PAIRED'")
+
+
+def downgrade() -> None:
+    op.drop_column('cached_offers', 'offer_source')
@@ -0,0 +1,55 @@
+"""Cheapest cached fare per route, departure day and passenger mix
+
+Revision ID: 011_route_min_prices
+Revises: 010_offer_source
+Create Date: 2024-01-11 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '011_route_min_prices'
+down_revision: Union[str, None] = '010_offer_source'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'route_min_prices',
+        sa.Column('origin', sa.String(), nullable=False),
+        sa.Column('destination', sa.String(), nullable=False),
+        sa.Column('passenger_mix', sa.String(), nullable=False),
+        sa.Column('depart_date', sa.Date(), nullable=False),
+        sa.Column('price_minor', sa.BigInteger(), nullable=False),
+        sa.Column('currency', sa.String(), nullable=False),
+        sa.Column('offer_id', sa.String(), nullable=False),
+        sa.Column('airline', sa.String(), nullable=False),
+        sa.Column('expire_at', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('origin', 'destination', 'passenger_mix', 'depart_date')
+    )
+    op.create_index(
+        'ix_route_min_prices_origin_date', 'route_min_prices',
+        ['origin', 'passenger_mix', 'depart_date'], unique=False,
+    )
+    # Seed from the one-way offers already cached
+    op.execute("""
+        INSERT INTO route_min_prices
+            (origin, destination, passenger_mix, depart_date, price_minor, currency,
+             offer_id, airline, expire_at, updated_at)
+        SELECT DISTINCT ON (origin, destination, passenger_mix, depart_ts::date)
+               origin, destination, passenger_mix, depart_ts::date, price_minor, currency,
+               offer_id, airline, expire_at, now() AT TIME ZONE 'utc'
+        FROM cached_offers
+        WHERE return_depart_ts IS NULL AND expire_at > now() AT TIME ZONE 'utc'
+        ORDER BY origin, destination, passenger_mix, depart_ts::date, price_minor, offer_id
+    """)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_route_min_prices_origin_date', table_name='route_min_prices')
+    op.drop_table('route_min_prices')
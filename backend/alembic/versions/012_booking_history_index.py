@@ -0,0 +1,34 @@
+"""Booking history index on (user_email, created_at, booking_id)
+
+Revision ID: 012_booking_history_index
+Revises: 011_route_min_prices
+Create Date: 2024-01-12 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '012_booking_history_index'
+down_revision: Union[str, None] = '011_route_min_prices'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Keyset pages compare (created_at, booking_id) tuples, which NULLs would break
+    op.execute("UPDATE bookings SET created_at = now() AT TIME ZONE 'utc' WHERE created_at IS NULL")
+    op.alter_column('bookings', 'created_at', existing_type=sa.DateTime(), nullable=False)
+    op.create_index(
+        'ix_bookings_user_created', 'bookings', ['user_email', 'created_at', 'booking_id'], unique=False,
+    )
+    # Covered by the leading column of the new index
+    op.drop_index(op.f('ix_bookings_user_email'), table_name='bookings')
+
+
+def downgrade() -> None:
+    op.create_index(op.f('ix_bookings_user_email'), 'bookings', ['user_email'], unique=False)
+    op.drop_index('ix_bookings_user_created', table_name='bookings')
+    op.alter_column('bookings', 'created_at', existing_type=sa.DateTime(), nullable=True)
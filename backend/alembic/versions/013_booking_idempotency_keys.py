@@ -0,0 +1,39 @@
+"""Idempotency keys of booking requests
+
+Revision ID: 013_booking_idempotency_keys
+Revises: 012_booking_history_index
+Create Date: 2024-01-13 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '013_booking_idempotency_keys'
+down_revision: Union[str, None] = '012_booking_history_index'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'booking_idempotency_keys',
+        sa.Column('user_email', sa.String(), nullable=False),
+        sa.Column('idempotency_key', sa.String(), nullable=False),
+        sa.Column('request_hash', sa.String(length=64), nullable=False),
+        sa.Column('booking_id', sa.String(), nullable=True),
+        sa.Column('response', sa.JSON(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['booking_id'], ['bookings.booking_id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_email', 'idempotency_key')
+    )
+    op.create_index(
+        op.f('ix_booking_idempotency_keys_created_at'), 'booking_idempotency_keys', ['created_at'], unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_booking_idempotency_keys_created_at'), table_name='booking_idempotency_keys')
+    op.drop_table('booking_idempotency_keys')
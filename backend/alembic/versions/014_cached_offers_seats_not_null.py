@@ -0,0 +1,27 @@
+"""Seat counts of cached offers are never NULL
+
+Revision ID: 014_cached_offers_seats_not_null
+Revises: 013_booking_idempotency_keys
+Create Date: 2024-01-14 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '014_cached_offers_seats_not_null'
+down_revision: Union[str, None] = '013_booking_idempotency_keys'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # An offer whose seat count upstream sent as null is not bookable, rather than unlimited
+    op.execute("UPDATE cached_offers SET seats = 0 WHERE seats IS NULL")
+    op.alter_column('cached_offers', 'seats', existing_type=sa.Integer(), nullable=False)
+
+
+def downgrade() -> None:
+    op.alter_column('cached_offers', 'seats', existing_type=sa.Integer(), nullable=True)
@@ -9,6 +9,7 @@ from .offer_selection_agent import offer_selection_agent
 from .slot_filling_agent import slot_filling_agent
 from .payment_agent import payment_agent
 from .booking_confirmation_agent import booking_confirmation_agent
+from .exploration_agent import exploration_agent
 from .router_agent import router_agent
 from .fallback_agent import fallback_agent
 
@@ -21,6 +22,7 @@ __all__ = [
     "slot_filling_agent",
     "payment_agent",
     "booking_confirmation_agent",
+    "exploration_agent",
     "router_agent",
     "fallback_agent",
 ]
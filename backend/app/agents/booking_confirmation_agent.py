@@ -11,6 +11,9 @@ from .base import AgentState
 BACKEND_URL = os.getenv("BACKEND_URL", "http://localhost:8000")
 logger = logging.getLogger(__name__)
 
+# Most recent bookings listed in a chat reply; the rest are summarized as counts
+BOOKING_HISTORY_PAGE_SIZE = 5
+
 
 async def booking_confirmation_agent(state: AgentState) -> AgentState:
     """Provide booking confirmation details or booking history"""
@@ -47,30 +50,27 @@ async def booking_confirmation_agent(state: AgentState) -> AgentState:
         try:
             async with httpx.AsyncClient() as client:
                 response = await client.get(
-                    f"{BACKEND_URL}/api/booking/user/{user_email}",
+                    f"{BACKEND_URL}/api/booking/user/{user_email}/history",
+                    params={"limit": BOOKING_HISTORY_PAGE_SIZE},
                     timeout=8.0,  # Reduced from 10.0 to 8.0
                 )
                 
                 if response.status_code == 200:
-                    bookings = response.json()
+                    history = response.json()
+                    bookings = history.get("bookings", [])
                     
-                    if not bookings or len(bookings) == 0:
+                    if not bookings:
                         state["response"] = "You don't have any bookings yet. Would you like to search for flights?"
                     else:
                         # Format bookings with clean spacing and structure
-                        booking_count = len(bookings)
+                        booking_count = history.get("total", len(bookings))
                         booking_list = []
                         
                         for i, booking in enumerate(bookings, 1):
-                            # Convert USD to INR if needed (for backward compatibility)
+                            # Amounts are stored in INR already
                             booking_currency = booking.get("currency", "INR")
                             booking_amount = booking.get("total_amount", 0)
                             
-                            if booking_currency == "USD":
-                                booking_amount = booking_amount * 83  # Convert to INR
-                                booking_currency = "INR"
-                                logger.info(f"Converted USD booking {booking['booking_id']} to INR")
-                            
                             currency_symbol = "₹" if booking_currency == "INR" else "$"
                             
                             # Parse created_at if it's a string
@@ -91,11 +91,15 @@ async def booking_confirmation_agent(state: AgentState) -> AgentState:
                                 else:
                                     passenger_names.append(str(passenger))
                             
+                            route = ""
+                            if booking.get("origin") and booking.get("destination"):
+                                route = f"\n• Route: {booking.get('origin_city') or booking['origin']} → {booking.get('destination_city') or booking['destination']}"
+                            
                             # Format each booking with clean structure
                             booking_text = f"""📘 Booking {i}
 
 • Booking ID: {booking['booking_id']}
-• Date: {created_at}
+• Date: {created_at}{route}
 • Passenger: {', '.join(passenger_names)}
 • Total: {currency_symbol}{booking_amount:.2f} {booking_currency}
 • Status: {booking.get('status', 'confirmed')}"""
@@ -105,9 +109,16 @@ async def booking_confirmation_agent(state: AgentState) -> AgentState:
                         # Combine all bookings with double line breaks between them
                         bookings_text = "\n\n".join(booking_list)
                         
+                        # Only the first page is listed; the rest are counted
+                        status_counts = history.get("status_counts", {})
+                        breakdown = ", ".join(f"{count} {status}" for status, count in sorted(status_counts.items()))
+                        shown = ""
+                        if booking_count > len(bookings):
+                            shown = f"\nShowing your {len(bookings)} most recent. See all of them under My Bookings.\n"
+                        
                         # Construct final response with header and footer
-                        state["response"] = f"""📒 Your Booking History ({booking_count} booking{'s' if booking_count != 1 else ''})
-
+                        state["response"] = f"""📒 Your Booking History ({booking_count} booking{'s' if booking_count != 1 else ''}{': ' + breakdown if breakdown else ''})
+{shown}
 {bookings_text}
 
 Would you like details about a specific booking?"""
@@ -0,0 +1,142 @@
+"""
+Exploration Agent
+Answers open-ended fare questions ("cheapest weekend trip from HYD", "where can I fly
+under 5000", "when is Delhi cheapest") from the backend's precomputed cheapest fares
+"""
+import os
+import re
+from datetime import date
+import httpx
+import logging
+from .base import AgentState
+from .flight_search_agent import normalize_airport_code
+
+BACKEND_URL = os.getenv("BACKEND_URL", "http://localhost:8000")
+logger = logging.getLogger(__name__)
+
+# Destinations or days listed in one answer
+EXPLORE_RESULTS_SHOWN = 8
+# "under 5000", "below ₹4,500", "budget of rs 6000", "within INR 3000"
+BUDGET_PATTERN = re.compile(
+    r"(?:under|below|less than|within|up to|max(?:imum)?|budget(?: of)?)\s*(?:rs\.?|inr|₹)?\s*(\d[\d,]*)",
+    re.IGNORECASE,
+)
+
+
+def extract_budget(message: str):
+    """Budget in rupees mentioned in the user's message, or None"""
+    match = BUDGET_PATTERN.search(message or "")
+    return float(match.group(1).replace(",", "")) if match else None
+
+
+def _budget(slots: dict, message: str):
+    try:
+        budget = float(slots.get("max_budget")) if slots.get("max_budget") else None
+    except (ValueError, TypeError):
+        budget = None
+    return budget if budget else extract_budget(message)
+
+
+def _day(value: str) -> str:
+    """2026-11-20 -> Fri 20 Nov"""
+    return date.fromisoformat(value).strftime("%a %d %b")
+
+
+async def exploration_agent(state: AgentState) -> AgentState:
+    """Cheapest destinations from an origin, or cheapest days of one route"""
+    slots = state["slots"]
+    message = state.get("user_message", "")
+    # Only a destination named in this message narrows the question to one route; one
+    # left over from an earlier search would hide every other destination
+    message_slots = (state.get("intent") or {}).get("slots") or {}
+    origin = normalize_airport_code(slots.get("origin"))
+    destination = normalize_airport_code(message_slots.get("destination"))
+    if not origin:
+        state["response"] = "Where would you like to fly from? Tell me a city or airport and, optionally, a budget or dates."
+        return state
+
+    params = {"origin": origin}
+    for key in ("date_from", "date_to"):
+        if message_slots.get(key):
+            params[key] = message_slots[key]
+    try:
+        adults = int(slots.get("adults") or 1)
+    except (ValueError, TypeError):
+        adults = 1
+    params["adults"] = max(adults, 1)
+
+    budget = _budget(message_slots, message)
+    weekends_only = "weekend" in message.lower()
+    if destination:
+        path = "/api/flight/calendar"
+        params["destination"] = destination
+    else:
+        path = "/api/flight/explore"
+        params["limit"] = EXPLORE_RESULTS_SHOWN
+        params["weekends_only"] = weekends_only
+        if budget:
+            params["max_price"] = budget
+
+    try:
+        logger.info(f"Exploration Agent: Calling API - {BACKEND_URL}{path} with {params}")
+        async with httpx.AsyncClient() as client:
+            response = await client.get(f"{BACKEND_URL}{path}", params=params, timeout=10.0)
+        if response.status_code != 200:
+            detail = ""
+            try:
+                detail = response.json().get("detail", "")
+            except ValueError:
+                pass
+            logger.error(f"Exploration Agent: API error {response.status_code} - {detail}")
+            state["response"] = f"Sorry, I couldn't look up fares right now. {detail or 'Please try again.'}"
+            return state
+        data = response.json()
+    except Exception as e:
+        logger.error(f"Exploration Agent: Exception occurred: {str(e)}", exc_info=True)
+        state["response"] = "Sorry, I couldn't look up fares right now. Please try again."
+        return state
+
+    period = f"{_day(data['date_from'])} - {_day(data['date_to'])}"
+    if destination:
+        fares = data.get("fares", [])
+        if not fares:
+            state["response"] = (
+                f"I don't have fares from {origin} to {destination} for {period} yet. "
+                f"Ask me to search a specific date and I'll check live availability."
+            )
+            return state
+        cheapest = sorted(fares, key=lambda fare: (fare["price"], fare["depart_date"]))[:EXPLORE_RESULTS_SHOWN]
+        lines = "\n".join(
+            f"{i+1}. {_day(fare['depart_date'])} - ₹{fare['price']:,.2f} ({fare['airline']})"
+            for i, fare in enumerate(cheapest)
+        )
+        state["response"] = (
+            f"📅 Cheapest days to fly {origin} to {destination} ({period}):\n\n{lines}\n\n"
+            f"Tell me a date and I'll show you the flights."
+        )
+        return state
+
+    destinations = data.get("destinations", [])
+    conditions = []
+    if budget:
+        conditions.append(f"under ₹{budget:,.0f}")
+    if weekends_only:
+        conditions.append("departing Friday or Saturday")
+    wanted = f" {' '.join(conditions)}" if conditions else ""
+    if not destinations:
+        state["response"] = (
+            f"I don't have any fares from {origin}{wanted} for {period} yet. "
+            f"Try a bigger budget or other dates, or ask me to search a specific route."
+        )
+        return state
+    lines = "\n".join(
+        f"{i+1}. {fare.get('city') or fare['destination']} ({fare['destination']}) - "
+        f"₹{fare['price']:,.2f} on {_day(fare['depart_date'])} ({fare['airline']})"
+        for i, fare in enumerate(destinations)
+    )
+    state["response"] = (
+        f"🌍 Where you can fly from {origin}{wanted} ({period}):\n\n{lines}\n\n"
+        f"Fares are the cheapest we've seen recently and can change. "
+        f"Tell me a destination and date and I'll search the flights."
+    )
+    return state
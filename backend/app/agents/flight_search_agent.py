@@ -3,6 +3,7 @@ Flight Search Agent
 Searches for flights using backend API
 """
 import os
+import re
 import httpx
 import logging
 from .base import AgentState
@@ -205,6 +206,64 @@ def normalize_airport_code(code_or_city: str) -> str:
     return CITY_TO_AIRPORT.get(code_or_city, code_or_city.upper())
 
 
+# Phrases that map onto the search API's sort and filter options
+SORT_PHRASES = {
+    "cheapest": "price",
+    "lowest price": "price",
+    "earliest": "departure",
+    "first flight": "departure",
+    "fastest": "duration",
+    "shortest": "duration",
+}
+# Phrases asking for a trade-off between price, time and stops: a ranking profile
+RANK_PHRASES = {
+    "best": "best",
+    "good value": "best",
+    "convenient": "convenient",
+    "comfortable": "convenient",
+}
+NON_STOP_PHRASES = ["non-stop", "nonstop", "non stop", "direct"]
+TIME_OF_DAY_WINDOWS = {
+    "morning": ("05:00", "11:59"),
+    "afternoon": ("12:00", "16:59"),
+    "evening": ("17:00", "20:59"),
+    "night": ("21:00", "23:59"),
+}
+# A negation up to two words before a phrase, in the same clause, rules the phrase out:
+# "not the cheapest", "don't want a direct flight", "no night flights"
+NEGATED = re.compile(r"(?:\b(?:not|no|never|without|avoid|except)|n't)(?:\s+[\w'-]+){0,2}\s+$")
+
+
+def mentions(message: str, phrase: str) -> bool:
+    """Whether the lowercased message asks for phrase, as whole words and not negated"""
+    for match in re.finditer(rf"\b{re.escape(phrase)}\b", message):
+        if not NEGATED.search(message[:match.start()]):
+            return True
+    return False
+
+
+def extract_search_preferences(message: str) -> dict:
+    """Sort, ranking and filter options for the search API mentioned in the user's message"""
+    message = (message or "").lower()
+    preferences = {}
+    for phrase, sort_by in SORT_PHRASES.items():
+        if mentions(message, phrase):
+            preferences["sort_by"] = sort_by
+            break
+    for phrase, profile in RANK_PHRASES.items():
+        if mentions(message, phrase):
+            preferences["rank"] = profile
+            break
+    if any(mentions(message, phrase) for phrase in NON_STOP_PHRASES):
+        preferences["max_stops"] = 0
+    for period, (start, end) in TIME_OF_DAY_WINDOWS.items():
+        if mentions(message, period):
+            preferences["depart_after"] = start
+            preferences["depart_before"] = end
+            break
+    return preferences
+
+
 async def flight_search_agent(state: AgentState) -> AgentState:
     """Search for flights using backend API"""
     slots = state["slots"]
@@ -254,11 +313,16 @@ async def flight_search_agent(state: AgentState) -> AgentState:
         state["response"] = response
         return state
     
+    preferences = extract_search_preferences(state.get("user_message", ""))
+    if preferences:
+        logger.info(f"Flight Search Agent: Search preferences: {preferences}")
+
     try:
         logger.info(f"Flight Search Agent: Calling API - {BACKEND_URL}/api/flight/search")
         async with httpx.AsyncClient() as client:
             response = await client.post(
                 f"{BACKEND_URL}/api/flight/search",
+                params={"view": "summary"},  # agents never need the raw payload
                 json={
                     "origin": origin,
                     "destination": destination,
@@ -266,6 +330,7 @@ async def flight_search_agent(state: AgentState) -> AgentState:
                     "adults": adults,
                     "children": 0,
                     "infants": 0,
+                    **preferences,
                 },
                 timeout=20.0,  # Reduced from 30.0 to 20.0
             )
@@ -45,12 +45,14 @@ Possible intents:
 - "slot_filling": User is providing booking details
 - "payment": User wants to proceed with payment
 - "booking_inquiry": User wants to check past bookings, booking history, previous bookings, my bookings, show my bookings, list my bookings, view bookings
+- "explore": User asks where they can fly or when it is cheapest without fixing both destination and date (e.g., "cheapest weekend trip from HYD", "where can I fly under 5000", "when is Delhi to Goa cheapest")
 - "general": General conversation or questions
 
 IMPORTANT (be concise):
 - Convert cities to airport codes (e.g., "Hyderabad"->"HYD", "Mumbai"->"BOM", "Delhi"->"DEL", "Bangalore"->"BLR", "Chennai"->"MAA", "Kolkata"->"CCU", "Vizag"->"VTZ", "Visakhapatnam"->"VTZ", "New York"->"JFK", "London"->"LHR", "Dubai"->"DXB", "Singapore"->"SIN")
 - Convert dates to YYYY-MM-DD ("today"/"tomorrow" -> actual dates)
 - Extract passenger details: "name: X" or "email: X" or "phone: X" or comma-separated format
+- For "explore": set "destination" only if this message names one; put a budget in "max_budget" (number, rupees) and a date range in "date_from"/"date_to"
 - PRESERVE existing slots: If slots already exist from previous messages, keep them unless the user explicitly provides new values
 
 Previous conversation context:
@@ -65,6 +67,9 @@ Return JSON in this exact format:
         "destination": "airport_code or null",
         "departure_date": "YYYY-MM-DD or null",
         "adults": number or null,
+        "max_budget": number or null,
+        "date_from": "YYYY-MM-DD or null",
+        "date_to": "YYYY-MM-DD or null",
         "offer_id": "offer_id or null",
         "full_name": "name or null",
         "email": "email or null",
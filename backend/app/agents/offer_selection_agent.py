@@ -38,6 +38,7 @@ async def offer_selection_agent(state: AgentState) -> AgentState:
         async with httpx.AsyncClient() as client:
             response = await client.get(
                 f"{BACKEND_URL}/api/flight/offer/{offer_id}",
+                params={"view": "summary"},
                 timeout=10.0,
             )
             
@@ -96,6 +96,7 @@ async def payment_agent(state: AgentState) -> AgentState:
                 async with httpx.AsyncClient() as client:
                     response = await client.get(
                         f"{BACKEND_URL}/api/flight/offer/{offer_id}",
+                        params={"view": "summary"},
                         timeout=10.0,
                     )
                     if response.status_code == 200:
@@ -270,6 +271,9 @@ async def payment_agent(state: AgentState) -> AgentState:
                         "email": booking_fields["email"],
                         "phone": booking_fields["phone"],
                     }],
+                    # Shared by every agent booking in this conversation, so a repeat
+                    # returns the booking already made instead of booking twice
+                    "conversation_id": state.get("conversation_id"),
                 },
                 timeout=10.0,
             )
@@ -9,6 +9,7 @@ from .offer_selection_agent import offer_selection_agent
 from .slot_filling_agent import slot_filling_agent
 from .payment_agent import payment_agent
 from .booking_confirmation_agent import booking_confirmation_agent
+from .exploration_agent import exploration_agent
 from .fallback_agent import fallback_agent
 
 logger = logging.getLogger(__name__)
@@ -37,6 +38,9 @@ async def router_agent(state: AgentState) -> AgentState:
     elif intent == "booking_inquiry":
         logger.info("Router: Calling booking_confirmation_agent")
         return await booking_confirmation_agent(state)
+    elif intent == "explore":
+        logger.info("Router: Calling exploration_agent")
+        return await exploration_agent(state)
     else:
         logger.info(f"Router: Intent '{intent}' not recognized, calling fallback_agent")
         return await fallback_agent(state)
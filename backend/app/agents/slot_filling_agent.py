@@ -273,6 +273,9 @@ async def _create_booking(state: AgentState, booking_fields: Dict[str, Any], sel
                         "email": booking_fields["email"],
                         "phone": booking_fields["phone"],
                     }],
+                    # Shared by every agent booking in this conversation, so a repeat
+                    # returns the booking already made instead of booking twice
+                    "conversation_id": state.get("conversation_id"),
                 },
                 timeout=10.0,
             )
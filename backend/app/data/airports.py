@@ -176,6 +176,9 @@ AIRPORTS = [
     {"code": "CMN", "city": "Casablanca", "name": "Mohammed V International Airport", "country": "Morocco"},
 ]
 
+# IATA code -> airport, for constant-time lookups by code
+AIRPORTS_BY_CODE = {airport["code"]: airport for airport in AIRPORTS}
+
 
 def search_airports(query: str, limit: int = 10) -> list:
     """
@@ -224,15 +227,11 @@ def search_airports(query: str, limit: int = 10) -> list:
 def get_city_by_code(code: str) -> str:
     """
     Get city name by airport IATA code
-    Returns city name if found, otherwise returns the code
+    Returns city name if found, otherwise None
     """
     if not code:
         return None
     
-    code_upper = code.upper().strip()
-    for airport in AIRPORTS:
-        if airport["code"] == code_upper:
-            return airport["city"]
-    
-    return None  # Return None if not found
+    airport = AIRPORTS_BY_CODE.get(code.upper().strip())
+    return airport["city"] if airport else None
 
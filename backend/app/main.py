@@ -1,18 +1,51 @@
 """
 FastAPI main application
 """
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.routers import flight, booking, memory, chat
-from app.db import Base, engine
+from app.db import Base, async_engine, engine
+from app.services.offer_expiry_service import offer_expiry_service
+from app.services.search_log_service import search_log_service
+from app.services.cache_warmup_service import cache_warmup_service
+from app.services.inventory_index import inventory_index
+from app.services.db_notifications import db_notifications
+from app.services.fx_rate_service import fx_rate_service, seed_fx_rates
 
 # Create tables
 Base.metadata.create_all(bind=engine)
+# A database created here rather than by the migrations needs the initial FX rates too
+with engine.begin() as conn:
+    seed_fx_rates(conn)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start and stop background workers"""
+    # Offers are priced with the FX rates as they are parsed, so load them before serving
+    await fx_rate_service.load()
+    fx_rate_service.start()
+    offer_expiry_service.start()
+    search_log_service.start()
+    cache_warmup_service.start()
+    inventory_index.start()
+    db_notifications.start()
+    yield
+    await db_notifications.stop()
+    await inventory_index.stop()
+    await cache_warmup_service.stop()
+    await search_log_service.stop()
+    await offer_expiry_service.stop()
+    await fx_rate_service.stop()
+    await async_engine.dispose()
+
 
 app = FastAPI(
     title="Airline Booking Platform API",
     description="Multi-agent AI-powered flight booking system",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 # CORS middleware
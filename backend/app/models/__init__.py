@@ -1,6 +1,11 @@
 from .cached_offer import CachedOffer
 from .booking import Booking
 from .convo_memory import ConvoMemory
+from .amadeus_rate_budget import AmadeusRateBudget
+from .search_log import SearchLog
+from .fx_rate import FxRate
+from .route_min_price import RouteMinPrice
+from .booking_idempotency_key import BookingIdempotencyKey
 
-__all__ = ["CachedOffer", "Booking", "ConvoMemory"]
+__all__ = ["CachedOffer", "Booking", "ConvoMemory", "AmadeusRateBudget", "SearchLog", "FxRate", "RouteMinPrice", "BookingIdempotencyKey"]
 
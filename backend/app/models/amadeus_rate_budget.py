@@ -0,0 +1,13 @@
+"""
+Amadeus Rate Budget Model
+Per-second request counters shared by every backend process
+"""
+from sqlalchemy import Column, BigInteger, Integer
+from app.db import Base
+
+
+class AmadeusRateBudget(Base):
+    __tablename__ = "amadeus_rate_budget"
+
+    window_second = Column(BigInteger, primary_key=True)  # Unix epoch second (database clock)
+    used = Column(Integer, nullable=False, default=0)
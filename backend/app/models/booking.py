@@ -1,11 +1,13 @@
 """
 Booking Model
 """
-from sqlalchemy import Column, String, DateTime, Float, JSON, ForeignKey, Boolean
+from sqlalchemy import Column, String, DateTime, BigInteger, JSON, ForeignKey, Boolean, Index
 from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.ext.hybrid import hybrid_property
 from datetime import datetime, timezone
 import uuid
 from app.db import Base
+from app.utils.money import BASE_CURRENCY, currency_exponent, from_minor
 
 
 def utc_now():
@@ -17,13 +19,26 @@ class Booking(Base):
     __tablename__ = "bookings"
 
     booking_id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()), index=True)
-    user_email = Column(String, nullable=False, index=True)
-    offer_id = Column(String, ForeignKey("cached_offers.offer_id"), nullable=False)
+    user_email = Column(String, nullable=False)
+    offer_id = Column(String, ForeignKey("cached_offers.offer_id"), nullable=False, index=True)
     passengers = Column(JSON, nullable=False)  # List of passenger details
-    total_amount = Column(Float, nullable=False)
-    currency = Column(String, default="INR")
+    total_amount_minor = Column(BigInteger, nullable=False)  # In minor units (paise)
+    currency = Column(String, default=BASE_CURRENCY)
     payment_status = Column(String, default="pending")  # pending, paid, failed
     status = Column(String, default="confirmed")  # confirmed, cancelled
     food_preference = Column(Boolean, default=False)  # Whether user wants food
-    created_at = Column(DateTime, default=utc_now)
+    created_at = Column(DateTime, nullable=False, default=utc_now)
 
+    __table_args__ = (
+        # A user's bookings newest first, paged by (created_at, booking_id)
+        Index("ix_bookings_user_created", "user_email", "created_at", "booking_id"),
+    )
+
+    @hybrid_property
+    def total_amount(self) -> float:
+        """Total in major units, as returned by the API"""
+        return from_minor(self.total_amount_minor, self.currency)
+
+    @total_amount.expression
+    def total_amount(cls):
+        return cls.total_amount_minor / float(10 ** currency_exponent(BASE_CURRENCY))
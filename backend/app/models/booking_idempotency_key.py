@@ -0,0 +1,20 @@
+"""
+Booking Idempotency Key Model
+The response of each booking request made with an idempotency key, so retries of the
+request return the original booking instead of booking again
+"""
+from sqlalchemy import Column, String, DateTime, JSON, ForeignKey
+from app.db import Base
+from app.models.booking import utc_now
+
+
+class BookingIdempotencyKey(Base):
+    __tablename__ = "booking_idempotency_keys"
+
+    # Keys are scoped to the booking user, so clients cannot collide across accounts
+    user_email = Column(String, primary_key=True)
+    idempotency_key = Column(String, primary_key=True)
+    request_hash = Column(String(64), nullable=False)  # SHA-256 of the booking request
+    booking_id = Column(String, ForeignKey("bookings.booking_id", ondelete="CASCADE"), nullable=True)
+    response = Column(JSON, nullable=True)  # BookingResponse as first returned
+    created_at = Column(DateTime, nullable=False, default=utc_now, index=True)
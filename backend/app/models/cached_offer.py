@@ -1,11 +1,17 @@
 """
 Cached Offer Model
 """
-from sqlalchemy import Column, String, DateTime, Float, Integer, JSON, Text
+from sqlalchemy import Column, String, DateTime, Integer, BigInteger, JSON, Text, Index
 from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.orm import deferred
 from datetime import datetime, timedelta, timezone
 import uuid
 from app.db import Base
+from app.utils.money import BASE_CURRENCY, currency_exponent, from_minor
+
+
+OFFER_TTL = timedelta(hours=24)
 
 
 def utc_now():
@@ -23,15 +29,44 @@ class CachedOffer(Base):
     arrive_ts = Column(DateTime, nullable=False)
     airline = Column(String, nullable=False)
     flight_no = Column(String, nullable=False)
-    price = Column(Float, nullable=False)
-    currency = Column(String, default="INR")
-    seats = Column(Integer, default=1)
-    payload = Column(JSON, nullable=False)  # Full API response
+    # Return journey of a round trip; NULL for one-way offers
+    return_depart_ts = Column(DateTime, nullable=True)
+    return_arrive_ts = Column(DateTime, nullable=True)
+    return_flight_no = Column(String, nullable=True)
+    # Prices are normalized to the base currency at ingestion, in minor units (paise)
+    price_minor = Column(BigInteger, nullable=False)
+    currency = Column(String, default=BASE_CURRENCY)
+    # As quoted by the upstream, in that currency's minor units
+    source_currency = Column(String, nullable=False, default=BASE_CURRENCY)
+    source_price_minor = Column(BigInteger, nullable=False)
+    seats = Column(Integer, nullable=False, default=1)
+    # Derived at ingestion for server-side filtering and sorting
+    duration_minutes = Column(Integer, nullable=False)
+    stops = Column(Integer, nullable=False, default=0)
+    passenger_mix = Column(String, nullable=False)  # "<adults>-<children>-<infants>"
+    # "upstream", or "paired"/"connection" for offers composed from cached one-way offers
+    offer_source = Column(String, nullable=False, default="upstream")
+    # Full API response; deferred so list and summary queries never read (and detoast) it
+    payload = deferred(Column(JSON, nullable=False))
     cached_at = Column(DateTime, default=utc_now)
-    expire_at = Column(DateTime, nullable=False)
+    expire_at = Column(DateTime, nullable=False, index=True)
+
+    __table_args__ = (
+        # Route + departure window lookups behind search filters and keyset pages
+        Index("ix_cached_offers_route_depart", "origin", "destination", "depart_ts"),
+    )
+
+    @hybrid_property
+    def price(self) -> float:
+        """Price in major units, as returned by the API"""
+        return from_minor(self.price_minor, self.currency)
+
+    @price.expression
+    def price(cls):
+        return cls.price_minor / float(10 ** currency_exponent(BASE_CURRENCY))
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         if not self.expire_at:
-            self.expire_at = utc_now() + timedelta(hours=24)
+            self.expire_at = utc_now() + OFFER_TTL
 
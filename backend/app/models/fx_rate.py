@@ -0,0 +1,14 @@
+"""
+FX Rate Model
+"""
+from sqlalchemy import Column, String, DateTime, Numeric
+from app.db import Base
+from app.models.cached_offer import utc_now
+
+
+class FxRate(Base):
+    __tablename__ = "fx_rates"
+
+    currency = Column(String(3), primary_key=True)  # ISO 4217 code
+    rate = Column(Numeric(18, 8), nullable=False)  # Units of the base currency (INR) per unit
+    updated_at = Column(DateTime, nullable=False, default=utc_now, onupdate=utc_now)
@@ -0,0 +1,30 @@
+"""
+Route Min Price Model
+Cheapest cached one-way fare per (origin, destination, passenger mix, departure day),
+maintained as offers are cached, for exploration and fare-calendar queries
+"""
+from sqlalchemy import Column, String, Date, DateTime, BigInteger, Index
+from app.db import Base
+from app.models.cached_offer import utc_now
+from app.utils.money import BASE_CURRENCY
+
+
+class RouteMinPrice(Base):
+    __tablename__ = "route_min_prices"
+
+    origin = Column(String, primary_key=True)
+    destination = Column(String, primary_key=True)
+    passenger_mix = Column(String, primary_key=True)  # "<adults>-<children>-<infants>"
+    depart_date = Column(Date, primary_key=True)
+    price_minor = Column(BigInteger, nullable=False)
+    currency = Column(String, nullable=False, default=BASE_CURRENCY)
+    # The offer quoting the fare; the fare stands until that offer expires
+    offer_id = Column(String, nullable=False)
+    airline = Column(String, nullable=False)
+    expire_at = Column(DateTime, nullable=False)
+    updated_at = Column(DateTime, nullable=False, default=utc_now)
+
+    __table_args__ = (
+        # "Everywhere from an origin over a date range" lookups
+        Index("ix_route_min_prices_origin_date", "origin", "passenger_mix", "depart_date"),
+    )
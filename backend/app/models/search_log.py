@@ -0,0 +1,26 @@
+"""
+Search Log Model
+Append-only record of flight searches, used to find popular routes to pre-warm
+"""
+from sqlalchemy import Column, BigInteger, String, Date, DateTime, Integer, Index
+from app.db import Base
+from app.models.cached_offer import utc_now
+
+
+class SearchLog(Base):
+    __tablename__ = "search_log"
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    created_at = Column(DateTime, nullable=False, default=utc_now)
+    origin = Column(String, nullable=False)
+    destination = Column(String, nullable=False)
+    departure_date = Column(Date, nullable=False)
+    passenger_mix = Column(String, nullable=False)  # "<adults>-<children>-<infants>"
+    source = Column(String, nullable=False)  # memory, shared or upstream
+    offer_count = Column(Integer, nullable=False, default=0)
+    latency_ms = Column(Integer, nullable=False)
+
+    __table_args__ = (
+        # Rows arrive in created_at order, so a BRIN index stays tiny
+        Index("ix_search_log_created_at", "created_at", postgresql_using="brin"),
+    )
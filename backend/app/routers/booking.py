@@ -1,70 +1,114 @@
 """
 Booking router
 """
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import date
+from typing import Optional
+from pydantic import TypeAdapter
 import uuid
 from app.db import get_db
-from app.schemas.booking import BookingRequest, BookingResponse, BookingCreate
+from app.schemas.booking import (
+    BookingRequest,
+    BookingResponse,
+    BookingCreate,
+    BookingStatus,
+    BookingHistoryResponse,
+    GroupBookingRequest,
+    GroupBookingResponse,
+)
 from app.models.booking import Booking
 from app.models.cached_offer import CachedOffer
 from app.utils.logger import get_logger
-from app.utils.validators import validate_email, validate_phone
-from app.data.airports import get_city_by_code
+from app.utils.validators import validate_email, passenger_error
+from app.services.booking_cache import BOOKING_CACHE_CONTROL, booking_cache
+from app.services.booking_history_service import booking_dict, booking_history_service
+from app.services.booking_idempotency import booking_idempotency
+from app.services.group_booking_service import FOOD_CHARGE, booking_total_minor, group_booking_service
+from app.services.seat_inventory import seat_inventory
 
 router = APIRouter(prefix="/api/booking", tags=["booking"])
 logger = get_logger(__name__)
 
+_booking_list = TypeAdapter(list[BookingResponse])
+
+
+def _etag_response(etag: str, body: bytes, if_none_match: Optional[str]) -> Response:
+    """A booking response the client revalidates by ETag; 304 when it already holds it"""
+    headers = {"ETag": etag, "Cache-Control": BOOKING_CACHE_CONTROL}
+    if booking_cache.revalidated(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
 
 @router.post("/simulate_confirm", response_model=BookingResponse)
 async def simulate_booking(
     request: BookingRequest,
-    db: Session = Depends(get_db),
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, max_length=255),
+    db: AsyncSession = Depends(get_db),
 ):
     """
     Simulate booking confirmation (no real payment)
+    With an Idempotency-Key header, or a conversation_id to derive one from, a retry
+    returns the original booking (marked Idempotent-Replayed) instead of booking again.
     """
     # Validate inputs
     if not validate_email(request.user_email):
         raise HTTPException(status_code=400, detail="Invalid user email format")
     
     for passenger in request.passengers:
-        if not validate_email(passenger.email):
-            raise HTTPException(status_code=400, detail=f"Invalid email for passenger: {passenger.full_name}")
-        if not validate_phone(passenger.phone):
-            raise HTTPException(status_code=400, detail=f"Invalid phone for passenger: {passenger.full_name}")
-        if not passenger.date_of_birth:
-            raise HTTPException(status_code=400, detail=f"Date of birth is required for passenger: {passenger.full_name}")
+        error = passenger_error(passenger)
+        if error:
+            raise HTTPException(status_code=400, detail=error)
     
-    # Verify offer exists and has available seats
-    offer = db.query(CachedOffer).filter(CachedOffer.offer_id == request.offer_id).first()
+    # A retry of a completed request gets its stored booking; a new key is claimed in this
+    # transaction, so a duplicate in flight waits here until this request finishes
+    request_hash = booking_idempotency.request_hash(request)
+    key = idempotency_key or booking_idempotency.derived_key(request, request_hash)
+    if key:
+        stored = await db.run_sync(booking_idempotency.lookup, request.user_email, key)
+        if stored is None and not await db.run_sync(booking_idempotency.claim, request.user_email, key, request_hash):
+            stored = await db.run_sync(booking_idempotency.lookup, request.user_email, key)
+            if stored is None:
+                raise HTTPException(status_code=409, detail="A booking with this idempotency key is in progress, please retry")
+        if stored is not None:
+            if stored.request_hash != request_hash:
+                raise HTTPException(status_code=422, detail="Idempotency key was already used for a different booking")
+            logger.info(f"Replaying booking {stored.booking_id} for idempotency key {key}")
+            booking_idempotency.stats["replayed"] += 1
+            response.headers["Idempotent-Replayed"] = "true"
+            return BookingResponse.model_validate(stored.response)
+    
+    # Verify offer exists
+    offer = await db.get(CachedOffer, request.offer_id)
     
     if not offer:
+        await db.rollback()
         logger.warning(f"Offer not found: {request.offer_id}")
         raise HTTPException(status_code=404, detail="Offer not found")
     
-    # Check if offer has enough seats available
-    if offer.seats < len(request.passengers):
-        logger.warning(f"Insufficient seats: requested {len(request.passengers)}, available {offer.seats}")
+    logger.info(f"Creating booking for user: {request.user_email}, offer: {request.offer_id}")
+    
+    # Take the seats in the booking's transaction; the conditional decrement is what
+    # decides availability, so concurrent bookings cannot oversell the offer
+    seat_counts = await db.run_sync(seat_inventory.seat_counts, offer, len(request.passengers))
+    reserved = await db.run_sync(seat_inventory.reserve, seat_counts)
+    if offer.offer_id not in reserved:
+        await db.rollback()
+        available = await db.run_sync(seat_inventory.seats_left, request.offer_id)
+        logger.warning(f"Insufficient seats: requested {len(request.passengers)}, available {available}")
         raise HTTPException(
             status_code=400, 
-            detail=f"Not enough seats available. Requested: {len(request.passengers)}, Available: {offer.seats}"
+            detail=f"Not enough seats available. Requested: {len(request.passengers)}, Available: {available}"
         )
     
-    logger.info(f"Creating booking for user: {request.user_email}, offer: {request.offer_id}")
-    
     try:
-        # Calculate total amount
-        total_amount = offer.price * len(request.passengers)
-        
-        # Add 200 INR if food preference is selected
+        # Calculate total amount in minor units, with the food charge when selected
+        total_amount_minor = booking_total_minor(offer, len(request.passengers), request.food_preference)
         if request.food_preference:
-            food_charge = 200.0
-            if offer.currency == "USD":
-                # Convert 200 INR to USD (200 / 83 ≈ 2.41 USD)
-                food_charge = 200.0 / 83.0
-            total_amount += food_charge
-            logger.info(f"Food service selected: Added {food_charge} {offer.currency} to total amount")
+            logger.info(f"Food service selected: Added {FOOD_CHARGE} {offer.currency} to total amount")
         
         # Create booking
         booking = Booking(
@@ -72,7 +116,7 @@ async def simulate_booking(
             user_email=request.user_email,
             offer_id=request.offer_id,
             passengers=[p.model_dump() for p in request.passengers],
-            total_amount=total_amount,
+            total_amount_minor=total_amount_minor,
             currency=offer.currency,
             payment_status="paid",
             status="confirmed",
@@ -80,138 +124,156 @@ async def simulate_booking(
         )
         
         db.add(booking)
-        db.commit()
-        db.refresh(booking)
+        await db.flush()
+        result = BookingResponse.model_validate(booking_dict(booking, offer.origin, offer.destination, offer.depart_ts))
+        if key:
+            await db.run_sync(
+                booking_idempotency.complete, request.user_email, key, booking.booking_id, result.model_dump(mode="json")
+            )
+        await db.run_sync(booking_cache.publish, request.user_email)
+        await db.commit()
+        seat_inventory.forget(reserved)
+        booking_cache.invalidate(request.user_email)
         
         logger.info(f"Booking created successfully: {booking.booking_id}")
         
-        # Get city names for origin and destination
-        origin_city = get_city_by_code(offer.origin)
-        destination_city = get_city_by_code(offer.destination)
-        
-        # Create response dict with booking data including origin and destination
-        booking_dict = {
-            "booking_id": booking.booking_id,
-            "user_email": booking.user_email,
-            "offer_id": booking.offer_id,
-            "passengers": booking.passengers,
-            "total_amount": booking.total_amount,
-            "currency": booking.currency,
-            "payment_status": booking.payment_status,
-            "status": booking.status,
-            "food_preference": booking.food_preference,
-            "origin": offer.origin,
-            "destination": offer.destination,
-            "origin_city": origin_city,
-            "destination_city": destination_city,
-            "created_at": booking.created_at,
-        }
-        
-        return BookingResponse.model_validate(booking_dict)
+        return result
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         logger.error(f"Booking creation failed: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Booking creation failed: {str(e)}")
 
 
+@router.post("/group", response_model=GroupBookingResponse)
+async def group_booking(request: GroupBookingRequest, db: AsyncSession = Depends(get_db)):
+    """
+    Book many passengers across several offers in one transaction (no real payment)
+    Each booking gets its own result entry. A booking that fails validation or finds too
+    few seats does not fail the group, unless all_or_nothing is set.
+    """
+    if not validate_email(request.user_email):
+        raise HTTPException(status_code=400, detail="Invalid user email format")
+    
+    logger.info(f"Group booking for user: {request.user_email}, {len(request.bookings)} bookings")
+    try:
+        results = await db.run_sync(group_booking_service.book, request)
+    except Exception as e:
+        await db.rollback()
+        logger.error(f"Group booking failed: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Group booking failed: {str(e)}")
+    
+    booked = [result["booking"] for result in results if result["booking"]]
+    if booked:
+        booking_cache.invalidate(request.user_email)
+    return GroupBookingResponse(
+        results=results,
+        count=len(booked),
+        failed=len(results) - len(booked),
+        passengers=sum(len(booking["passengers"]) for booking in booked),
+    )
+
+
 @router.get("/{booking_id}", response_model=BookingResponse)
-async def get_booking(booking_id: str, db: Session = Depends(get_db)):
+async def get_booking(
+    booking_id: str,
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_db),
+):
     """
     Get booking details by booking ID
+    Answered from the booking cache when possible; send the ETag back as If-None-Match
+    to get a 304 while the booking is unchanged.
     """
-    booking = db.query(Booking).filter(Booking.booking_id == booking_id).first()
+    cached = booking_cache.get_booking(booking_id)
+    if cached:
+        return _etag_response(*cached, if_none_match)
+    
+    token = booking_cache.token()
+    booking = await db.get(Booking, booking_id)
     
     if not booking:
         raise HTTPException(status_code=404, detail="Booking not found")
     
     # Fetch offer details to get origin and destination
-    offer = db.query(CachedOffer).filter(CachedOffer.offer_id == booking.offer_id).first()
-    
-    # Convert currency for display only (don't modify database)
-    display_amount = booking.total_amount
-    display_currency = booking.currency
-    if booking.currency == "USD":
-        display_amount = booking.total_amount * 83  # Convert to INR (1 USD ≈ 83 INR)
-        display_currency = "INR"
-    
-    # Get city names for origin and destination
-    origin_city = get_city_by_code(offer.origin) if offer else None
-    destination_city = get_city_by_code(offer.destination) if offer else None
+    offer = await db.get(CachedOffer, booking.offer_id)
     
-    # Create response dict with booking data
-    booking_dict = {
-        "booking_id": booking.booking_id,
-        "user_email": booking.user_email,
-        "offer_id": booking.offer_id,
-        "passengers": booking.passengers,
-        "total_amount": display_amount,  # Use converted amount for display
-        "currency": display_currency,  # Use converted currency for display
-        "payment_status": booking.payment_status,
-        "status": booking.status,
-        "food_preference": booking.food_preference,
-        "origin": offer.origin if offer else None,
-        "destination": offer.destination if offer else None,
-        "origin_city": origin_city,
-        "destination_city": destination_city,
-        "created_at": booking.created_at,
-    }
-    
-    return BookingResponse.model_validate(booking_dict)
+    route = (offer.origin, offer.destination, offer.depart_ts) if offer else (None, None, None)
+    body = BookingResponse.model_validate(booking_dict(booking, *route)).model_dump_json().encode()
+    etag = booking_cache.put(booking.user_email, ("booking", booking_id), body, token)
+    return _etag_response(etag, body, if_none_match)
 
 
 @router.get("/user/{user_email}", response_model=list[BookingResponse])
-async def get_user_bookings(user_email: str, db: Session = Depends(get_db)):
+async def get_user_bookings(
+    user_email: str,
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_db),
+):
     """
-    Get all bookings for a user
-    Converts USD to INR for backward compatibility
+    Get all bookings for a user, newest first
+    Prefer /user/{user_email}/history for accounts with many bookings. Revalidates by
+    ETag like /{booking_id}.
     """
-    bookings = db.query(Booking).filter(Booking.user_email == user_email).all()
+    view = ("all",)
+    cached = booking_cache.get(user_email, view)
+    if cached:
+        return _etag_response(*cached, if_none_match)
     
-    # Convert USD to INR for display only (don't modify database)
-    result = []
-    for booking in bookings:
-        # Convert currency for display only, don't modify database
-        display_amount = booking.total_amount
-        display_currency = booking.currency
-        if booking.currency == "USD":
-            display_amount = booking.total_amount * 83  # Convert to INR (1 USD ≈ 83 INR)
-            display_currency = "INR"
-        
-        # Fetch offer details to get origin and destination
-        offer = db.query(CachedOffer).filter(CachedOffer.offer_id == booking.offer_id).first()
-        
-        # Get city names for origin and destination
-        origin_city = get_city_by_code(offer.origin) if offer else None
-        destination_city = get_city_by_code(offer.destination) if offer else None
-        
-        booking_dict = {
-            "booking_id": booking.booking_id,
-            "user_email": booking.user_email,
-            "offer_id": booking.offer_id,
-            "passengers": booking.passengers,
-            "total_amount": display_amount,  # Use converted amount for display
-            "currency": display_currency,  # Use converted currency for display
-            "payment_status": booking.payment_status,
-            "status": booking.status,
-            "food_preference": booking.food_preference,
-            "origin": offer.origin if offer else None,
-            "destination": offer.destination if offer else None,
-            "origin_city": origin_city,
-            "destination_city": destination_city,
-            "created_at": booking.created_at,
-        }
-        
-        result.append(BookingResponse.model_validate(booking_dict))
+    token = booking_cache.token()
+    bookings = await db.run_sync(booking_history_service.all, user_email)
+    body = _booking_list.dump_json([BookingResponse.model_validate(booking) for booking in bookings])
+    etag = booking_cache.put(user_email, view, body, token)
+    return _etag_response(etag, body, if_none_match)
+
+
+@router.get("/user/{user_email}/history", response_model=BookingHistoryResponse)
+async def get_booking_history(
+    user_email: str,
+    status: Optional[BookingStatus] = None,
+    created_from: Optional[date] = None,
+    created_to: Optional[date] = None,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    One page of a user's bookings, newest first, with their routes
+    Filters by status and by booking date (created_from/created_to, inclusive); pass the
+    returned next_cursor as cursor for the next page. total counts every matching booking.
+    Pages are cached per user and revalidate by ETag like /{booking_id}.
+    """
+    status_value = status.value if status else None
+    view = ("history", status_value, created_from, created_to, limit, cursor)
+    cached = booking_cache.get(user_email, view)
+    if cached:
+        return _etag_response(*cached, if_none_match)
     
-    return result
+    token = booking_cache.token()
+    try:
+        bookings, next_cursor = await db.run_sync(
+            booking_history_service.page, user_email, status_value, created_from, created_to, limit, cursor
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    status_counts = await db.run_sync(booking_history_service.status_counts, user_email, created_from, created_to)
+    body = BookingHistoryResponse(
+        bookings=bookings,
+        count=len(bookings),
+        total=status_counts.get(status_value, 0) if status_value else sum(status_counts.values()),
+        status_counts=status_counts,
+        next_cursor=next_cursor,
+    ).model_dump_json().encode()
+    etag = booking_cache.put(user_email, view, body, token)
+    return _etag_response(etag, body, if_none_match)
 
 
 @router.post("/{booking_id}/cancel", response_model=BookingResponse)
-async def cancel_booking(booking_id: str, db: Session = Depends(get_db)):
+async def cancel_booking(booking_id: str, db: AsyncSession = Depends(get_db)):
     """
     Cancel a booking by booking ID
     """
-    booking = db.query(Booking).filter(Booking.booking_id == booking_id).first()
+    booking = await db.get(Booking, booking_id)
     
     if not booking:
         raise HTTPException(status_code=404, detail="Booking not found")
@@ -219,49 +281,39 @@ async def cancel_booking(booking_id: str, db: Session = Depends(get_db)):
     if booking.status == "cancelled":
         raise HTTPException(status_code=400, detail="Booking is already cancelled")
     
+    # Fetch offer details to get origin and destination
+    offer = await db.get(CachedOffer, booking.offer_id)
+    
     try:
-        # Update booking status to cancelled
-        booking.status = "cancelled"
-        db.commit()
-        db.refresh(booking)
+        # Update booking status to cancelled, only if no concurrent cancel got there first,
+        # and put its seats back in the same transaction
+        cancelled = (await db.execute(
+            update(Booking)
+            .where(Booking.booking_id == booking_id, Booking.status != "cancelled")
+            .values(status="cancelled")
+            .execution_options(synchronize_session=False)
+        )).rowcount
+        if not cancelled:
+            await db.rollback()
+            raise HTTPException(status_code=400, detail="Booking is already cancelled")
+        released = []
+        if offer:
+            seat_counts = await db.run_sync(seat_inventory.seat_counts, offer, len(booking.passengers))
+            released = await db.run_sync(seat_inventory.release, seat_counts)
+        await db.run_sync(booking_cache.publish, booking.user_email)
+        await db.commit()
+        await db.refresh(booking)
+        seat_inventory.forget(released)
+        booking_cache.invalidate(booking.user_email)
         
         logger.info(f"Booking cancelled successfully: {booking.booking_id}")
         
-        # Fetch offer details to get origin and destination
-        offer = db.query(CachedOffer).filter(CachedOffer.offer_id == booking.offer_id).first()
-        
-        # Convert currency for display only (don't modify database)
-        display_amount = booking.total_amount
-        display_currency = booking.currency
-        if booking.currency == "USD":
-            display_amount = booking.total_amount * 83  # Convert to INR (1 USD ≈ 83 INR)
-            display_currency = "INR"
-        
-        # Get city names for origin and destination
-        origin_city = get_city_by_code(offer.origin) if offer else None
-        destination_city = get_city_by_code(offer.destination) if offer else None
-        
-        # Create response dict with booking data
-        booking_dict = {
-            "booking_id": booking.booking_id,
-            "user_email": booking.user_email,
-            "offer_id": booking.offer_id,
-            "passengers": booking.passengers,
-            "total_amount": display_amount,  # Use converted amount for display
-            "currency": display_currency,  # Use converted currency for display
-            "payment_status": booking.payment_status,
-            "status": booking.status,
-            "food_preference": booking.food_preference,
-            "origin": offer.origin if offer else None,
-            "destination": offer.destination if offer else None,
-            "origin_city": origin_city,
-            "destination_city": destination_city,
-            "created_at": booking.created_at,
-        }
-        
-        return BookingResponse.model_validate(booking_dict)
+        route = (offer.origin, offer.destination, offer.depart_ts) if offer else (None, None, None)
+        return BookingResponse.model_validate(booking_dict(booking, *route))
+    except HTTPException:
+        raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         logger.error(f"Booking cancellation failed: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Booking cancellation failed: {str(e)}")
 
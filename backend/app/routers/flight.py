@@ -1,243 +1,466 @@
 """
 Flight search router
 """
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from sqlalchemy.exc import IntegrityError
-from typing import List
-from datetime import datetime
-from app.db import get_db
-from app.schemas.flight import FlightSearchRequest, FlightSearchResponse, OfferDetail
-from app.services.amadeus_service import AmadeusService
-from app.models.cached_offer import CachedOffer
+import asyncio
+import json
+import time
+from datetime import date, timedelta
+from contextlib import aclosing
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import undefer
+from typing import List, Dict, Any, Optional, Set, Tuple
+from app.db import AsyncSessionLocal, get_db, pool_stats
+from app.schemas.flight import (
+    FlightSearchRequest,
+    FlightSearchResponse,
+    OfferSummary,
+    OfferDetail,
+    OfferPayload,
+    OfferView,
+    FlightSearchBatchRequest,
+    FlightSearchBatchResult,
+    FlightSearchBatchResponse,
+    ExploreResponse,
+    FareCalendarResponse,
+)
+from app.services.amadeus_scheduler import AmadeusOverloadedError, amadeus_scheduler
+from app.services.flight_search_service import flight_search_service, passenger_mix
+from app.services.search_log_service import search_log_service
+from app.services.cache_warmup_service import cache_warmup_service
+from app.services.offer_expiry_service import offer_expiry_service
+from app.services.offer_detail_cache import offer_detail_cache
+from app.services.booking_cache import booking_cache
+from app.services.db_notifications import db_notifications
+from app.services.fx_rate_service import fx_rate_service
+from app.services.connection_graph import connection_graph
+from app.services.offer_ranking import offer_ranker
+from app.services.inventory_index import inventory_index
+from app.services.route_min_price_service import (
+    EXPLORE_DEFAULT_DAYS,
+    EXPLORE_MAX_DAYS,
+    route_min_price_service,
+)
+from app.models.cached_offer import CachedOffer, utc_now
 from app.utils.logger import get_logger
+from app.utils.money import to_minor
 from app.utils.validators import validate_airport_code, validate_date_format
 
 router = APIRouter(prefix="/api/flight", tags=["flight"])
-amadeus_service = AmadeusService()
+amadeus_service = flight_search_service.amadeus_service
 logger = get_logger(__name__)
 
 
-def _parse_amadeus_offer(offer: dict) -> dict:
-    """Parse Amadeus offer to our format"""
-    itinerary = offer.get("itineraries", [{}])[0]
-    segments = itinerary.get("segments", [])
-    
-    if not segments:
-        raise ValueError("No segments found in itinerary")
-    
-    # For multi-segment flights, use first segment's origin and last segment's destination
-    first_segment = segments[0]
-    last_segment = segments[-1]
-    
-    origin = first_segment.get("departure", {}).get("iataCode", "").upper()
-    destination = last_segment.get("arrival", {}).get("iataCode", "").upper()
-    original_offer_id = offer.get("id", "")
-    
-    # Make offer_id unique by combining with route to avoid conflicts
-    # This handles cases where Amadeus returns same IDs for different routes
-    unique_offer_id = f"{original_offer_id}_{origin}_{destination}"
-    
-    price_info = offer.get("price", {})
-    
-    return {
-        "offer_id": unique_offer_id,
-        "origin": origin,
-        "destination": destination,
-        "depart_ts": datetime.fromisoformat(
-            first_segment.get("departure", {}).get("at", "").replace("Z", "+00:00")
-        ),
-        "arrive_ts": datetime.fromisoformat(
-            last_segment.get("arrival", {}).get("at", "").replace("Z", "+00:00")
-        ),
-        "airline": first_segment.get("carrierCode", ""),
-        "flight_no": f"{first_segment.get('carrierCode', '')}{first_segment.get('number', '')}",
-        "price": float(price_info.get("total", 0)),
-        "currency": price_info.get("currency", "INR"),
-        "seats": offer.get("numberOfBookableSeats", 1),
-        "payload": offer,
-    }
+def _validate_search_request(request: FlightSearchRequest) -> None:
+    """Validate search inputs, raising HTTPException on the first problem"""
+    if not validate_airport_code(request.origin):
+        raise HTTPException(status_code=400, detail="Invalid origin airport code")
+    if not validate_airport_code(request.destination):
+        raise HTTPException(status_code=400, detail="Invalid destination airport code")
+    if not validate_date_format(request.departure_date):
+        raise HTTPException(status_code=400, detail="Invalid departure date format. Use YYYY-MM-DD")
+    if request.return_date and not validate_date_format(request.return_date):
+        raise HTTPException(status_code=400, detail="Invalid return date format. Use YYYY-MM-DD")
+    if request.return_date and request.return_date < request.departure_date:
+        raise HTTPException(status_code=400, detail="Return date must not be before the departure date")
+    _validate_rank(request.rank)
+    if request.rank and request.cursor:
+        raise HTTPException(status_code=400, detail="Ranked results are not paged; drop the cursor")
+
+
+def _validate_rank(rank: Optional[str]) -> None:
+    if rank:
+        try:
+            offer_ranker.profile(rank)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+
+def _explore_range(date_from: Optional[str], date_to: Optional[str]) -> Tuple[date, date]:
+    """Departure range of an exploration or calendar query, by default the next EXPLORE_DEFAULT_DAYS days"""
+    for value in (date_from, date_to):
+        if value and not validate_date_format(value):
+            raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD")
+    start = date.fromisoformat(date_from) if date_from else utc_now().date()
+    end = date.fromisoformat(date_to) if date_to else start + timedelta(days=EXPLORE_DEFAULT_DAYS)
+    if end < start:
+        raise HTTPException(status_code=400, detail="date_to must not be before date_from")
+    if (end - start).days > EXPLORE_MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"Date range must not exceed {EXPLORE_MAX_DAYS} days")
+    return start, end
+
+
+def _resolve_fields(view: OfferView, fields: Optional[str]) -> Optional[Set[str]]:
+    """
+    Offer fields to include in a response, or None for the full offer.
+    An explicit fields= list wins over view; offer_id is always included.
+    """
+    if fields:
+        requested = {field.strip() for field in fields.split(",") if field.strip()}
+        unknown = requested - set(OfferDetail.model_fields)
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown offer fields: {', '.join(sorted(unknown))}")
+        return requested | {"offer_id"}
+    if view == OfferView.summary:
+        return set(OfferSummary.model_fields)
+    return None
+
+
+def _project_offer(offer: Dict[str, Any], include: Set[str]) -> Dict[str, Any]:
+    model = OfferDetail if "payload" in include else OfferSummary
+    return model.model_validate(offer).model_dump(mode="json", include=include)
 
 
 @router.post("/search", response_model=FlightSearchResponse)
 async def search_flights(
     request: FlightSearchRequest,
-    db: Session = Depends(get_db),
+    view: OfferView = OfferView.full,
+    fields: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
 ):
     """
     Search for flights and cache results
+    view=summary leaves out the raw payload (fetch it via /offer/{offer_id}/payload);
+    fields=a,b,c returns only the listed offer fields
     """
-    # Validate inputs
-    if not validate_airport_code(request.origin):
-        raise HTTPException(status_code=400, detail="Invalid origin airport code")
-    if not validate_airport_code(request.destination):
-        raise HTTPException(status_code=400, detail="Invalid destination airport code")
-    if not validate_date_format(request.departure_date):
-        raise HTTPException(status_code=400, detail="Invalid departure date format. Use YYYY-MM-DD")
-    if request.return_date and not validate_date_format(request.return_date):
-        raise HTTPException(status_code=400, detail="Invalid return date format. Use YYYY-MM-DD")
-    
+    _validate_search_request(request)
+    include = _resolve_fields(view, fields)
+
     logger.info(f"Searching flights: {request.origin} -> {request.destination} on {request.departure_date}")
-    
-    try:
-        # Search flights via Amadeus
-        amadeus_offers = await amadeus_service.search_flights(
-            origin=request.origin,
-            destination=request.destination,
-            departure_date=request.departure_date,
-            return_date=request.return_date,
-            adults=request.adults,
-            children=request.children,
-            infants=request.infants,
-        )
 
-        # Parse and cache offers
-        cached_offers = []
-        for offer in amadeus_offers[:15]:  # Limit to 15
-            try:
-                parsed = _parse_amadeus_offer(offer)
-            except (ValueError, KeyError, TypeError) as e:
-                logger.warning(f"Failed to parse offer {offer.get('id', 'unknown')}: {str(e)}")
-                continue
-            
-            # Validate that parsed offer matches search parameters
-            if parsed.get("origin", "").upper() != request.origin.upper():
-                logger.warning(f"Offer {parsed.get('offer_id')} origin mismatch: expected {request.origin}, got {parsed.get('origin')}")
-                continue
-            if parsed.get("destination", "").upper() != request.destination.upper():
-                logger.warning(f"Offer {parsed.get('offer_id')} destination mismatch: expected {request.destination}, got {parsed.get('destination')}")
-                continue
-            
-            # Ensure currency is INR (convert from USD if needed)
-            if parsed.get("currency", "INR") == "USD":
-                # Convert USD to INR (1 USD ≈ 83 INR)
-                parsed["price"] = parsed["price"] * 83
-                parsed["currency"] = "INR"
-            
-            # Check if already cached - verify it matches the current search route
-            existing = db.query(CachedOffer).filter(
-                CachedOffer.offer_id == parsed["offer_id"],
-                CachedOffer.origin == parsed["origin"].upper(),
-                CachedOffer.destination == parsed["destination"].upper(),
-            ).first()
-            
-            if existing:
-                # Convert to INR for display if needed (don't modify database during read)
-                # Only update if we're caching a new offer with USD
-                cached_offers.append(existing)
-            else:
-                # Create new cached offer
-                # Note: offer_id is now unique per route, so no need to check for duplicates
-                try:
-                    cached_offer = CachedOffer(**parsed)
-                    db.add(cached_offer)
-                    cached_offers.append(cached_offer)
-                except IntegrityError as e:
-                    # Handle duplicate key error - offer was inserted between check and insert
-                    db.rollback()
-                    logger.warning(f"Duplicate key error for offer {parsed['offer_id']}, attempting to retrieve existing offer")
-                    # Try to get the existing offer for this route
-                    existing_offer = db.query(CachedOffer).filter(
-                        CachedOffer.offer_id == parsed["offer_id"],
-                        CachedOffer.origin == parsed["origin"].upper(),
-                        CachedOffer.destination == parsed["destination"].upper(),
-                    ).first()
-                    if existing_offer:
-                        cached_offers.append(existing_offer)
-                    else:
-                        logger.warning(f"Could not retrieve existing offer {parsed['offer_id']} after duplicate key error")
-                    continue
-                except Exception as e:
-                    # Handle other exceptions
-                    db.rollback()
-                    logger.error(f"Failed to cache offer {parsed['offer_id']}: {str(e)}")
-                    continue
+    try:
+        # Later pages are served from cached_offers without another upstream search
+        if not request.cursor:
+            await flight_search_service.ensure_offers(db, request)
 
         try:
-            db.commit()
-        except IntegrityError as e:
-            db.rollback()
-            logger.error(f"Failed to commit cached offers due to duplicate key: {str(e)}")
-            # Retrieve valid offers that match the search
-            valid_cached_offers = []
-            for offer in amadeus_offers[:15]:  # Check all 15 offers, not just 5
-                parsed_check = _parse_amadeus_offer(offer)
-                if (parsed_check.get("origin", "").upper() == request.origin.upper() and
-                    parsed_check.get("destination", "").upper() == request.destination.upper()):
-                    existing = db.query(CachedOffer).filter(
-                        CachedOffer.offer_id == parsed_check["offer_id"],
-                        CachedOffer.origin == parsed_check["origin"].upper(),
-                        CachedOffer.destination == parsed_check["destination"].upper(),
-                    ).first()
-                    if existing:
-                        valid_cached_offers.append(existing)
-            cached_offers = valid_cached_offers
-        except Exception as e:
-            db.rollback()
-            logger.error(f"Failed to commit cached offers: {str(e)}")
-            raise HTTPException(status_code=500, detail=f"Failed to cache flight offers: {str(e)}")
-
-        # Refresh to get IDs and filter to ensure all offers match the search
-        valid_offers = []
-        for offer in cached_offers:
-            db.refresh(offer)
-            # Double-check that the offer matches the search parameters
-            if (offer.origin.upper() == request.origin.upper() and 
-                offer.destination.upper() == request.destination.upper()):
-                valid_offers.append(offer)
-            else:
-                logger.warning(f"Filtered out offer {offer.offer_id}: route mismatch - expected {request.origin}->{request.destination}, got {offer.origin}->{offer.destination}")
-
-        if not valid_offers:
+            offers, next_cursor = await db.run_sync(
+                flight_search_service.query_offers, request, include_payload=include is None or "payload" in include
+            )
+            # No direct offer at all: propose connecting itineraries over cached flights
+            if (
+                not offers
+                and not request.cursor
+                and not request.return_date
+                and not await db.run_sync(flight_search_service.recent_offer_count, request)
+                and await flight_search_service.propose_connections(db, request)
+            ):
+                offers, next_cursor = await db.run_sync(
+                    flight_search_service.query_offers, request, include_payload=include is None or "payload" in include
+                )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        if not offers and not request.cursor:
             logger.warning(f"No valid offers found for route {request.origin} -> {request.destination}")
-            return FlightSearchResponse(offers=[], count=0)
+
+        if include is not None:
+            return JSONResponse({
+                "offers": [_project_offer(offer, include) for offer in offers],
+                "count": len(offers),
+                "next_cursor": next_cursor,
+            })
 
         return FlightSearchResponse(
-            offers=[OfferDetail.model_validate(offer) for offer in valid_offers],
-            count=len(valid_offers),
+            offers=[OfferDetail.model_validate(offer) for offer in offers],
+            count=len(offers),
+            next_cursor=next_cursor,
         )
 
     except HTTPException:
         raise
+    except AmadeusOverloadedError as e:
+        logger.warning(f"Flight search shed: {str(e)}")
+        raise HTTPException(
+            status_code=503,
+            detail="Flight search is busy, please try again shortly",
+            headers={"Retry-After": str(max(1, round(e.retry_after)))},
+        )
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         logger.error(f"Flight search failed: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Flight search failed: {str(e)}")
 
 
+@router.post("/search/stream")
+async def search_flights_stream(
+    request: FlightSearchRequest,
+    view: OfferView = OfferView.full,
+    fields: Optional[str] = None,
+):
+    """
+    Search for flights, streaming offers as each source returns them (NDJSON)
+    One JSON object per line: {"type": "offers", "source": ..., "offers": [...]} frames
+    as results arrive, an {"type": "error", ...} frame if the search fails part way,
+    then a final {"type": "summary", ...} frame, sent once every streamed offer is
+    stored and can be opened or booked. Filters apply as on /search; offers are not
+    sorted or paged, but with rank= the summary lists the top `limit` streamed offers
+    as ranked_offer_ids. view= and fields= work as on /search.
+    """
+    _validate_search_request(request)
+    if request.cursor:
+        raise HTTPException(status_code=400, detail="Streamed searches are not paged; use /search for cursors")
+    include = _resolve_fields(view, fields)
+
+    logger.info(f"Streaming flight search: {request.origin} -> {request.destination} on {request.departure_date}")
+
+    def frame(body: Dict[str, Any]) -> bytes:
+        return (json.dumps(body, separators=(",", ":")) + "\n").encode()
+
+    async def frames():
+        started = time.perf_counter()
+        counts: Dict[str, int] = {}
+        first_offer_ms = None
+        streamed = []
+        # The stream outlives the request handler, so it holds its own session
+        db = AsyncSessionLocal()
+        try:
+            batches = flight_search_service.stream_search(
+                db, request, include_payload=include is None or "payload" in include
+            )
+            async with aclosing(batches):
+                async for source, offers in batches:
+                    if first_offer_ms is None:
+                        first_offer_ms = round((time.perf_counter() - started) * 1000, 1)
+                    counts[source] = counts.get(source, 0) + len(offers)
+                    if request.rank:
+                        streamed.extend(offers)
+                    yield frame({
+                        "type": "offers",
+                        "source": source,
+                        "offers": [
+                            _project_offer(offer, include) if include is not None
+                            else OfferDetail.model_validate(offer).model_dump(mode="json")
+                            for offer in offers
+                        ],
+                    })
+        except AmadeusOverloadedError as e:
+            logger.warning(f"Streaming flight search shed: {str(e)}")
+            yield frame({
+                "type": "error",
+                "detail": "Flight search is busy, please try again shortly",
+                "retry_after": max(1, round(e.retry_after)),
+            })
+        except Exception as e:
+            await db.rollback()
+            logger.error(f"Streaming flight search failed: {str(e)}", exc_info=True)
+            yield frame({"type": "error", "detail": f"Flight search failed: {str(e)}"})
+        finally:
+            await db.close()
+
+        summary = {
+            "type": "summary",
+            "count": sum(counts.values()),
+            "sources": counts,
+            "first_offer_ms": first_offer_ms,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+        }
+        if request.rank:
+            ranked = offer_ranker.rank(streamed, request.rank, request.limit, request.preferred_airlines)
+            summary["ranked_offer_ids"] = [offer.offer_id for offer in ranked]
+        yield frame(summary)
+
+    return StreamingResponse(frames(), media_type="application/x-ndjson")
+
+
+@router.post("/search/batch", response_model=FlightSearchBatchResponse)
+async def search_flights_batch(
+    request: FlightSearchBatchRequest,
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Run many flight searches concurrently and cache all new offers in one bulk write.
+    Each search gets its own result entry; a failing search does not fail the batch.
+    Filters, sorting and cursors apply per search as on /search. With rank=, the
+    matching offers of every search are also ranked together into `ranked`, e.g. to
+    pick the best flight over a range of dates or of nearby airports.
+    """
+    logger.info(f"Batch flight search: {len(request.searches)} searches")
+    _validate_rank(request.rank)
+
+    async def run_search(search: FlightSearchRequest):
+        _validate_search_request(search)
+        if search.cursor:
+            return []
+        return await flight_search_service.fetch_offers_limited(search)
+
+    outcomes = await asyncio.gather(
+        *(run_search(search) for search in request.searches),
+        return_exceptions=True,
+    )
+
+    # Persist every successful search's offers together
+    all_parsed = [parsed for outcome in outcomes if isinstance(outcome, list) for parsed in outcome]
+    try:
+        await db.run_sync(flight_search_service.persist_offers, all_parsed)
+    except Exception as e:
+        await db.rollback()
+        logger.error(f"Batch flight search failed to cache offers: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Failed to cache flight offers: {str(e)}")
+
+    results: List[FlightSearchBatchResult] = []
+    for index, (search, outcome) in enumerate(zip(request.searches, outcomes)):
+        result = FlightSearchBatchResult(
+            index=index,
+            origin=search.origin.upper(),
+            destination=search.destination.upper(),
+            departure_date=search.departure_date,
+        )
+        if isinstance(outcome, HTTPException):
+            result.error = outcome.detail
+        elif isinstance(outcome, AmadeusOverloadedError):
+            result.error = "Flight search is busy, please try again shortly"
+        elif isinstance(outcome, Exception):
+            logger.error(f"Batch search {index} failed: {str(outcome)}")
+            result.error = f"Flight search failed: {str(outcome)}"
+        else:
+            try:
+                offers, result.next_cursor = await db.run_sync(flight_search_service.query_offers, search)
+                result.offers = [OfferDetail.model_validate(offer) for offer in offers]
+                result.count = len(result.offers)
+            except ValueError as e:
+                result.error = str(e)
+        results.append(result)
+
+    ranked: List[OfferDetail] = []
+    if request.rank:
+        # Keyed by offer ID, so overlapping searches do not rank an offer twice
+        matching = {
+            offer.offer_id: offer
+            for search, outcome in zip(request.searches, outcomes) if isinstance(outcome, list)
+            for offer in outcome if flight_search_service.offer_matches(search, offer)
+        }
+        ranked = [
+            OfferDetail.model_validate(offer)
+            for offer in offer_ranker.rank(
+                list(matching.values()), request.rank, request.rank_limit, request.preferred_airlines
+            )
+        ]
+
+    failed = sum(1 for result in results if result.error)
+    return FlightSearchBatchResponse(results=results, count=len(results) - failed, failed=failed, ranked=ranked)
+
+
 @router.get("/offer/{offer_id}", response_model=OfferDetail)
-async def get_offer_details(offer_id: str, db: Session = Depends(get_db)):
+async def get_offer_details(
+    offer_id: str,
+    view: OfferView = OfferView.full,
+    fields: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+):
     """
     Get details of a specific cached offer
+    Served from the in-process offer cache when possible. view=summary and fields=
+    work as on /search; the payload is only read from the database when requested.
     """
-    offer = db.query(CachedOffer).filter(CachedOffer.offer_id == offer_id).first()
-    
-    if not offer:
+    include = _resolve_fields(view, fields)
+    cache_view = OfferView.full if include is None or "payload" in include else OfferView.summary
+
+    body = offer_detail_cache.get(offer_id, cache_view)
+    if body is None:
+        stmt = select(CachedOffer).where(CachedOffer.offer_id == offer_id)
+        if cache_view == OfferView.full:
+            stmt = stmt.options(undefer(CachedOffer.payload))
+        offer = (await db.execute(stmt)).scalar_one_or_none()
+
+        if not offer:
+            raise HTTPException(status_code=404, detail="Offer not found")
+
+        # Prices are stored in the display currency already, normalized at ingestion
+        model_class = OfferDetail if cache_view == OfferView.full else OfferSummary
+        model = model_class.model_validate(offer)
+        body = offer_detail_cache.put_offer(model, offer.expire_at, cache_view)
+
+    if fields:
+        projected = {key: value for key, value in json.loads(body).items() if key in include}
+        return JSONResponse(projected)
+    return Response(content=body, media_type="application/json")
+
+
+@router.get("/offer/{offer_id}/payload", response_model=OfferPayload)
+async def get_offer_payload(offer_id: str, db: AsyncSession = Depends(get_db)):
+    """
+    Raw Amadeus payload of a cached offer, for clients that fetched the summary view
+    """
+    payload = await db.scalar(select(CachedOffer.payload).where(CachedOffer.offer_id == offer_id))
+    if payload is None:
         raise HTTPException(status_code=404, detail="Offer not found")
-    
-    # Convert USD to INR for display only (don't modify database)
-    display_price = offer.price
-    display_currency = offer.currency
-    if offer.currency == "USD":
-        display_price = offer.price * 83  # Convert to INR
-        display_currency = "INR"
-    
-    # Create a copy of the offer with converted values for response
-    offer_dict = {
-        "offer_id": offer.offer_id,
-        "origin": offer.origin,
-        "destination": offer.destination,
-        "depart_ts": offer.depart_ts,
-        "arrive_ts": offer.arrive_ts,
-        "airline": offer.airline,
-        "flight_no": offer.flight_no,
-        "price": display_price,  # Use converted price
-        "currency": display_currency,  # Use converted currency
-        "seats": offer.seats,
-        "payload": offer.payload,
-    }
-    
-    return OfferDetail.model_validate(offer_dict)
+    return OfferPayload(offer_id=offer_id, payload=payload)
+
+
+@router.get("/explore", response_model=ExploreResponse)
+async def explore_destinations(
+    origin: str,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    max_price: Optional[float] = Query(None, ge=0),
+    weekends_only: bool = False,
+    adults: int = Query(1, ge=1, le=9),
+    children: int = Query(0, ge=0, le=9),
+    infants: int = Query(0, ge=0, le=9),
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Where to fly from an origin: the cheapest cached fare to each destination departing
+    between date_from and date_to (default: the next EXPLORE_DEFAULT_DAYS days), at most
+    max_price, cheapest first. weekends_only keeps Friday and Saturday departures.
+    Answered from the precomputed route_min_prices table, so only routes and days that
+    searches or the cache warm-up have already seen are known.
+    """
+    if not validate_airport_code(origin):
+        raise HTTPException(status_code=400, detail="Invalid origin airport code")
+    start, end = _explore_range(date_from, date_to)
+    origin = origin.upper()
+    destinations = await db.run_sync(
+        route_min_price_service.explore,
+        origin,
+        passenger_mix(adults, children, infants),
+        start,
+        end,
+        max_price_minor=to_minor(max_price) if max_price is not None else None,
+        weekends_only=weekends_only,
+        limit=limit,
+    )
+    return ExploreResponse(
+        origin=origin, date_from=start, date_to=end, destinations=destinations, count=len(destinations)
+    )
+
+
+@router.get("/calendar", response_model=FareCalendarResponse)
+async def fare_calendar(
+    origin: str,
+    destination: str,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    adults: int = Query(1, ge=1, le=9),
+    children: int = Query(0, ge=0, le=9),
+    infants: int = Query(0, ge=0, le=9),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Cheapest cached one-way fare per departure day of a route between date_from and
+    date_to, from the precomputed route_min_prices table
+    """
+    if not validate_airport_code(origin):
+        raise HTTPException(status_code=400, detail="Invalid origin airport code")
+    if not validate_airport_code(destination):
+        raise HTTPException(status_code=400, detail="Invalid destination airport code")
+    start, end = _explore_range(date_from, date_to)
+    origin, destination = origin.upper(), destination.upper()
+    fares = await db.run_sync(
+        route_min_price_service.calendar, origin, destination, passenger_mix(adults, children, infants), start, end
+    )
+    return FareCalendarResponse(
+        origin=origin,
+        destination=destination,
+        date_from=start,
+        date_to=end,
+        fares=fares,
+        cheapest=min(fares, key=lambda fare: (fare["price_minor"], fare["depart_date"])) if fares else None,
+    )
 
 
 @router.get("/airports/search")
@@ -254,3 +477,28 @@ async def search_airports_endpoint(query: str = "", limit: int = 10):
     results = search_airports_data(query, limit)
     return {"airports": results}
 
+
+
+@router.get("/stats")
+async def flight_cache_stats(db: AsyncSession = Depends(get_db)):
+    """
+    Offer cache statistics: cached_offers size, expiry sweeper activity, offer detail cache,
+    Amadeus request scheduling, search log and cache warm-up activity, FX rates, the
+    connection graph, the inventory index, the exploration fares, this worker's
+    database connection pool and its booking cache
+    """
+    return {
+        "cached_offers": await db.run_sync(offer_expiry_service.table_stats),
+        "expiry_sweeper": offer_expiry_service.stats,
+        "offer_detail_cache": offer_detail_cache.stats(),
+        "amadeus_scheduler": amadeus_scheduler.stats(),
+        "search_log": {**search_log_service.stats, "last_24h": await db.run_sync(search_log_service.source_breakdown)},
+        "cache_warmup": await db.run_sync(cache_warmup_service.report),
+        "fx_rates": fx_rate_service.stats(),
+        "connection_graph": connection_graph.snapshot(),
+        "inventory_index": inventory_index.snapshot(),
+        "route_min_prices": route_min_price_service.stats,
+        "database_pool": pool_stats(),
+        "booking_cache": booking_cache.stats(),
+        "db_notifications": db_notifications.stats(),
+    }
@@ -3,8 +3,8 @@ Memory router for conversation embeddings
 """
 import logging
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from sqlalchemy import text
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.db import get_db
 from app.schemas.memory import MemorySave, MemoryRetrieve, MemoryRetrieveResponse, MemoryItem
 from app.models.convo_memory import ConvoMemory
@@ -19,7 +19,7 @@ embedding_service = EmbeddingService()
 @router.post("/save")
 async def save_memory(
     memory: MemorySave,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """
     Save conversation memory with embedding
@@ -38,8 +38,7 @@ async def save_memory(
     )
     
     db.add(convo_memory)
-    db.commit()
-    db.refresh(convo_memory)
+    await db.commit()
     
     return {"id": str(convo_memory.id), "status": "saved"}
 
@@ -47,7 +46,7 @@ async def save_memory(
 @router.post("/retrieve", response_model=MemoryRetrieveResponse)
 async def retrieve_memory(
     request: MemoryRetrieve,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """
     Retrieve relevant conversation memories using vector similarity
@@ -70,7 +69,7 @@ async def retrieve_memory(
                 LIMIT :limit
             """)
             search_pattern = f"%{request.query}%"
-            results = db.execute(
+            results = (await db.execute(
                 query,
                 {
                     "user_email": request.user_email,
@@ -78,7 +77,7 @@ async def retrieve_memory(
                     "search_pattern2": f"%{request.query[:20]}%",  # Partial match
                     "limit": request.limit,
                 }
-            ).fetchall()
+            )).fetchall()
         else:
             # Vector similarity search using pgvector
             # Format embedding as PostgreSQL array string
@@ -93,14 +92,14 @@ async def retrieve_memory(
                 LIMIT :limit
             """)
             
-            results = db.execute(
+            results = (await db.execute(
                 query,
                 {
                     "user_email": request.user_email,
                     "query_embedding": embedding_str,
                     "limit": request.limit,
                 }
-            ).fetchall()
+            )).fetchall()
         
         # Process results
         memories = []
@@ -121,13 +120,13 @@ async def retrieve_memory(
         logger.error(f"Error retrieving memory: {str(e)}, falling back to simple text search")
         # Fallback to simple text search on any error
         try:
-            memories = (
-                db.query(ConvoMemory)
-                .filter(ConvoMemory.user_email == request.user_email)
+            await db.rollback()
+            memories = (await db.execute(
+                select(ConvoMemory)
+                .where(ConvoMemory.user_email == request.user_email)
                 .order_by(ConvoMemory.created_at.desc())
                 .limit(request.limit)
-                .all()
-            )
+            )).scalars().all()
             
             return MemoryRetrieveResponse(
                 memories=[MemoryItem.model_validate(m) for m in memories],
@@ -1,14 +1,56 @@
-from .flight import FlightSearchRequest, FlightSearchResponse, OfferDetail
-from .booking import BookingRequest, BookingResponse, BookingCreate
+from .flight import (
+    FlightSearchRequest,
+    FlightSearchResponse,
+    OfferSort,
+    OfferSummary,
+    OfferDetail,
+    OfferPayload,
+    OfferView,
+    FlightSearchBatchRequest,
+    FlightSearchBatchResult,
+    FlightSearchBatchResponse,
+    ExploreFare,
+    ExploreDestination,
+    ExploreResponse,
+    FareCalendarResponse,
+)
+from .booking import (
+    BookingRequest,
+    BookingResponse,
+    BookingCreate,
+    BookingStatus,
+    BookingHistoryResponse,
+    GroupBookingItem,
+    GroupBookingRequest,
+    GroupBookingResult,
+    GroupBookingResponse,
+)
 from .memory import MemorySave, MemoryRetrieve
 
 __all__ = [
     "FlightSearchRequest",
     "FlightSearchResponse",
+    "OfferSort",
+    "OfferSummary",
     "OfferDetail",
+    "OfferPayload",
+    "OfferView",
+    "FlightSearchBatchRequest",
+    "FlightSearchBatchResult",
+    "FlightSearchBatchResponse",
+    "ExploreFare",
+    "ExploreDestination",
+    "ExploreResponse",
+    "FareCalendarResponse",
     "BookingRequest",
     "BookingResponse",
     "BookingCreate",
+    "BookingStatus",
+    "BookingHistoryResponse",
+    "GroupBookingItem",
+    "GroupBookingRequest",
+    "GroupBookingResult",
+    "GroupBookingResponse",
     "MemorySave",
     "MemoryRetrieve",
 ]
@@ -4,6 +4,7 @@ Booking-related Pydantic schemas
 from pydantic import BaseModel, EmailStr, Field
 from typing import List, Dict, Any, Optional
 from datetime import datetime
+from enum import Enum
 
 
 class PassengerDetail(BaseModel):
@@ -19,6 +20,9 @@ class BookingRequest(BaseModel):
     passengers: List[PassengerDetail]
     user_email: EmailStr
     food_preference: bool = False
+    # Chat conversation booking the offer; without an Idempotency-Key header, repeats of
+    # the same booking from one conversation return the first booking
+    conversation_id: Optional[str] = None
 
 
 class BookingCreate(BaseModel):
@@ -35,6 +39,7 @@ class BookingResponse(BaseModel):
     offer_id: str
     passengers: List[Dict[str, Any]]
     total_amount: float
+    total_amount_minor: Optional[int] = None  # total in minor units (paise)
     currency: str
     payment_status: str
     status: str
@@ -43,7 +48,47 @@ class BookingResponse(BaseModel):
     destination: Optional[str] = None
     origin_city: Optional[str] = None
     destination_city: Optional[str] = None
+    depart_ts: Optional[datetime] = None  # departure of the booked flight, when its offer is still cached
     created_at: datetime
 
     model_config = {"from_attributes": True}
 
+
+class BookingStatus(str, Enum):
+    confirmed = "confirmed"
+    cancelled = "cancelled"
+
+
+class BookingHistoryResponse(BaseModel):
+    bookings: List[BookingResponse]  # newest first
+    count: int  # bookings on this page
+    total: int  # bookings matching the filters, across all pages
+    status_counts: Dict[str, int]  # bookings per status in the date range
+    next_cursor: Optional[str] = None  # set when more bookings match
+
+
+class GroupBookingItem(BaseModel):
+    offer_id: str
+    passengers: List[PassengerDetail] = Field(..., min_length=1)
+    food_preference: bool = False
+
+
+class GroupBookingRequest(BaseModel):
+    user_email: EmailStr
+    bookings: List[GroupBookingItem] = Field(..., min_length=1, max_length=50, description="Bookings to make")
+    # Book nothing unless every booking can be made
+    all_or_nothing: bool = False
+
+
+class GroupBookingResult(BaseModel):
+    index: int  # position of the booking in the request
+    offer_id: str
+    booking: Optional[BookingResponse] = None
+    error: Optional[str] = None
+
+
+class GroupBookingResponse(BaseModel):
+    results: List[GroupBookingResult]
+    count: int  # bookings made
+    failed: int
+    passengers: int  # passengers on the bookings made
@@ -3,20 +3,44 @@ Flight-related Pydantic schemas
 """
 from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any
-from datetime import datetime
+from datetime import date, datetime
+from enum import Enum
+
+
+class OfferSort(str, Enum):
+    price = "price"
+    departure = "departure"
+    arrival = "arrival"
+    duration = "duration"
+
+
+TIME_OF_DAY_PATTERN = r"^([01]\d|2[0-3]):[0-5]\d$"
 
 
 class FlightSearchRequest(BaseModel):
     origin: str = Field(..., description="Origin airport code (e.g., JFK)")
     destination: str = Field(..., description="Destination airport code (e.g., LAX)")
     departure_date: str = Field(..., description="Departure date (YYYY-MM-DD)")
-    return_date: Optional[str] = Field(None, description="Return date (YYYY-MM-DD)")
+    return_date: Optional[str] = Field(None, description="Return date (YYYY-MM-DD); searches round trips")
     adults: int = Field(1, ge=1, le=9, description="Number of adult passengers")
     children: int = Field(0, ge=0, le=9, description="Number of children")
     infants: int = Field(0, ge=0, le=9, description="Number of infants")
+    # Filters, sorting and paging over the cached offers for this search
+    min_price: Optional[float] = Field(None, ge=0, description="Minimum total price")
+    max_price: Optional[float] = Field(None, ge=0, description="Maximum total price")
+    depart_after: Optional[str] = Field(None, pattern=TIME_OF_DAY_PATTERN, description="Earliest departure time (HH:MM)")
+    depart_before: Optional[str] = Field(None, pattern=TIME_OF_DAY_PATTERN, description="Latest departure time (HH:MM)")
+    airlines: Optional[List[str]] = Field(None, description="Airline codes to include (e.g., [\"AI\", \"6E\"])")
+    max_stops: Optional[int] = Field(None, ge=0, le=3, description="Maximum number of stops")
+    max_duration_minutes: Optional[int] = Field(None, ge=1, description="Maximum journey duration in minutes")
+    sort_by: OfferSort = Field(OfferSort.price, description="Sort key; ties are broken by offer ID")
+    rank: Optional[str] = Field(None, description="Scoring profile (cheapest, fastest, best, convenient, ...); returns the top `limit` offers by score instead of sorting, without paging")
+    preferred_airlines: Optional[List[str]] = Field(None, description="Airline codes ranked ahead of others by their profile's preference bonus")
+    limit: int = Field(15, ge=1, le=100, description="Offers per page")
+    cursor: Optional[str] = Field(None, description="next_cursor from the previous page")
 
 
-class OfferDetail(BaseModel):
+class OfferSummary(BaseModel):
     offer_id: str
     origin: str
     destination: str
@@ -24,15 +48,95 @@ class OfferDetail(BaseModel):
     arrive_ts: datetime
     airline: str
     flight_no: str
+    return_depart_ts: Optional[datetime] = None  # set for round trips
+    return_arrive_ts: Optional[datetime] = None
+    return_flight_no: Optional[str] = None
     price: float
     currency: str
+    price_minor: Optional[int] = None  # price in minor units (paise)
+    source_currency: Optional[str] = None  # currency the upstream quoted in
+    source_price_minor: Optional[int] = None
     seats: int
-    payload: Dict[str, Any]
+    duration_minutes: Optional[int] = None
+    stops: Optional[int] = None
+    offer_source: Optional[str] = None  # upstream, paired (round trip) or connection
 
     model_config = {"from_attributes": True}
 
 
+class OfferDetail(OfferSummary):
+    payload: Dict[str, Any]  # Raw Amadeus offer
+
+
+class OfferPayload(BaseModel):
+    offer_id: str
+    payload: Dict[str, Any]
+
+
 class FlightSearchResponse(BaseModel):
     offers: List[OfferDetail]
     count: int
+    next_cursor: Optional[str] = None  # Set when more offers match
+
+
+class OfferView(str, Enum):
+    summary = "summary"
+    full = "full"
+
+
+
+class FlightSearchBatchRequest(BaseModel):
+    searches: List[FlightSearchRequest] = Field(..., min_length=1, max_length=50, description="Searches to run")
+    # Calendar and multi-airport searches: one ranking over every search's offers
+    rank: Optional[str] = Field(None, description="Scoring profile ranking the offers of all searches together")
+    rank_limit: int = Field(20, ge=1, le=100, description="Offers in the combined ranking")
+    preferred_airlines: Optional[List[str]] = Field(None, description="Airline codes preferred by the combined ranking")
+
+
+class FlightSearchBatchResult(BaseModel):
+    index: int
+    origin: str
+    destination: str
+    departure_date: str
+    offers: List[OfferDetail] = []
+    count: int = 0
+    next_cursor: Optional[str] = None
+    error: Optional[str] = None
+
+
+class FlightSearchBatchResponse(BaseModel):
+    results: List[FlightSearchBatchResult]
+    count: int
+    failed: int
+    ranked: List[OfferDetail] = []  # set when the request asks for a combined ranking
+
+
+class ExploreFare(BaseModel):
+    depart_date: date
+    price: float
+    price_minor: int
+    currency: str
+    airline: str
+    offer_id: str  # the cached offer quoting the fare
+
 
+class ExploreDestination(ExploreFare):
+    destination: str
+    city: Optional[str] = None
+
+
+class ExploreResponse(BaseModel):
+    origin: str
+    date_from: date
+    date_to: date
+    destinations: List[ExploreDestination]  # cheapest destination first
+    count: int
+
+
+class FareCalendarResponse(BaseModel):
+    origin: str
+    destination: str
+    date_from: date
+    date_to: date
+    fares: List[ExploreFare]  # by departure day; days without a cached fare are absent
+    cheapest: Optional[ExploreFare] = None
@@ -0,0 +1,278 @@
+"""
+Amadeus Request Scheduler
+Process-wide token bucket that every Amadeus HTTP call passes through, with
+priority classes, load shedding and an optional budget shared across processes
+"""
+import os
+import time
+import heapq
+import asyncio
+import itertools
+from collections import deque
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import Dict, Any, List, Optional, Callable, Tuple
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from app.db import SessionLocal
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+AMADEUS_RATE_LIMIT = float(os.getenv("AMADEUS_RATE_LIMIT", "10"))  # requests per second per process
+AMADEUS_RATE_BURST = float(os.getenv("AMADEUS_RATE_BURST", str(AMADEUS_RATE_LIMIT)))
+AMADEUS_MAX_QUEUE = int(os.getenv("AMADEUS_MAX_QUEUE", "100"))
+# Shared requests-per-second budget for all processes; unset disables the database check
+AMADEUS_GLOBAL_RATE_LIMIT = int(os.getenv("AMADEUS_GLOBAL_RATE_LIMIT", "0"))
+QUEUE_WAIT_SAMPLES = 500
+
+
+class RequestPriority(IntEnum):
+    """Lower value is served first"""
+    INTERACTIVE = 0  # a user is waiting on the answer (chat and UI searches)
+    PREFETCH = 1  # fan-outs likely to be shown soon (batch and calendar searches)
+    BACKGROUND = 2  # cache refreshes and warm-ups
+
+
+# Longest a request may wait for a slot before it is shed
+MAX_QUEUE_WAIT_SECONDS = {
+    RequestPriority.INTERACTIVE: float(os.getenv("AMADEUS_MAX_WAIT_INTERACTIVE", "10")),
+    RequestPriority.PREFETCH: float(os.getenv("AMADEUS_MAX_WAIT_PREFETCH", "5")),
+    RequestPriority.BACKGROUND: float(os.getenv("AMADEUS_MAX_WAIT_BACKGROUND", "2")),
+}
+
+# Takes one request from the current second's shared budget, using the database clock
+# so that every host agrees on the window. Returns no row once the budget is used up.
+_CLAIM_GLOBAL_SQL = text("""
+    INSERT INTO amadeus_rate_budget (window_second, used)
+    VALUES (floor(extract(epoch FROM clock_timestamp()))::bigint, 1)
+    ON CONFLICT (window_second) DO UPDATE SET used = amadeus_rate_budget.used + 1
+    WHERE amadeus_rate_budget.used < :limit
+    RETURNING used
+""")
+_PRUNE_GLOBAL_SQL = text("""
+    DELETE FROM amadeus_rate_budget
+    WHERE window_second < floor(extract(epoch FROM clock_timestamp()))::bigint - 60
+""")
+
+
+class AmadeusOverloadedError(Exception):
+    """Raised when a request is shed instead of queued for the Amadeus rate limit"""
+
+    def __init__(self, priority: RequestPriority, retry_after: float):
+        super().__init__(f"Amadeus request budget exhausted for {priority.name.lower()} traffic")
+        self.priority = priority
+        self.retry_after = retry_after
+
+
+@dataclass
+class _Waiter:
+    priority: RequestPriority
+    enqueued_at: float
+    deadline: float
+    future: asyncio.Future
+
+
+@dataclass
+class _PriorityStats:
+    requests: int = 0
+    granted: int = 0
+    shed: int = 0
+    waits_ms: deque = field(default_factory=lambda: deque(maxlen=QUEUE_WAIT_SAMPLES))
+
+    def snapshot(self, queued: int) -> Dict[str, Any]:
+        waits = sorted(self.waits_ms)
+
+        def percentile(p: float) -> Optional[float]:
+            return round(waits[min(int(len(waits) * p), len(waits) - 1)], 1) if waits else None
+
+        return {
+            "requests": self.requests,
+            "granted": self.granted,
+            "shed": self.shed,
+            "queued": queued,
+            "queue_wait_ms_p50": percentile(0.5),
+            "queue_wait_ms_p95": percentile(0.95),
+            "queue_wait_ms_max": round(waits[-1], 1) if waits else None,
+        }
+
+
+class AmadeusRequestScheduler:
+    """
+    Token bucket shared by all Amadeus calls in the process.
+
+    Requests wait in a priority queue (interactive before prefetch before background,
+    FIFO within a class). A request is shed with AmadeusOverloadedError when its
+    expected wait exceeds its class's MAX_QUEUE_WAIT_SECONDS, when it is still queued
+    at that deadline, or when the queue is full; a full queue evicts the newest
+    lower-priority waiter before turning away higher-priority work.
+    """
+
+    def __init__(
+        self,
+        rate: float = AMADEUS_RATE_LIMIT,
+        burst: float = AMADEUS_RATE_BURST,
+        max_queue: int = AMADEUS_MAX_QUEUE,
+        global_rate: int = AMADEUS_GLOBAL_RATE_LIMIT,
+        session_factory: Callable[[], Session] = SessionLocal,
+    ):
+        self.rate = rate
+        self.burst = max(burst, 1.0)
+        self.max_queue = max_queue
+        self.global_rate = global_rate
+        self.session_factory = session_factory
+        self._tokens = self.burst
+        self._refilled_at = time.monotonic()
+        self._paused_until = 0.0
+        self._queue: List[Tuple[int, int, _Waiter]] = []
+        self._sequence = itertools.count()
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._stats = {priority: _PriorityStats() for priority in RequestPriority}
+        self.backoffs = 0
+        self.global_claims = 0
+        self.global_denials = 0
+
+    def _refill(self, now: float) -> None:
+        start = max(self._refilled_at, self._paused_until)
+        if now > start:
+            self._tokens = min(self.burst, self._tokens + (now - start) * self.rate)
+        self._refilled_at = max(now, self._refilled_at)
+
+    def _queued(self, priority: Optional[RequestPriority] = None) -> int:
+        return sum(
+            1 for _, _, waiter in self._queue
+            if not waiter.future.done() and (priority is None or waiter.priority == priority)
+        )
+
+    def _shed(self, waiter: _Waiter, retry_after: float) -> None:
+        if not waiter.future.done():
+            waiter.future.set_exception(AmadeusOverloadedError(waiter.priority, retry_after))
+            self._stats[waiter.priority].shed += 1
+
+    async def acquire(self, priority: RequestPriority = RequestPriority.INTERACTIVE) -> None:
+        """Wait for a request slot, or raise AmadeusOverloadedError if the request is shed"""
+        now = time.monotonic()
+        self._refill(now)
+        stats = self._stats[priority]
+        stats.requests += 1
+
+        if not self._queued() and self._tokens >= 1 and now >= self._paused_until:
+            self._tokens -= 1
+        else:
+            ahead = sum(1 for p, _, w in self._queue if p <= priority and not w.future.done())
+            expected_wait = max(self._paused_until - now, 0) + max(ahead + 1 - self._tokens, 0) / self.rate
+            if expected_wait > MAX_QUEUE_WAIT_SECONDS[priority]:
+                stats.shed += 1
+                raise AmadeusOverloadedError(priority, expected_wait)
+            if self._queued() >= self.max_queue and not self._evict_below(priority, expected_wait):
+                stats.shed += 1
+                raise AmadeusOverloadedError(priority, expected_wait)
+
+            waiter = _Waiter(
+                priority=priority,
+                enqueued_at=now,
+                deadline=now + MAX_QUEUE_WAIT_SECONDS[priority],
+                future=asyncio.get_running_loop().create_future(),
+            )
+            heapq.heappush(self._queue, (int(priority), next(self._sequence), waiter))
+            if self._dispatcher is None or self._dispatcher.done():
+                self._dispatcher = asyncio.create_task(self._dispatch())
+            await waiter.future  # cancellation leaves the future done; the dispatcher skips it
+
+        if self.global_rate > 0:
+            await self._claim_global(priority)
+
+        stats.granted += 1
+        stats.waits_ms.append((time.monotonic() - now) * 1000)
+
+    def _evict_below(self, priority: RequestPriority, retry_after: float) -> bool:
+        """Shed the newest queued request of the lowest priority below the given one"""
+        candidates = [
+            (p, seq, waiter) for p, seq, waiter in self._queue
+            if p > priority and not waiter.future.done()
+        ]
+        if not candidates:
+            return False
+        self._shed(max(candidates, key=lambda entry: (entry[0], entry[1]))[2], retry_after)
+        return True
+
+    async def _dispatch(self) -> None:
+        """Hand out tokens to queued requests in priority order until the queue drains"""
+        while self._queue:
+            now = time.monotonic()
+            self._refill(now)
+            for _, _, waiter in self._queue:
+                if not waiter.future.done() and waiter.deadline <= now:
+                    self._shed(waiter, 1 / self.rate)
+
+            _, _, waiter = self._queue[0]
+            if waiter.future.done():
+                heapq.heappop(self._queue)
+                continue
+            if self._tokens >= 1 and now >= self._paused_until:
+                heapq.heappop(self._queue)
+                self._tokens -= 1
+                waiter.future.set_result(None)
+                continue
+            await asyncio.sleep(max(self._paused_until - now, (1 - self._tokens) / self.rate, 0.001))
+
+    async def _claim_global(self, priority: RequestPriority) -> None:
+        """Take a slot from the shared per-second budget, waiting for the next second if needed"""
+        deadline = time.monotonic() + MAX_QUEUE_WAIT_SECONDS[priority]
+        while True:
+            try:
+                claimed = await asyncio.to_thread(self._claim_global_slot)
+            except Exception as e:
+                # The shared budget is best effort; the local bucket still applies
+                logger.warning(f"Shared Amadeus budget unavailable, continuing: {str(e)}")
+                return
+            if claimed:
+                self.global_claims += 1
+                return
+            self.global_denials += 1
+            wait = 1 - (time.time() % 1)
+            if time.monotonic() + wait > deadline:
+                self._stats[priority].shed += 1
+                raise AmadeusOverloadedError(priority, wait)
+            await asyncio.sleep(wait)
+
+    def _claim_global_slot(self) -> bool:
+        db = self.session_factory()
+        try:
+            claimed = db.execute(_CLAIM_GLOBAL_SQL, {"limit": self.global_rate}).scalar() is not None
+            if claimed and self.global_claims % 500 == 0:
+                db.execute(_PRUNE_GLOBAL_SQL)
+            db.commit()
+            return claimed
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def backoff(self, seconds: float) -> None:
+        """Stop handing out tokens for a while, e.g. after Amadeus answered 429"""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._tokens = 0
+        self.backoffs += 1
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        self._refill(now)
+        return {
+            "rate_per_second": self.rate,
+            "burst": self.burst,
+            "tokens": round(self._tokens, 2),
+            "paused_for_seconds": round(max(self._paused_until - now, 0), 2),
+            "backoffs": self.backoffs,
+            "global_rate_per_second": self.global_rate or None,
+            "global_claims": self.global_claims,
+            "global_denials": self.global_denials,
+            "priorities": {
+                priority.name.lower(): self._stats[priority].snapshot(self._queued(priority))
+                for priority in RequestPriority
+            },
+        }
+
+
+amadeus_scheduler = AmadeusRequestScheduler()
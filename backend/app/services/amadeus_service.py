@@ -2,27 +2,52 @@
 Amadeus API Service
 """
 import os
+import asyncio
 import httpx
-from typing import List, Dict, Any, Optional
+from typing import AsyncIterator, List, Dict, Any, Optional
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
 from app.utils.logger import get_logger
+from app.utils.offer_ids import derive_offer_id
+from app.utils.json_stream import JsonArrayItemParser
+from app.services.amadeus_scheduler import (
+    AmadeusRequestScheduler,
+    AmadeusOverloadedError,
+    RequestPriority,
+    amadeus_scheduler,
+)
 
 load_dotenv()
 logger = get_logger(__name__)
 
+AMADEUS_API_MAX_OFFERS = 250  # largest `max` the flight-offers endpoint accepts
+AMADEUS_MAX_OFFERS = min(int(os.getenv("AMADEUS_MAX_OFFERS", str(AMADEUS_API_MAX_OFFERS))), AMADEUS_API_MAX_OFFERS)
+
 
 class AmadeusService:
     """Service for interacting with Amadeus Flight Search API"""
 
-    def __init__(self):
+    def __init__(self, scheduler: Optional[AmadeusRequestScheduler] = None):
+        self.scheduler = scheduler or amadeus_scheduler
         self.api_key = os.getenv("AMADEUS_API_KEY")
         self.api_secret = os.getenv("AMADEUS_API_SECRET")
         self.base_url = os.getenv("AMADEUS_BASE_URL", "https://test.api.amadeus.com")
         self.access_token: Optional[str] = None
         self.token_expires_at: Optional[datetime] = None
+        # One token refresh at a time, so concurrent searches don't each spend a request on it
+        self._token_lock = asyncio.Lock()
+
+    def _back_off_if_throttled(self, response: httpx.Response) -> None:
+        """Pause the shared scheduler when Amadeus reports its rate limit was hit"""
+        if response.status_code == 429:
+            try:
+                retry_after = float(response.headers.get("Retry-After", "1"))
+            except ValueError:
+                retry_after = 1.0
+            logger.warning(f"⚠️ Amadeus rate limit hit, pausing requests for {retry_after}s")
+            self.scheduler.backoff(retry_after)
 
-    async def _get_access_token(self) -> str:
+    async def _get_access_token(self, priority: RequestPriority = RequestPriority.INTERACTIVE) -> str:
         """Get or refresh Amadeus access token"""
         if self.access_token and self.token_expires_at and datetime.now() < self.token_expires_at:
             return self.access_token
@@ -31,29 +56,35 @@ class AmadeusService:
             logger.warning("⚠️ Amadeus API credentials not configured, will use mock data")
             return None
 
-        try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.base_url}/v1/security/oauth2/token",
-                    data={
-                        "grant_type": "client_credentials",
-                        "client_id": self.api_key,
-                        "client_secret": self.api_secret,
-                    },
-                    headers={"Content-Type": "application/x-www-form-urlencoded"},
-                )
-                response.raise_for_status()
-                data = response.json()
-                self.access_token = data["access_token"]
-                expires_in = data.get("expires_in", 1800)
-                self.token_expires_at = datetime.now().replace(
-                    microsecond=0
-                ) + timedelta(seconds=expires_in - 60)
-                logger.info("✅ Amadeus access token obtained successfully - REAL API will be used")
+        async with self._token_lock:
+            if self.access_token and self.token_expires_at and datetime.now() < self.token_expires_at:
                 return self.access_token
-        except Exception as e:
-            logger.error(f"Failed to get Amadeus access token: {str(e)}")
-            return None
+
+            await self.scheduler.acquire(priority)
+            try:
+                async with httpx.AsyncClient() as client:
+                    response = await client.post(
+                        f"{self.base_url}/v1/security/oauth2/token",
+                        data={
+                            "grant_type": "client_credentials",
+                            "client_id": self.api_key,
+                            "client_secret": self.api_secret,
+                        },
+                        headers={"Content-Type": "application/x-www-form-urlencoded"},
+                    )
+                    self._back_off_if_throttled(response)
+                    response.raise_for_status()
+                    data = response.json()
+                    self.access_token = data["access_token"]
+                    expires_in = data.get("expires_in", 1800)
+                    self.token_expires_at = datetime.now().replace(
+                        microsecond=0
+                    ) + timedelta(seconds=expires_in - 60)
+                    logger.info("✅ Amadeus access token obtained successfully - REAL API will be used")
+                    return self.access_token
+            except Exception as e:
+                logger.error(f"Failed to get Amadeus access token: {str(e)}")
+                return None
 
     async def search_flights(
         self,
@@ -64,12 +95,39 @@ class AmadeusService:
         adults: int = 1,
         children: int = 0,
         infants: int = 0,
+        priority: RequestPriority = RequestPriority.INTERACTIVE,
     ) -> List[Dict[str, Any]]:
         """
         Search for flights using Amadeus API
-        Returns list of flight offers
+        Returns list of flight offers; see stream_flight_offers
         """
-        token = await self._get_access_token()
+        return [
+            offer async for offer in self.stream_flight_offers(
+                origin, destination, departure_date, return_date, adults, children, infants, priority
+            )
+        ]
+
+    async def stream_flight_offers(
+        self,
+        origin: str,
+        destination: str,
+        departure_date: str,
+        return_date: Optional[str] = None,
+        adults: int = 1,
+        children: int = 0,
+        infants: int = 0,
+        priority: RequestPriority = RequestPriority.INTERACTIVE,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Search for flights using Amadeus API, yielding each offer as soon as it has been
+        decoded from the response body, so callers can parse and filter while the rest
+        is still downloading. Up to AMADEUS_MAX_OFFERS offers are requested.
+        Every upstream call waits for a slot from the shared request scheduler;
+        raises AmadeusOverloadedError when the request is shed at this priority.
+        Without credentials, one-way searches yield mock flights; an upstream failure
+        ends the stream early, and topping up thin results is left to the caller
+        """
+        token = await self._get_access_token(priority)
 
         params = {
             "originLocationCode": origin.upper(),
@@ -79,157 +137,73 @@ class AmadeusService:
             "children": children,
             "infants": infants,
             "currencyCode": "INR",  # Request INR currency (will fallback to USD if not supported)
-            "max": 15,  # Limit to 15 offers
+            "max": AMADEUS_MAX_OFFERS,
         }
 
         if return_date:
             params["returnDate"] = return_date
 
         if not token:
-            logger.info(f"⚠️ Using MOCK flight data (no Amadeus credentials or token failed) for route: {origin.upper()} -> {destination.upper()}")
-            return self._get_mock_flights(origin, destination, departure_date)
+            # Mock data is one-way only; round trips are paired from one-way searches instead
+            if not return_date:
+                logger.info(f"⚠️ Using MOCK flight data (no Amadeus credentials or token failed) for route: {origin.upper()} -> {destination.upper()}")
+                for flight in self.get_mock_flights(origin, destination, departure_date, adults, children, infants):
+                    yield flight
+            return
 
+        yielded = 0
         try:
             async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"{self.base_url}/v2/shopping/flight-offers",
-                    headers={"Authorization": f"Bearer {token}"},
-                    params=params,
-                    timeout=30.0,
-                )
-
-                if response.status_code == 200:
-                    data = response.json()
-                    flights = data.get("data", [])
-                    logger.info(f"✅ Retrieved {len(flights)} REAL flights from Amadeus API")
-                    if flights:
-                        # Log first flight price for verification
-                        first_price = flights[0].get("price", {})
-                        logger.info(f"Sample flight price: {first_price.get('total', 'N/A')} {first_price.get('currency', 'N/A')}")
-                    
-                    # Check airline variety - if all flights are from same airline, supplement with mock data
-                    if flights:
-                        airlines_in_response = set()
-                        for flight in flights:
-                            itinerary = flight.get("itineraries", [{}])[0]
-                            segments = itinerary.get("segments", [])
-                            if segments:
-                                airlines_in_response.add(segments[0].get("carrierCode", ""))
-                        
-                        # If we have less than 3 different airlines or less than 15 flights, supplement with mock
-                        if len(airlines_in_response) < 3 or len(flights) < 15:
-                            logger.info(f"Only {len(airlines_in_response)} airline(s) ({', '.join(airlines_in_response)}) found in real API results, supplementing with mock data to ensure variety")
-                            mock_flights = self._get_mock_flights(origin, destination, departure_date)
-                            # Combine real and mock flights, prioritizing real ones
-                            # Remove duplicates based on airline+flight_no
-                            combined = flights.copy()
-                            existing_flights = set()
-                            for f in flights:
-                                try:
-                                    itinerary = f.get("itineraries", [{}])[0]
-                                    segments = itinerary.get("segments", [])
-                                    if segments:
-                                        carrier = segments[0].get("carrierCode", "")
-                                        number = segments[0].get("number", "")
-                                        existing_flights.add((carrier, number))
-                                except:
-                                    pass
-                            
-                            # Add mock flights that don't duplicate existing ones
-                            for mock_flight in mock_flights:
-                                try:
-                                    mock_itinerary = mock_flight.get("itineraries", [{}])[0]
-                                    mock_segments = mock_itinerary.get("segments", [])
-                                    if mock_segments:
-                                        mock_airline = mock_segments[0].get("carrierCode", "")
-                                        mock_number = mock_segments[0].get("number", "")
-                                        if (mock_airline, mock_number) not in existing_flights:
-                                            combined.append(mock_flight)
-                                            existing_flights.add((mock_airline, mock_number))
-                                            if len(combined) >= 15:
-                                                break
-                                except:
-                                    continue
-                            
-                            logger.info(f"Returning {len(combined)} flights (real: {len(flights)}, mock: {len(combined) - len(flights)})")
-                            return combined[:15]
-                    
-                    return flights
-                elif response.status_code == 400:
-                    # Try with USD if INR is not supported
-                    logger.warning(f"Amadeus API returned 400 (possibly INR not supported), retrying with USD")
-                    params["currencyCode"] = "USD"
-                    retry_response = await client.get(
+                for currency in ("INR", "USD"):
+                    params["currencyCode"] = currency
+                    await self.scheduler.acquire(priority)
+                    async with client.stream(
+                        "GET",
                         f"{self.base_url}/v2/shopping/flight-offers",
                         headers={"Authorization": f"Bearer {token}"},
                         params=params,
                         timeout=30.0,
-                    )
-                    if retry_response.status_code == 200:
-                        data = retry_response.json()
-                        flights = data.get("data", [])
-                        logger.info(f"✅ Retrieved {len(flights)} REAL flights from Amadeus API (USD, will convert to INR)")
-                        
-                        # Check airline variety and supplement if needed
-                        if flights:
-                            airlines_in_response = set()
-                            for flight in flights:
-                                itinerary = flight.get("itineraries", [{}])[0]
-                                segments = itinerary.get("segments", [])
-                                if segments:
-                                    airlines_in_response.add(segments[0].get("carrierCode", ""))
-                            
-                            if len(airlines_in_response) < 3 or len(flights) < 15:
-                                logger.info(f"Only {len(airlines_in_response)} airline(s) ({', '.join(airlines_in_response)}) found, supplementing with mock data to ensure variety")
-                                mock_flights = self._get_mock_flights(origin, destination, departure_date)
-                                combined = flights.copy()
-                                existing_flights = set()
-                                for f in flights:
-                                    try:
-                                        itinerary = f.get("itineraries", [{}])[0]
-                                        segments = itinerary.get("segments", [])
-                                        if segments:
-                                            carrier = segments[0].get("carrierCode", "")
-                                            number = segments[0].get("number", "")
-                                            existing_flights.add((carrier, number))
-                                    except:
-                                        pass
-                                
-                                # Add mock flights that don't duplicate existing ones
-                                for mock_flight in mock_flights:
-                                    try:
-                                        mock_itinerary = mock_flight.get("itineraries", [{}])[0]
-                                        mock_segments = mock_itinerary.get("segments", [])
-                                        if mock_segments:
-                                            mock_airline = mock_segments[0].get("carrierCode", "")
-                                            mock_number = mock_segments[0].get("number", "")
-                                            if (mock_airline, mock_number) not in existing_flights:
-                                                combined.append(mock_flight)
-                                                existing_flights.add((mock_airline, mock_number))
-                                                if len(combined) >= 15:
-                                                    break
-                                    except:
-                                        continue
-                                
-                                logger.info(f"Returning {len(combined)} flights (real: {len(flights)}, mock: {len(combined) - len(flights)})")
-                                return combined[:15]
-                        
-                        return flights
-                    else:
-                        logger.warning(f"Amadeus API returned status {retry_response.status_code}, using mock data")
-                        return self._get_mock_flights(origin, destination, departure_date)
-                else:
-                    logger.warning(f"Amadeus API returned status {response.status_code}, using mock data")
-                    return self._get_mock_flights(origin, destination, departure_date)
+                    ) as response:
+                        self._back_off_if_throttled(response)
+                        if response.status_code == 400 and currency == "INR":
+                            # Try with USD if INR is not supported
+                            logger.warning(f"Amadeus API returned 400 (possibly INR not supported), retrying with USD")
+                            continue
+                        if response.status_code != 200:
+                            logger.warning(f"Amadeus API returned status {response.status_code}")
+                            break
+
+                        parser = JsonArrayItemParser("data")
+                        async for chunk in response.aiter_bytes():
+                            for flight in parser.feed(chunk):
+                                if not yielded:
+                                    # Log first flight price for verification
+                                    first_price = flight.get("price", {})
+                                    logger.info(f"Sample flight price: {first_price.get('total', 'N/A')} {first_price.get('currency', 'N/A')}")
+                                yielded += 1
+                                yield flight
+                            if parser.done:
+                                break
+                        for flight in parser.close():
+                            yielded += 1
+                            yield flight
+                        logger.info(f"✅ Retrieved {parser.items_decoded} REAL flights from Amadeus API ({currency})")
+                        break
+        except AmadeusOverloadedError:
+            raise
         except Exception as e:
-            logger.warning(f"Amadeus API request failed: {str(e)}, using mock data")
-            return self._get_mock_flights(origin, destination, departure_date)
+            logger.warning(f"Amadeus API request failed after {yielded} offers: {str(e)}")
 
-    def _get_mock_flights(
-        self, origin: str, destination: str, departure_date: str
+    def get_mock_flights(
+        self,
+        origin: str,
+        destination: str,
+        departure_date: str,
+        adults: int = 1,
+        children: int = 0,
+        infants: int = 0,
     ) -> List[Dict[str, Any]]:
         """Generate mock flight data for testing"""
-        import uuid
         from datetime import datetime, timedelta
 
         # Ensure origin and destination are uppercase
@@ -248,9 +222,10 @@ class AmadeusService:
             "2874", "3456", "7890", "1234", "5678"
         ]
 
+        traveler_types = ["ADULT"] * adults + ["CHILD"] * children + ["HELD_INFANT"] * infants
+
         mock_flights = []
         for i, (airline, flight_no) in enumerate(zip(airlines[:15], flight_numbers[:15])):
-            offer_id = f"OFFER_{uuid.uuid4().hex[:8].upper()}"
             # Distribute flights throughout the day (6 AM to 11 PM)
             hour = 6 + (i * 1) % 18  # Hours from 6 to 23
             minute = (15 + (i * 10)) % 60  # Ensure minute stays within 0-59
@@ -260,9 +235,8 @@ class AmadeusService:
             duration_minutes = (30 + (i * 5)) % 60  # Ensure minutes stay within 0-59
             arrive_time = depart_time + timedelta(hours=duration_hours, minutes=duration_minutes)
 
-            mock_flights.append({
+            mock_flight = {
                 "type": "flight-offer",
-                "id": offer_id,
                 "source": "GDS",
                 "instantTicketingRequired": False,
                 "nonHomogeneous": False,
@@ -271,7 +245,7 @@ class AmadeusService:
                 "numberOfBookableSeats": 9,
                 "itineraries": [
                     {
-                        "duration": f"PT{5+i}H",
+                        "duration": f"PT{duration_hours}H{duration_minutes}M",
                         "segments": [
                             {
                                 "departure": {
@@ -287,7 +261,8 @@ class AmadeusService:
                                 "carrierCode": airline,
                                 "number": flight_no,
                                 "aircraft": {"code": "320"},
-                                "duration": f"PT{5+i}H",
+                                "duration": f"PT{duration_hours}H{duration_minutes}M",
+                                "id": "1",
                                 "numberOfStops": 0,
                             }
                         ],
@@ -295,13 +270,13 @@ class AmadeusService:
                 ],
                 "price": {
                     "currency": "INR",
-                    "total": str(int((299.99 + i * 50) * 83)),  # Convert USD to INR (1 USD ≈ 83 INR)
-                    "base": str(int((250.00 + i * 40) * 83)),
+                    "total": str(24899 + i * 4150),
+                    "base": str(20750 + i * 3320),
                     "fees": [
                         {"amount": "0.00", "type": "SUPPLIER"},
                         {"amount": "0.00", "type": "TICKETING"},
                     ],
-                    "grandTotal": str(int((299.99 + i * 50) * 83)),
+                    "grandTotal": str(24899 + i * 4150),
                 },
                 "pricingOptions": {
                     "fareType": ["PUBLISHED"],
@@ -310,17 +285,24 @@ class AmadeusService:
                 "validatingAirlineCodes": [flight_no[:2]],
                 "travelerPricings": [
                     {
-                        "travelerId": "1",
+                        "travelerId": str(traveler_id),
                         "fareOption": "STANDARD",
-                        "travelerType": "ADULT",
+                        "travelerType": traveler_type,
                         "price": {
-                            "currency": "USD",
-                            "total": str(299.99 + i * 50),
-                            "base": str(250.00 + i * 40),
+                            "currency": "INR",
+                            "total": str(24899 + i * 4150),
+                            "base": str(20750 + i * 3320),
                         },
+                        "fareDetailsBySegment": [
+                            {"segmentId": "1", "cabin": "ECONOMY", "fareBasis": f"Y{airline}{i:02d}", "class": "Y"}
+                        ],
                     }
+                    for traveler_id, traveler_type in enumerate(traveler_types, 1)
                 ],
-            })
+            }
+            # Same flight, fare and passengers -> same id on every search
+            mock_flight["id"] = derive_offer_id(mock_flight)
+            mock_flights.append(mock_flight)
 
         return mock_flights
 
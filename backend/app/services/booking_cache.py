@@ -0,0 +1,211 @@
+"""
+Booking Cache
+Bounded in-process LRU of serialized booking responses, per user, with ETags so clients
+revalidate with If-None-Match. Writes invalidate the user's entry in their own worker and
+publish the change with Postgres NOTIFY in the write's transaction; every worker hears
+of it through db_notifications and drops the user's entry when the change commits. A
+worker that is not listening does not answer from its cache, since it could miss changes.
+"""
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Hashable, Optional, Tuple
+from sqlalchemy.orm import Session
+from app.models.booking import utc_now
+from app.services.db_notifications import db_notifications
+
+BOOKING_CACHE_ENABLED = os.getenv("BOOKING_CACHE_ENABLED", "true").lower() == "true"
+BOOKING_CACHE_MAX_USERS = int(os.getenv("BOOKING_CACHE_MAX_USERS", "10000"))
+# Booking lists, history pages and single bookings kept per user
+BOOKING_CACHE_MAX_VIEWS_PER_USER = int(os.getenv("BOOKING_CACHE_MAX_VIEWS_PER_USER", "20"))
+# Backstop for changes no notification covers, e.g. a booked offer swept from cached_offers
+BOOKING_CACHE_TTL_SECONDS = int(os.getenv("BOOKING_CACHE_TTL_SECONDS", "300"))
+
+BOOKING_CHANGES_CHANNEL = "booking_changes"
+# Clients keep responses but revalidate each use, getting 304 while the ETag still matches
+BOOKING_CACHE_CONTROL = "private, no-cache"
+
+
+def make_etag(body: bytes) -> str:
+    """Strong ETag of a response body; an unchanged booking list keeps its ETag across workers"""
+    return f'"{hashlib.blake2b(body, digest_size=12).hexdigest()}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header names etag, using the weak comparison RFC 9110 asks for"""
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag.removeprefix("W/") in (tag.removeprefix("W/") for tag in tags)
+
+
+class BookingCache:
+    """
+    LRU of users, each holding up to BOOKING_CACHE_MAX_VIEWS_PER_USER rendered responses
+    (body and ETag) keyed by view. A user's entry lives until one of their bookings changes
+    or BOOKING_CACHE_TTL_SECONDS pass, whichever comes first.
+
+    Readers take a token() before reading the database and hand it to put(), which drops
+    the response if the user's bookings changed in between, so a read racing a write
+    cannot cache what the write replaced.
+    """
+
+    def __init__(
+        self,
+        max_users: int = BOOKING_CACHE_MAX_USERS,
+        max_views_per_user: int = BOOKING_CACHE_MAX_VIEWS_PER_USER,
+        ttl_seconds: int = BOOKING_CACHE_TTL_SECONDS,
+    ):
+        self.max_users = max_users
+        self.max_views_per_user = max_views_per_user
+        self.ttl = timedelta(seconds=ttl_seconds)
+        self._users: "OrderedDict[str, Tuple[datetime, OrderedDict[Hashable, Tuple[str, bytes]]]]" = OrderedDict()
+        # Owner of each cached single booking, so /{booking_id} is answered without a query
+        self._owners: Dict[str, str] = {}
+        # Token at each user's latest change; users dropped from it changed at or before _floor
+        self._changed: "OrderedDict[str, int]" = OrderedDict()
+        self._floor = 0
+        self._epoch = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def listening(self) -> bool:
+        return BOOKING_CACHE_ENABLED and db_notifications.listening
+
+    def token(self) -> int:
+        with self._lock:
+            return self._epoch
+
+    def get(self, user_email: str, view: Hashable) -> Optional[Tuple[str, bytes]]:
+        """ETag and body of a cached view, or None"""
+        if not self.listening:
+            return None
+        with self._lock:
+            entry = self._users.get(user_email)
+            if entry is None:
+                self.misses += 1
+                return None
+            valid_until, views = entry
+            if valid_until <= utc_now():
+                self._drop(user_email)
+                self.misses += 1
+                return None
+            cached = views.get(view)
+            if cached is None:
+                self.misses += 1
+                return None
+            views.move_to_end(view)
+            self._users.move_to_end(user_email)
+            self.hits += 1
+            return cached
+
+    def get_booking(self, booking_id: str) -> Optional[Tuple[str, bytes]]:
+        """ETag and body of a cached single booking, or None"""
+        owner = self._owners.get(booking_id)
+        if owner is None:
+            if self.listening:
+                self.misses += 1
+            return None
+        return self.get(owner, ("booking", booking_id))
+
+    def put(self, user_email: str, view: Hashable, body: bytes, token: int) -> str:
+        """
+        Cache a view read from the database after token() returned token, unless the user's
+        bookings changed since. Returns the body's ETag either way.
+        """
+        etag = make_etag(body)
+        if not self.listening:
+            return etag
+        with self._lock:
+            if self._changed.get(user_email, self._floor) > token:
+                return etag
+            entry = self._users.get(user_email)
+            if entry is None:
+                entry = (utc_now() + self.ttl, OrderedDict())
+                self._users[user_email] = entry
+            views = entry[1]
+            views[view] = (etag, body)
+            views.move_to_end(view)
+            if isinstance(view, tuple) and view[0] == "booking":
+                self._owners[view[1]] = user_email
+            while len(views) > self.max_views_per_user:
+                dropped, _ = views.popitem(last=False)
+                self._forget_owner(dropped)
+            self._users.move_to_end(user_email)
+            while len(self._users) > self.max_users:
+                self._drop(next(iter(self._users)))
+                self.evictions += 1
+        return etag
+
+    def revalidated(self, if_none_match: Optional[str], etag: str) -> bool:
+        """Whether the client already holds this response and gets a 304"""
+        if etag_matches(if_none_match, etag):
+            self.not_modified += 1
+            return True
+        return False
+
+    def publish(self, db: Session, user_email: str) -> None:
+        """
+        Announce a change to the user's bookings in db's transaction; Postgres delivers it
+        to every worker when the transaction commits, and not at all if it rolls back
+        """
+        db_notifications.publish(db, BOOKING_CHANGES_CHANNEL, [user_email])
+
+    def invalidate(self, user_email: str) -> None:
+        """Drop a user's responses, e.g. after this worker committed a change to their bookings"""
+        with self._lock:
+            self._epoch += 1
+            self._changed[user_email] = self._epoch
+            self._changed.move_to_end(user_email)
+            while len(self._changed) > self.max_users:
+                _, self._floor = self._changed.popitem(last=False)
+            if self._drop(user_email):
+                self.invalidations += 1
+
+    def clear(self) -> None:
+        """Drop everything, e.g. when changes may have been missed while not listening"""
+        with self._lock:
+            self._epoch += 1
+            self._floor = self._epoch
+            self._changed.clear()
+            self._users.clear()
+            self._owners.clear()
+
+    def _drop(self, user_email: str) -> bool:
+        entry = self._users.pop(user_email, None)
+        if entry is None:
+            return False
+        for view in entry[1]:
+            self._forget_owner(view)
+        return True
+
+    def _forget_owner(self, view: Hashable) -> None:
+        if isinstance(view, tuple) and view[0] == "booking":
+            self._owners.pop(view[1], None)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": BOOKING_CACHE_ENABLED,
+            "listening": self.listening,
+            "users": len(self._users),
+            "max_users": self.max_users,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "not_modified": self.not_modified,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+booking_cache = BookingCache()
+if BOOKING_CACHE_ENABLED:
+    db_notifications.subscribe(BOOKING_CHANGES_CHANNEL, booking_cache.invalidate, booking_cache.clear)
@@ -0,0 +1,138 @@
+"""
+Booking History Service
+A user's bookings with the route of their offers, read in one joined query per page
+and paged newest first by (created_at, booking_id) over ix_bookings_user_created
+"""
+import json
+import hashlib
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy import func, select, tuple_
+from sqlalchemy.orm import Session
+from app.data.airports import get_city_by_code
+from app.models.booking import Booking
+from app.models.cached_offer import CachedOffer
+from app.utils.cursors import encode_cursor, decode_cursor
+
+
+def booking_dict(
+    booking: Booking,
+    origin: Optional[str],
+    destination: Optional[str],
+    depart_ts: Optional[datetime] = None,
+) -> Dict[str, Any]:
+    """A booking as returned by the API, with its offer's route (None when the offer is gone)"""
+    return {
+        "booking_id": booking.booking_id,
+        "user_email": booking.user_email,
+        "offer_id": booking.offer_id,
+        "passengers": booking.passengers,
+        "total_amount": booking.total_amount,
+        "total_amount_minor": booking.total_amount_minor,
+        "currency": booking.currency,
+        "payment_status": booking.payment_status,
+        "status": booking.status,
+        "food_preference": booking.food_preference,
+        "origin": origin,
+        "destination": destination,
+        "origin_city": get_city_by_code(origin),
+        "destination_city": get_city_by_code(destination),
+        "depart_ts": depart_ts,
+        "created_at": booking.created_at,
+    }
+
+
+class BookingHistoryService:
+    """Pages and counts of a user's bookings, optionally by status and booking date"""
+
+    def _filters(
+        self,
+        user_email: str,
+        status: Optional[str] = None,
+        created_from: Optional[date] = None,
+        created_to: Optional[date] = None,
+    ) -> List[Any]:
+        filters = [Booking.user_email == user_email]
+        if status:
+            filters.append(Booking.status == status)
+        if created_from:
+            filters.append(Booking.created_at >= datetime.combine(created_from, datetime.min.time()))
+        if created_to:
+            # Inclusive of the whole last day
+            filters.append(Booking.created_at < datetime.combine(created_to + timedelta(days=1), datetime.min.time()))
+        return filters
+
+    def _rows(self, db: Session, filters: List[Any], limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Bookings newest first, each joined to its offer's route in the same query"""
+        stmt = (
+            select(Booking, CachedOffer.origin, CachedOffer.destination, CachedOffer.depart_ts)
+            .outerjoin(CachedOffer, CachedOffer.offer_id == Booking.offer_id)
+            .where(*filters)
+            .order_by(Booking.created_at.desc(), Booking.booking_id.desc())
+        )
+        if limit is not None:
+            stmt = stmt.limit(limit)
+        return [booking_dict(*row) for row in db.execute(stmt).all()]
+
+    def page(
+        self,
+        db: Session,
+        user_email: str,
+        status: Optional[str] = None,
+        created_from: Optional[date] = None,
+        created_to: Optional[date] = None,
+        limit: int = 20,
+        cursor: Optional[str] = None,
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        One page of bookings, newest first, and the cursor of the next page (None on the
+        last page). Raises ValueError for a malformed cursor or one issued for other filters.
+        """
+        query_hash = hashlib.sha256(json.dumps(
+            [user_email, status, str(created_from), str(created_to)]
+        ).encode()).hexdigest()[:16]
+        filters = self._filters(user_email, status, created_from, created_to)
+        if cursor:
+            position = decode_cursor(cursor)
+            if position.get("q") != query_hash:
+                raise ValueError("Cursor does not belong to this booking history")
+            try:
+                last_created = datetime.fromisoformat(position.get("v"))
+            except (TypeError, ValueError) as e:
+                raise ValueError("Invalid cursor") from e
+            filters.append(tuple_(Booking.created_at, Booking.booking_id) < tuple_(last_created, position.get("id")))
+
+        # One extra row tells whether another page exists
+        bookings = self._rows(db, filters, limit + 1)
+        next_cursor = None
+        if len(bookings) > limit:
+            bookings = bookings[:limit]
+            last = bookings[-1]
+            next_cursor = encode_cursor({
+                "q": query_hash,
+                "v": last["created_at"].isoformat(),
+                "id": last["booking_id"],
+            })
+        return bookings, next_cursor
+
+    def status_counts(
+        self,
+        db: Session,
+        user_email: str,
+        created_from: Optional[date] = None,
+        created_to: Optional[date] = None,
+    ) -> Dict[str, int]:
+        """Bookings per status over a booking date range; the page's total comes from these"""
+        rows = db.execute(
+            select(Booking.status, func.count())
+            .where(*self._filters(user_email, None, created_from, created_to))
+            .group_by(Booking.status)
+        ).all()
+        return {status: count for status, count in rows}
+
+    def all(self, db: Session, user_email: str) -> List[Dict[str, Any]]:
+        """Every booking of a user, newest first"""
+        return self._rows(db, self._filters(user_email))
+
+
+booking_history_service = BookingHistoryService()
@@ -0,0 +1,110 @@
+"""
+Booking Idempotency
+Makes booking creation safe to retry. A request made with an idempotency key claims the
+key in the booking's own transaction and stores its response there; a retry finds the
+stored response with one primary-key lookup, and a duplicate sent while the first is
+still running waits on the key's unique index until the first commits or rolls back.
+"""
+import os
+import json
+import hashlib
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+from sqlalchemy import delete
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+from app.models.booking import utc_now
+from app.models.booking_idempotency_key import BookingIdempotencyKey
+from app.schemas.booking import BookingRequest
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# How long a key keeps answering retries with its original booking
+IDEMPOTENCY_KEY_TTL_HOURS = int(os.getenv("IDEMPOTENCY_KEY_TTL_HOURS", "24"))
+
+
+class BookingIdempotency:
+    """Claims, replays and expires booking idempotency keys"""
+
+    def __init__(self):
+        self.stats: Dict[str, Any] = {
+            "replayed": 0,
+            "keys_pruned_total": 0,
+        }
+
+    @staticmethod
+    def request_hash(request: BookingRequest) -> str:
+        """Fingerprint of what a request books; a key may only be reused for the same booking"""
+        body = request.model_dump(mode="json", exclude={"conversation_id"})
+        return hashlib.sha256(json.dumps(body, sort_keys=True).encode()).hexdigest()
+
+    @staticmethod
+    def derived_key(request: BookingRequest, request_hash: str) -> Optional[str]:
+        """
+        Key for a request sent without one: the same booking of the same offer from one
+        conversation is one booking, whichever agent sends it. None without a conversation.
+        """
+        if not request.conversation_id:
+            return None
+        return f"conversation:{request.conversation_id}:{request.offer_id}:{request_hash[:16]}"
+
+    @staticmethod
+    def cutoff(now: Optional[datetime] = None) -> datetime:
+        """Keys created before this have expired, whether or not prune() removed them yet"""
+        return (now or utc_now()) - timedelta(hours=IDEMPOTENCY_KEY_TTL_HOURS)
+
+    def lookup(self, db: Session, user_email: str, key: str) -> Optional[BookingIdempotencyKey]:
+        """The request made with key within the TTL, if any"""
+        return db.query(BookingIdempotencyKey).filter(
+            BookingIdempotencyKey.user_email == user_email,
+            BookingIdempotencyKey.idempotency_key == key,
+            BookingIdempotencyKey.created_at >= self.cutoff(),
+        ).first()
+
+    def claim(self, db: Session, user_email: str, key: str, request_hash: str) -> bool:
+        """
+        Claim key for this request in the caller's transaction, taking over an expired
+        key. Blocks while another transaction holds an uncommitted claim on it; returns
+        False if that transaction committed, in which case its response can be looked up.
+        """
+        now = utc_now()
+        stmt = pg_insert(BookingIdempotencyKey).values(
+            user_email=user_email,
+            idempotency_key=key,
+            request_hash=request_hash,
+            created_at=now,
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[BookingIdempotencyKey.user_email, BookingIdempotencyKey.idempotency_key],
+            set_={
+                "request_hash": stmt.excluded.request_hash,
+                "booking_id": None,
+                "response": None,
+                "created_at": stmt.excluded.created_at,
+            },
+            where=BookingIdempotencyKey.created_at < self.cutoff(now),
+        ).returning(BookingIdempotencyKey.idempotency_key)
+        return db.execute(stmt).first() is not None
+
+    def complete(self, db: Session, user_email: str, key: str, booking_id: str, response: Dict[str, Any]) -> None:
+        """Store the response of a claimed key, in the transaction that created the booking"""
+        db.query(BookingIdempotencyKey).filter(
+            BookingIdempotencyKey.user_email == user_email,
+            BookingIdempotencyKey.idempotency_key == key,
+        ).update({
+            BookingIdempotencyKey.booking_id: booking_id,
+            BookingIdempotencyKey.response: response,
+        }, synchronize_session=False)
+
+    def prune(self, db: Session, now: Optional[datetime] = None) -> int:
+        """Delete keys older than the TTL, and commit"""
+        pruned = db.execute(
+            delete(BookingIdempotencyKey).where(BookingIdempotencyKey.created_at < self.cutoff(now))
+        ).rowcount
+        db.commit()
+        self.stats["keys_pruned_total"] += pruned
+        return pruned
+
+
+booking_idempotency = BookingIdempotency()
@@ -0,0 +1,202 @@
+"""
+Cache Warm-up Service
+Ahead of peak hours, searches the most popular routes from the search log across
+upcoming dates at background priority, so peak-time searches hit cached offers
+"""
+import os
+import time
+import asyncio
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional, Callable, Tuple
+from sqlalchemy import func, text, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app.db import AsyncSessionLocal, async_engine
+from app.models.cached_offer import utc_now
+from app.models.search_log import SearchLog
+from app.schemas.flight import FlightSearchRequest
+from app.services.amadeus_scheduler import AmadeusOverloadedError, RequestPriority
+from app.services.flight_search_service import FlightSearchService, flight_search_service
+from app.services.search_log_service import SearchLogService, search_log_service
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+WARMUP_ENABLED = os.getenv("CACHE_WARMUP_ENABLED", "true").lower() == "true"
+# UTC hours when search traffic peaks; the defaults are 05:30 and 16:30 IST
+WARMUP_PEAK_HOURS = [int(hour) for hour in os.getenv("CACHE_WARMUP_PEAK_HOURS", "0,11").split(",") if hour.strip()]
+# Should stay below FLIGHT_SEARCH_SHARED_TTL so warmed offers are still fresh at the peak
+WARMUP_LEAD_MINUTES = int(os.getenv("CACHE_WARMUP_LEAD_MINUTES", "15"))
+WARMUP_TOP_ROUTES = int(os.getenv("CACHE_WARMUP_TOP_ROUTES", "20"))
+WARMUP_DAYS_AHEAD = int(os.getenv("CACHE_WARMUP_DAYS_AHEAD", "7"))
+WARMUP_LOOKBACK_DAYS = int(os.getenv("CACHE_WARMUP_LOOKBACK_DAYS", "7"))
+WARMUP_MAX_SEARCHES = int(os.getenv("CACHE_WARMUP_MAX_SEARCHES", "100"))
+WARMUP_ADVISORY_LOCK_KEY = 734_021_902  # one warm-up round at a time across workers
+
+
+class CacheWarmupService:
+    """Warms cached_offers for popular routes and reports how well the warmed routes hit"""
+
+    def __init__(
+        self,
+        search_service: FlightSearchService = flight_search_service,
+        log_service: SearchLogService = search_log_service,
+        session_factory: Callable[[], AsyncSession] = AsyncSessionLocal,
+    ):
+        self.search_service = search_service
+        self.log_service = log_service
+        self.session_factory = session_factory
+        self._task: Optional[asyncio.Task] = None
+        self._warmed_keys: List[Tuple[str, str, Any, str]] = []
+        self.stats: Dict[str, Any] = {
+            "runs": 0,
+            "searches_total": 0,
+            "shed_total": 0,
+            "next_run_at": None,
+            "last_run_at": None,
+            "last_run_duration_ms": None,
+            "last_run": None,
+            "last_error": None,
+        }
+
+    def next_run_at(self, now: datetime) -> datetime:
+        """Next peak hour minus the lead time, in UTC"""
+        candidates = []
+        for hour in WARMUP_PEAK_HOURS:
+            run_at = now.replace(hour=hour, minute=0, second=0, microsecond=0) - timedelta(minutes=WARMUP_LEAD_MINUTES)
+            while run_at <= now:
+                run_at += timedelta(days=1)
+            candidates.append(run_at)
+        return min(candidates)
+
+    async def warm_once(self) -> Dict[str, Any]:
+        """
+        Search every top route for today and the next WARMUP_DAYS_AHEAD days, nearest
+        dates first. Searches that are already fresh are skipped; the round stops as
+        soon as the Amadeus scheduler sheds a background request.
+        """
+        started = time.perf_counter()
+        run = {"routes": [], "warmed": [], "already_fresh": 0, "failed": 0, "shed": False}
+        # A session-level advisory lock belongs to one connection, so it is taken and released
+        # on a connection held for the whole round, outside the session's transactions
+        async with async_engine.connect() as lock_conn:
+            lock_conn = await lock_conn.execution_options(isolation_level="AUTOCOMMIT")
+            if not (await lock_conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": WARMUP_ADVISORY_LOCK_KEY})).scalar():
+                logger.info("Cache warm-up already running in another worker")
+                return run
+            try:
+                async with self.session_factory() as db:
+                    await self._warm_routes(db, run)
+            finally:
+                try:
+                    await lock_conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": WARMUP_ADVISORY_LOCK_KEY})
+                except Exception:
+                    # Closing the connection releases the lock, rather than returning it to the pool
+                    await lock_conn.invalidate()
+                    raise
+
+        self._warmed_keys = [
+            (item["origin"], item["destination"], datetime.strptime(item["departure_date"], "%Y-%m-%d").date(), item["passenger_mix"])
+            for item in run["warmed"]
+        ]
+        duration_ms = round((time.perf_counter() - started) * 1000, 1)
+        self.stats["runs"] += 1
+        self.stats["searches_total"] += len(run["warmed"])
+        self.stats["shed_total"] += int(run["shed"])
+        self.stats["last_run_at"] = utc_now().isoformat()
+        self.stats["last_run_duration_ms"] = duration_ms
+        self.stats["last_run"] = run
+        logger.info(
+            f"Cache warm-up warmed {len(run['warmed'])} searches over {len(run['routes'])} routes "
+            f"({run['already_fresh']} already fresh{', stopped by rate limit' if run['shed'] else ''}) in {duration_ms} ms"
+        )
+        return run
+
+    async def _warm_routes(self, db: AsyncSession, run: Dict[str, Any]) -> None:
+        """The searches of one round, recorded in run"""
+        routes = await db.run_sync(self.log_service.top_routes, WARMUP_LOOKBACK_DAYS, WARMUP_TOP_ROUTES)
+        run["routes"] = [f"{route['origin']}-{route['destination']}" for route in routes]
+        today = utc_now().date()
+        searches = 0
+        for offset in range(WARMUP_DAYS_AHEAD + 1):
+            departure_date = today + timedelta(days=offset)
+            for route in routes:
+                if searches >= WARMUP_MAX_SEARCHES or run["shed"]:
+                    break
+                adults, children, infants = (int(count) for count in route["passenger_mix"].split("-"))
+                request = FlightSearchRequest(
+                    origin=route["origin"],
+                    destination=route["destination"],
+                    departure_date=departure_date.isoformat(),
+                    adults=adults,
+                    children=children,
+                    infants=infants,
+                )
+                try:
+                    source = await self.search_service.ensure_offers(
+                        db, request, priority=RequestPriority.BACKGROUND, record=False
+                    )
+                except AmadeusOverloadedError:
+                    run["shed"] = True
+                    break
+                except Exception as e:
+                    await db.rollback()
+                    run["failed"] += 1
+                    logger.warning(f"Warm-up search {route['origin']} -> {route['destination']} on {departure_date} failed: {str(e)}")
+                    continue
+                if source == "upstream":
+                    searches += 1
+                    run["warmed"].append({
+                        "origin": route["origin"],
+                        "destination": route["destination"],
+                        "departure_date": departure_date.isoformat(),
+                        "passenger_mix": route["passenger_mix"],
+                    })
+                else:
+                    run["already_fresh"] += 1
+
+    def warmed_hit_rate(self, db: Session) -> Dict[str, Any]:
+        """How searches for the last round's warmed (route, date, passengers) were served since then"""
+        if not self._warmed_keys or not self.stats["last_run_at"]:
+            return {"searches": 0, "hit_rate": None}
+        rows = db.query(SearchLog.source, func.count()).filter(
+            SearchLog.created_at >= datetime.fromisoformat(self.stats["last_run_at"]),
+            tuple_(SearchLog.origin, SearchLog.destination, SearchLog.departure_date, SearchLog.passenger_mix).in_(self._warmed_keys),
+        ).group_by(SearchLog.source).all()
+        counts = dict(rows)
+        total = sum(counts.values())
+        hits = total - counts.get("upstream", 0)
+        return {"searches": total, "hit_rate": round(hits / total, 4) if total else None}
+
+    def report(self, db: Session) -> Dict[str, Any]:
+        return {**self.stats, "warmed_routes": self.warmed_hit_rate(db)}
+
+    async def run_forever(self) -> None:
+        while True:
+            run_at = self.next_run_at(utc_now())
+            self.stats["next_run_at"] = run_at.isoformat()
+            await asyncio.sleep(max((run_at - utc_now()).total_seconds(), 0))
+            try:
+                await self.log_service.flush()
+                await self.warm_once()
+                self.stats["last_error"] = None
+            except Exception as e:
+                self.stats["last_error"] = str(e)
+                logger.error(f"Cache warm-up failed: {str(e)}", exc_info=True)
+
+    def start(self) -> Optional[asyncio.Task]:
+        if WARMUP_ENABLED and WARMUP_PEAK_HOURS and self._task is None:
+            self._task = asyncio.create_task(self.run_forever())
+        return self._task
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+cache_warmup_service = CacheWarmupService()
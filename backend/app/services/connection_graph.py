@@ -0,0 +1,339 @@
+"""
+Connection Graph
+Time-expanded graph of cached one-way offers (airports as places, offers as timed
+edges) kept up to date incrementally, with a multi-criteria search for connecting
+itineraries between airports that have no direct offer
+"""
+import os
+import time
+import bisect
+import heapq
+import itertools
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from sqlalchemy.orm import Session
+from app.db import SessionLocal
+from app.models.cached_offer import CachedOffer, utc_now
+from app.services.offer_composition import UPSTREAM_SOURCE
+from app.utils.logger import get_logger
+from app.utils.money import to_minor
+
+logger = get_logger(__name__)
+
+CONNECTION_MIN_CONNECTION_MINUTES = int(os.getenv("CONNECTION_MIN_CONNECTION_MINUTES", "60"))
+CONNECTION_MAX_LAYOVER_MINUTES = int(os.getenv("CONNECTION_MAX_LAYOVER_MINUTES", "720"))
+CONNECTION_MAX_STOPS = int(os.getenv("CONNECTION_MAX_STOPS", "2"))
+# Offers cached by other processes are picked up this often, in seconds
+CONNECTION_GRAPH_SYNC_SECONDS = float(os.getenv("CONNECTION_GRAPH_SYNC_SECONDS", "30"))
+# Ranking of itineraries: what an hour of travel time and each stop are worth, in base currency
+CONNECTION_HOUR_VALUE = float(os.getenv("CONNECTION_HOUR_VALUE", "600"))
+CONNECTION_STOP_PENALTY = float(os.getenv("CONNECTION_STOP_PENALTY", "1500"))
+# Partial itineraries expanded per search at most, bounding the worst case
+MAX_EXPANSIONS = 5000
+
+
+@dataclass(frozen=True)
+class Flight:
+    """One cached one-way offer as a graph edge"""
+    offer_id: str
+    origin: str
+    destination: str
+    depart_ts: datetime
+    arrive_ts: datetime
+    duration_minutes: int
+    stops: int
+    price_minor: int
+    passenger_mix: str
+    expire_at: datetime
+
+
+@dataclass(frozen=True)
+class Itinerary:
+    """A chain of flights; times are airport-local, so elapsed time is summed per flight"""
+    flights: Tuple[Flight, ...]
+    price_minor: int
+    travel_minutes: int  # flying plus layovers
+    stops: int
+
+    @property
+    def depart_ts(self) -> datetime:
+        return self.flights[0].depart_ts
+
+    @property
+    def arrive_ts(self) -> datetime:
+        return self.flights[-1].arrive_ts
+
+
+def cost_weights() -> Tuple[int, int]:
+    """Minor units an hour of travel time and a stop are worth in the ranking cost"""
+    return to_minor(CONNECTION_HOUR_VALUE), to_minor(CONNECTION_STOP_PENALTY)
+
+
+# Search labels are plain tuples, ordered for the heap: (estimated total cost,
+# tie-break sequence, cost so far, price, travel minutes, stops, flights)
+_ESTIMATE, _SEQUENCE, _COST, _PRICE, _TRAVEL, _STOPS, _FLIGHTS = range(7)
+
+
+def _dominates(label: tuple, other: tuple) -> bool:
+    """No worse on price, departure (later is better), arrival and stops"""
+    return (
+        label[_PRICE] <= other[_PRICE]
+        and label[_FLIGHTS][0].depart_ts >= other[_FLIGHTS][0].depart_ts
+        and label[_FLIGHTS][-1].arrive_ts <= other[_FLIGHTS][-1].arrive_ts
+        and label[_STOPS] <= other[_STOPS]
+    )
+
+
+def _departure_key(flight: Flight) -> Tuple[datetime, str]:
+    return flight.depart_ts, flight.offer_id
+
+
+def _window(departures: List[Flight], earliest: datetime, latest: datetime) -> List[Flight]:
+    """Flights of a departure-sorted list leaving in [earliest, latest)"""
+    start = bisect.bisect_left(departures, (earliest, ""), key=_departure_key)
+    end = bisect.bisect_left(departures, (latest, ""), key=_departure_key)
+    return departures[start:end]
+
+
+class ConnectionGraph:
+    """
+    Departures per (passenger mix, airport) and per (passenger mix, route), sorted by
+    departure time, so the flights leaving an airport within a connection window are
+    one bisect away. Offers are added as they are persisted in this process and by a
+    periodic incremental read of rows cached since the last read; expired flights are
+    dropped on that read. Only upstream one-way offers are edges: round trips and
+    composed offers are not.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session] = SessionLocal,
+        sync_seconds: float = CONNECTION_GRAPH_SYNC_SECONDS,
+    ):
+        self.session_factory = session_factory
+        self.sync_seconds = sync_seconds
+        self._departures: Dict[Tuple[str, str], List[Flight]] = {}
+        self._routes: Dict[Tuple[str, str, str], List[Flight]] = {}
+        self._flights: Dict[str, Flight] = {}
+        self._lock = threading.Lock()
+        self._watermark: Optional[datetime] = None
+        self._synced_at: Optional[float] = None
+        self.stats: Dict[str, Any] = {
+            "syncs": 0,
+            "searches": 0,
+            "last_sync_rows": None,
+            "last_sync_ms": None,
+            "last_search_ms": None,
+            "last_search_expansions": None,
+        }
+
+    def add_offers(self, offers: Iterable[Dict[str, Any]]) -> int:
+        """Add or replace edges for offer rows (dicts with cached_offers columns)"""
+        added = 0
+        with self._lock:
+            for offer in offers:
+                if offer.get("return_depart_ts") is not None:
+                    continue
+                if offer.get("offer_source", UPSTREAM_SOURCE) != UPSTREAM_SOURCE:
+                    continue
+                self._insert(Flight(
+                    offer_id=offer["offer_id"],
+                    origin=offer["origin"],
+                    destination=offer["destination"],
+                    depart_ts=offer["depart_ts"],
+                    arrive_ts=offer["arrive_ts"],
+                    duration_minutes=offer["duration_minutes"],
+                    stops=offer["stops"],
+                    price_minor=offer["price_minor"],
+                    passenger_mix=offer["passenger_mix"],
+                    expire_at=offer["expire_at"],
+                ))
+                added += 1
+        return added
+
+    def _indexes(self, flight: Flight):
+        yield self._departures, (flight.passenger_mix, flight.origin)
+        yield self._routes, (flight.passenger_mix, flight.origin, flight.destination)
+
+    def _insert(self, flight: Flight) -> None:
+        previous = self._flights.get(flight.offer_id)
+        if previous is not None:
+            self._remove(previous)
+        for index, key in self._indexes(flight):
+            bisect.insort(index.setdefault(key, []), flight, key=_departure_key)
+        self._flights[flight.offer_id] = flight
+
+    def _remove(self, flight: Flight) -> None:
+        for index, key in self._indexes(flight):
+            departures = index.get(key, [])
+            position = bisect.bisect_left(departures, _departure_key(flight), key=_departure_key)
+            if position < len(departures) and departures[position].offer_id == flight.offer_id:
+                del departures[position]
+            if not departures:
+                index.pop(key, None)
+        self._flights.pop(flight.offer_id, None)
+
+    def prune(self, now: datetime) -> int:
+        with self._lock:
+            expired = [flight for flight in self._flights.values() if flight.expire_at <= now]
+            for flight in expired:
+                self._remove(flight)
+        return len(expired)
+
+    def sync(self, db: Session) -> int:
+        """Read offers cached since the last sync (everything unexpired on the first one)"""
+        started = time.perf_counter()
+        now = utc_now()
+        columns = [
+            CachedOffer.offer_id, CachedOffer.origin, CachedOffer.destination, CachedOffer.depart_ts,
+            CachedOffer.arrive_ts, CachedOffer.duration_minutes, CachedOffer.stops, CachedOffer.price_minor,
+            CachedOffer.passenger_mix, CachedOffer.expire_at, CachedOffer.cached_at,
+        ]
+        query = db.query(*columns).filter(
+            CachedOffer.expire_at > now,
+            CachedOffer.return_depart_ts.is_(None),
+            CachedOffer.offer_source == UPSTREAM_SOURCE,
+        )
+        if self._watermark is not None:
+            query = query.filter(CachedOffer.cached_at > self._watermark)
+        rows = [dict(row._mapping) for row in query.all()]
+        self.add_offers(rows)
+        if rows:
+            self._watermark = max(row["cached_at"] for row in rows)
+        self.prune(now)
+        self._synced_at = time.monotonic()
+        self.stats["syncs"] += 1
+        self.stats["last_sync_rows"] = len(rows)
+        self.stats["last_sync_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        return len(rows)
+
+    def ensure_synced(self, db: Session) -> None:
+        if self._synced_at is None or time.monotonic() - self._synced_at > self.sync_seconds:
+            try:
+                self.sync(db)
+            except Exception as e:
+                db.rollback()
+                logger.warning(f"Connection graph sync failed, searching the flights already loaded: {str(e)}")
+                self._synced_at = time.monotonic()
+
+    def has_departures(self, passenger_mix: str, origin: str, destination: str, day_start: datetime) -> bool:
+        route = self._routes.get((passenger_mix, origin, destination), [])
+        return bool(_window(route, day_start, day_start + timedelta(days=1)))
+
+    def search(
+        self,
+        origin: str,
+        destination: str,
+        day_start: datetime,
+        passenger_mix: str,
+        max_stops: int = CONNECTION_MAX_STOPS,
+        limit: int = 20,
+    ) -> List[Itinerary]:
+        """
+        The lowest-cost connecting itineraries departing on the given day, cheapest first.
+
+        Best-first (A*) label search: a partial itinerary is extended by the flights
+        leaving its last airport between the minimum connection time and the maximum
+        layover after it lands. Partial itineraries are expanded in order of cost so far
+        plus a lower bound on the rest (a stop plus the cheapest flight on to the
+        destination), so complete itineraries come out in cost order and the search
+        stops after `limit` of them. A partial itinerary dominated (price, departure,
+        arrival, stops) by one already expanded at the same airport is dropped, as is a
+        result dominated by an earlier result. Itineraries revisiting an airport are not
+        built. Direct (single-flight) itineraries are left out; those are served by the
+        regular search.
+        """
+        started = time.perf_counter()
+        min_connection = timedelta(minutes=CONNECTION_MIN_CONNECTION_MINUTES)
+        max_layover = timedelta(minutes=CONNECTION_MAX_LAYOVER_MINUTES)
+        hour_value, stop_cost = cost_weights()
+        now = utc_now()
+        sequence = itertools.count()
+        onward_costs: Dict[str, Optional[int]] = {}
+
+        def remaining_bound(airport: str, stops: int) -> Optional[int]:
+            """Lower bound on the cost from an airport to the destination; None if out of reach"""
+            if airport not in onward_costs:
+                route = self._routes.get((passenger_mix, airport, destination), [])
+                onward_costs[airport] = min(
+                    (
+                        flight.price_minor + hour_value * flight.duration_minutes // 60 + stop_cost * flight.stops
+                        for flight in route
+                    ),
+                    default=None,
+                )
+            if onward_costs[airport] is not None and stops < max_stops:
+                return stop_cost + onward_costs[airport]
+            # Without a direct flight on, the destination is at least two connections away
+            return 2 * stop_cost if stops + 1 < max_stops else None
+
+        def push(label: Optional[tuple], flight: Flight) -> None:
+            stops = flight.stops if label is None else label[_STOPS] + 1 + flight.stops
+            if stops > max_stops:
+                return
+            bound = 0 if flight.destination == destination else remaining_bound(flight.destination, stops)
+            if bound is None:
+                return
+            if label is None:
+                price, travel, flights = flight.price_minor, flight.duration_minutes, (flight,)
+            else:
+                layover = int((flight.depart_ts - label[_FLIGHTS][-1].arrive_ts).total_seconds()) // 60
+                price = label[_PRICE] + flight.price_minor
+                travel = label[_TRAVEL] + layover + flight.duration_minutes
+                flights = label[_FLIGHTS] + (flight,)
+            cost = price + hour_value * travel // 60 + stop_cost * stops
+            heapq.heappush(heap, (cost + bound, next(sequence), cost, price, travel, stops, flights))
+
+        heap: List[tuple] = []
+        results: List[tuple] = []
+        expanded: Dict[str, List[tuple]] = {}
+        expansions = 0
+        with self._lock:
+            first_legs = _window(self._departures.get((passenger_mix, origin), []), day_start, day_start + timedelta(days=1))
+            for flight in first_legs:
+                if flight.destination != destination and flight.expire_at > now:
+                    push(None, flight)
+
+            while heap and len(results) < limit and expansions < MAX_EXPANSIONS:
+                label = heapq.heappop(heap)
+                last = label[_FLIGHTS][-1]
+                if last.destination == destination:
+                    if not any(_dominates(result, label) for result in results):
+                        results.append(label)
+                    continue
+                settled = expanded.setdefault(last.destination, [])
+                if any(_dominates(other, label) for other in settled):
+                    continue
+                settled.append(label)
+                expansions += 1
+
+                visited = {origin, *(flight.destination for flight in label[_FLIGHTS])}
+                if label[_STOPS] + 1 < max_stops:
+                    onward = self._departures.get((passenger_mix, last.destination), [])
+                else:
+                    # One more connection at most: only flights straight to the destination
+                    onward = self._routes.get((passenger_mix, last.destination, destination), [])
+                for flight in _window(onward, last.arrive_ts + min_connection, last.arrive_ts + max_layover):
+                    if flight.expire_at > now and flight.destination not in visited:
+                        push(label, flight)
+
+        self.stats["searches"] += 1
+        self.stats["last_search_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        self.stats["last_search_expansions"] = expansions
+        return [
+            Itinerary(flights=label[_FLIGHTS], price_minor=label[_PRICE], travel_minutes=label[_TRAVEL], stops=label[_STOPS])
+            for label in results
+        ]
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "flights": len(self._flights),
+            "airports": len({airport for _, airport in self._departures}),
+            "synced_seconds_ago": round(time.monotonic() - self._synced_at, 1) if self._synced_at else None,
+        }
+
+
+connection_graph = ConnectionGraph()
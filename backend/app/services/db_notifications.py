@@ -0,0 +1,116 @@
+"""
+Database Notifications
+One LISTEN connection per worker for cache invalidations published with Postgres NOTIFY.
+Writers publish in their own transaction, so every worker hears of a change once it
+commits, and not at all if it rolls back.
+"""
+import os
+import asyncio
+from typing import Callable, Dict, Iterable, List, Optional
+import asyncpg
+from sqlalchemy import bindparam, text
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+from sqlalchemy.types import String
+from app.db import DATABASE_URL
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+DB_NOTIFICATIONS_ENABLED = os.getenv("DB_NOTIFICATIONS_ENABLED", "true").lower() == "true"
+# How often the listening connection is checked, and how long to wait before reconnecting
+DB_NOTIFICATIONS_PING_SECONDS = int(os.getenv("DB_NOTIFICATIONS_PING_SECONDS", "10"))
+DB_NOTIFICATIONS_RECONNECT_SECONDS = int(os.getenv("DB_NOTIFICATIONS_RECONNECT_SECONDS", "5"))
+
+_NOTIFY_SQL = text("SELECT pg_notify(:channel, payload) FROM unnest(:payloads) AS payload").bindparams(
+    bindparam("payloads", type_=ARRAY(String)),
+)
+
+
+class DbNotifications:
+    """
+    Dispatches each channel's notifications to the handler subscribed to it. Subscribers
+    also pass a reset callback, run whenever notifications may have been missed (on each
+    connect, before listening), so they can drop whatever they cached meanwhile.
+    """
+
+    def __init__(self):
+        self._handlers: Dict[str, Callable[[str], None]] = {}
+        self._resets: List[Callable[[], None]] = []
+        self._task: Optional[asyncio.Task] = None
+        self.listening = False
+        self.received: Dict[str, int] = {}
+        self.listener_errors = 0
+
+    def subscribe(self, channel: str, handler: Callable[[str], None], reset: Callable[[], None]) -> None:
+        """Call handler(payload) for every notification on channel; call before start()"""
+        self._handlers[channel] = handler
+        self._resets.append(reset)
+        self.received[channel] = 0
+
+    @staticmethod
+    def publish(db: Session, channel: str, payloads: Iterable[str]) -> None:
+        """Notify channel once per distinct payload, delivered when db's transaction commits"""
+        payloads = sorted(set(payloads))
+        if payloads:
+            db.execute(_NOTIFY_SQL, {"channel": channel, "payloads": payloads})
+
+    def _on_notification(self, connection, pid: int, channel: str, payload: str) -> None:
+        self.received[channel] += 1
+        self._handlers[channel](payload)
+
+    def _on_termination(self, connection) -> None:
+        self.listening = False
+
+    async def run_forever(self) -> None:
+        """Listen on every subscribed channel, reconnecting when the connection drops"""
+        dsn = make_url(DATABASE_URL).set(drivername="postgresql").render_as_string(hide_password=False)
+        while True:
+            conn = None
+            try:
+                conn = await asyncpg.connect(dsn)
+                conn.add_termination_listener(self._on_termination)
+                for channel in self._handlers:
+                    await conn.add_listener(channel, self._on_notification)
+                # Changes committed while this worker was not listening were missed
+                for reset in self._resets:
+                    reset()
+                self.listening = True
+                logger.info(f"Listening for notifications on {', '.join(self._handlers)}")
+                while self.listening:
+                    await asyncio.sleep(DB_NOTIFICATIONS_PING_SECONDS)
+                    await conn.fetchval("SELECT 1")
+            except Exception as e:
+                self.listener_errors += 1
+                logger.warning(f"Notification listener disconnected: {str(e)}")
+            finally:
+                self.listening = False
+                if conn is not None:
+                    conn.terminate()
+            await asyncio.sleep(DB_NOTIFICATIONS_RECONNECT_SECONDS)
+
+    def start(self) -> Optional[asyncio.Task]:
+        if DB_NOTIFICATIONS_ENABLED and self._handlers and self._task is None:
+            self._task = asyncio.create_task(self.run_forever())
+        return self._task
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "enabled": DB_NOTIFICATIONS_ENABLED,
+            "listening": self.listening,
+            "received": dict(self.received),
+            "listener_errors": self.listener_errors,
+        }
+
+
+db_notifications = DbNotifications()
@@ -0,0 +1,132 @@
+"""
+Flight Offer
+Compact in-process representation of a parsed offer, built once at parse time and
+passed through the search pipeline (search cache, round-trip pairing, connection
+building, persistence) until it is written to cached_offers or rendered as JSON
+"""
+import sys
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+from app.utils.money import from_minor
+
+# cached_offers columns a FlightOffer carries, in table order
+OFFER_COLUMNS = (
+    "offer_id", "origin", "destination", "depart_ts", "arrive_ts", "airline", "flight_no",
+    "return_depart_ts", "return_arrive_ts", "return_flight_no", "price_minor", "currency",
+    "source_currency", "source_price_minor", "seats", "duration_minutes", "stops",
+    "passenger_mix", "offer_source", "payload",
+)
+
+
+def intern_code(code: Optional[str]) -> Optional[str]:
+    """One shared string object per airport, carrier, currency or passenger-mix code"""
+    return sys.intern(code) if code else code
+
+
+class FlightOffer:
+    """
+    One parsed offer: the cached_offers columns as slots, plus the raw upstream offer
+    in `payload`. Codes repeated across offers (airports, carriers, currencies, the
+    passenger mix and the source) are interned, so a search's offers share them.
+    """
+
+    __slots__ = OFFER_COLUMNS + ("flight_number",)
+
+    def __init__(
+        self,
+        offer_id: str,
+        origin: str,
+        destination: str,
+        depart_ts: datetime,
+        arrive_ts: datetime,
+        airline: str,
+        flight_number: str,
+        price_minor: int,
+        currency: str,
+        source_currency: str,
+        source_price_minor: int,
+        seats: int,
+        duration_minutes: int,
+        stops: int,
+        passenger_mix: str,
+        offer_source: str,
+        payload: Dict[str, Any],
+        return_depart_ts: Optional[datetime] = None,
+        return_arrive_ts: Optional[datetime] = None,
+        return_flight_no: Optional[str] = None,
+    ):
+        self.offer_id = offer_id
+        self.origin = intern_code(origin)
+        self.destination = intern_code(destination)
+        self.depart_ts = depart_ts
+        self.arrive_ts = arrive_ts
+        self.airline = intern_code(airline)
+        # Carrier-less number of the first flight; flight_no is carrier + number
+        self.flight_number = flight_number
+        self.flight_no = f"{airline}{flight_number}"
+        self.return_depart_ts = return_depart_ts
+        self.return_arrive_ts = return_arrive_ts
+        self.return_flight_no = return_flight_no
+        self.price_minor = price_minor
+        self.currency = intern_code(currency)
+        self.source_currency = intern_code(source_currency)
+        self.source_price_minor = source_price_minor
+        self.seats = seats
+        self.duration_minutes = duration_minutes
+        self.stops = stops
+        self.passenger_mix = intern_code(passenger_mix)
+        self.offer_source = intern_code(offer_source)
+        self.payload = payload
+
+    @classmethod
+    def from_row(cls, row: Any) -> "FlightOffer":
+        """From a CachedOffer (with its payload loaded) or a cached_offers row mapping"""
+        get = row.get if isinstance(row, dict) else lambda column: getattr(row, column)
+        airline, flight_no = get("airline"), get("flight_no")
+        return cls(
+            flight_number=flight_no[len(airline):] if flight_no.startswith(airline) else flight_no,
+            **{column: get(column) for column in OFFER_COLUMNS if column != "flight_no"},
+        )
+
+    @property
+    def first_flight(self) -> Tuple[str, str]:
+        """(carrier, number) of the first segment, identifying the flight across sources"""
+        return self.airline, self.flight_number
+
+    @property
+    def price(self) -> float:
+        """Price in major units, as returned by the API"""
+        return from_minor(self.price_minor, self.currency)
+
+    @property
+    def is_round_trip(self) -> bool:
+        return self.return_depart_ts is not None
+
+    def as_row(self, **extra: Any) -> Dict[str, Any]:
+        """cached_offers column values, plus any extra columns given"""
+        return {
+            "offer_id": self.offer_id,
+            "origin": self.origin,
+            "destination": self.destination,
+            "depart_ts": self.depart_ts,
+            "arrive_ts": self.arrive_ts,
+            "airline": self.airline,
+            "flight_no": self.flight_no,
+            "return_depart_ts": self.return_depart_ts,
+            "return_arrive_ts": self.return_arrive_ts,
+            "return_flight_no": self.return_flight_no,
+            "price_minor": self.price_minor,
+            "currency": self.currency,
+            "source_currency": self.source_currency,
+            "source_price_minor": self.source_price_minor,
+            "seats": self.seats,
+            "duration_minutes": self.duration_minutes,
+            "stops": self.stops,
+            "passenger_mix": self.passenger_mix,
+            "offer_source": self.offer_source,
+            "payload": self.payload,
+            **extra,
+        }
+
+    def __repr__(self) -> str:
+        return f"FlightOffer({self.offer_id} {self.flight_no} {self.origin}->{self.destination} {self.depart_ts:%Y-%m-%d %H:%M})"
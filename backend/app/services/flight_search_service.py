@@ -0,0 +1,892 @@
+"""
+Flight Search Service
+Runs searches through the search cache and the Amadeus upstream,
+and persists the resulting offers into cached_offers
+"""
+import os
+import re
+import json
+import time
+import asyncio
+import hashlib
+from contextlib import aclosing
+from collections import Counter
+from typing import AsyncIterator, List, Dict, Any, Optional, Set, Tuple
+from datetime import datetime, timedelta
+from sqlalchemy import tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, undefer
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from app.db import SessionLocal
+from app.models.cached_offer import CachedOffer, OFFER_TTL, utc_now
+from app.schemas.flight import FlightSearchRequest, OfferSort
+from app.services.amadeus_service import AMADEUS_API_MAX_OFFERS, AmadeusService
+from app.services.amadeus_scheduler import AmadeusOverloadedError, RequestPriority
+from app.services.offer_expiry_service import is_partitioned
+from app.services.offer_detail_cache import offer_detail_cache
+from app.services.search_log_service import search_log_service
+from app.services.fx_rate_service import fx_rate_service
+from app.services.flight_offer import FlightOffer
+from app.services.offer_composition import connection_payload, offer_source
+from app.services.connection_graph import CONNECTION_MAX_STOPS, connection_graph
+from app.services.offer_ranking import RANKING_MAX_CANDIDATES, offer_ranker
+from app.services.inventory_index import RouteView, inventory_index
+from app.services.route_min_price_service import route_min_price_service
+from app.services.round_trip_pairing import best_cost, cheapest_cost, pair_payload, top_k_pairs
+from app.utils.logger import get_logger
+from app.utils.offer_ids import derive_offer_id
+from app.utils.cursors import encode_cursor, decode_cursor
+from app.utils.money import BASE_CURRENCY, to_minor, from_minor
+
+logger = get_logger(__name__)
+
+SEARCH_CACHE_TTL_SECONDS = int(os.getenv("FLIGHT_SEARCH_CACHE_TTL", "300"))
+SEARCH_CACHE_MAX_ENTRIES = int(os.getenv("FLIGHT_SEARCH_CACHE_MAX_ENTRIES", "1000"))
+# Offers any process persisted this recently answer a search without an upstream call
+SEARCH_SHARED_TTL_SECONDS = int(os.getenv("FLIGHT_SEARCH_SHARED_TTL", "1800"))
+BATCH_SEARCH_CONCURRENCY = int(os.getenv("FLIGHT_BATCH_CONCURRENCY", "8"))
+MAX_OFFERS_PER_SEARCH = AMADEUS_API_MAX_OFFERS
+# One-way results with fewer offers (or fewer than 3 airlines) are topped up with mock flights
+MIN_OFFERS_FOR_VARIETY = 15
+
+_ISO_DURATION = re.compile(r"^P(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?)?$")
+INFANT_TRAVELER_TYPES = {"HELD_INFANT", "SEATED_INFANT"}
+
+SORT_COLUMNS = {
+    OfferSort.price: CachedOffer.price_minor,
+    OfferSort.departure: CachedOffer.depart_ts,
+    OfferSort.arrival: CachedOffer.arrive_ts,
+    OfferSort.duration: CachedOffer.duration_minutes,
+}
+# Request fields that do not change which offers match, and so may differ between pages
+PAGE_FIELDS = {"cursor", "limit"}
+# Round trips: fewer upstream combinations than this are topped up by pairing the
+# separately searched legs, keeping the ROUND_TRIP_PAIRS cheapest and best pairs
+ROUND_TRIP_MIN_COMBINATIONS = int(os.getenv("ROUND_TRIP_MIN_COMBINATIONS", "10"))
+ROUND_TRIP_PAIRS = int(os.getenv("ROUND_TRIP_PAIRS", "20"))
+# Connecting itineraries for routes without a direct offer: hubs whose legs may be
+# searched to build them, and how many itineraries to store
+CONNECTION_HUBS = [hub.strip().upper() for hub in os.getenv("CONNECTION_HUBS", "DEL,BOM,BLR,HYD,MAA,CCU").split(",") if hub.strip()]
+CONNECTION_MAX_HUB_SEARCHES = int(os.getenv("CONNECTION_MAX_HUB_SEARCHES", "8"))
+CONNECTION_ITINERARIES = int(os.getenv("CONNECTION_ITINERARIES", "20"))
+
+
+def parse_iso_duration_minutes(duration: str) -> Optional[int]:
+    """Minutes in an ISO 8601 duration such as PT2H35M or P1DT3H, or None if unparseable"""
+    match = _ISO_DURATION.match(duration or "")
+    if not match or not any(match.groups()):
+        return None
+    days, hours, minutes = (int(part or 0) for part in match.groups())
+    return days * 1440 + hours * 60 + minutes
+
+
+def passenger_mix(adults: int, children: int, infants: int) -> str:
+    return f"{adults}-{children}-{infants}"
+
+
+def offer_passenger_mix(offer: dict) -> str:
+    """Passenger mix an offer was priced for, from its traveler pricings"""
+    types = Counter(traveler.get("travelerType", "ADULT") for traveler in offer.get("travelerPricings", []))
+    infants = sum(types[kind] for kind in INFANT_TRAVELER_TYPES)
+    children = types["CHILD"]
+    return passenger_mix(sum(types.values()) - children - infants, children, infants)
+
+
+def _parse_itinerary(itinerary: dict) -> Tuple[str, str, datetime, datetime, str, str, int, int]:
+    """
+    (origin, destination, depart_ts, arrive_ts, carrier, number, duration_minutes, stops)
+    of one itinerary; the first flight's carrier and number identify it
+    """
+    segments = itinerary.get("segments", [])
+
+    if not segments:
+        raise ValueError("No segments found in itinerary")
+
+    # For multi-segment flights, use first segment's origin and last segment's destination
+    first_segment = segments[0]
+    last_segment = segments[-1]
+    departure = first_segment.get("departure", {})
+    arrival = last_segment.get("arrival", {})
+    # Amadeus times are local to each airport; kept naive like the timestamp columns, so
+    # offers from different sources compare
+    depart_ts = datetime.fromisoformat(departure.get("at", "").replace("Z", "+00:00")).replace(tzinfo=None)
+    arrive_ts = datetime.fromisoformat(arrival.get("at", "").replace("Z", "+00:00")).replace(tzinfo=None)
+
+    # Segment times are local to each airport, so prefer the itinerary's own duration
+    duration_minutes = parse_iso_duration_minutes(itinerary.get("duration", ""))
+    if duration_minutes is None:
+        duration_minutes = max(int((arrive_ts - depart_ts).total_seconds() // 60), 0)
+
+    return (
+        departure.get("iataCode", "").upper(),
+        arrival.get("iataCode", "").upper(),
+        depart_ts,
+        arrive_ts,
+        first_segment.get("carrierCode", ""),
+        first_segment.get("number", ""),
+        duration_minutes,
+        len(segments) - 1 + sum(segment.get("numberOfStops", 0) for segment in segments),
+    )
+
+
+def parse_amadeus_offer(offer: dict) -> FlightOffer:
+    """
+    Parse Amadeus offer to our format
+    The first itinerary is the outbound journey; a second one, if present, is the
+    return journey of a round trip. duration_minutes and stops describe the longer
+    and the less direct of the two, so per-flight filters hold for both directions.
+    The price is normalized to base-currency minor units here, once; raises
+    UnknownCurrencyError (a ValueError) for a currency without an FX rate
+    """
+    itineraries = offer.get("itineraries") or [{}]
+    origin, destination, depart_ts, arrive_ts, airline, number, duration_minutes, stops = _parse_itinerary(itineraries[0])
+    return_depart_ts = return_arrive_ts = return_flight_no = None
+    if len(itineraries) > 1:
+        _, _, return_depart_ts, return_arrive_ts, return_airline, return_number, return_duration, return_stops = (
+            _parse_itinerary(itineraries[1])
+        )
+        return_flight_no = f"{return_airline}{return_number}"
+        duration_minutes = max(duration_minutes, return_duration)
+        stops = max(stops, return_stops)
+
+    price_info = offer.get("price", {})
+    source_currency = (price_info.get("currency") or BASE_CURRENCY).upper()
+    source_total = price_info.get("total", "0")
+
+    return FlightOffer(
+        # Amadeus ids ("1", "2", ...) are only unique within one response, so identify
+        # the offer by its itinerary, fare and passenger content instead
+        offer_id=derive_offer_id(offer),
+        origin=origin,
+        destination=destination,
+        depart_ts=depart_ts,
+        arrive_ts=arrive_ts,
+        airline=airline,
+        flight_number=number,
+        return_depart_ts=return_depart_ts,
+        return_arrive_ts=return_arrive_ts,
+        return_flight_no=return_flight_no,
+        price_minor=fx_rate_service.to_base_minor(source_total, source_currency),
+        currency=BASE_CURRENCY,
+        source_currency=source_currency,
+        source_price_minor=to_minor(source_total, source_currency),
+        # Upstream may send null; an offer with an unknown seat count is not bookable
+        seats=offer.get("numberOfBookableSeats", 1) or 0,
+        duration_minutes=duration_minutes,
+        stops=stops,
+        passenger_mix=offer_passenger_mix(offer),
+        offer_source=offer_source(offer),
+        payload=offer,
+    )
+
+
+class SearchResultCache:
+    """Small in-process TTL cache of parsed search results keyed by search parameters"""
+
+    def __init__(self, ttl_seconds: int = SEARCH_CACHE_TTL_SECONDS, max_entries: int = SEARCH_CACHE_MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: Dict[Tuple, Tuple[float, List[FlightOffer]]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key_for(request: FlightSearchRequest) -> Tuple:
+        return (
+            request.origin.upper(),
+            request.destination.upper(),
+            request.departure_date,
+            request.return_date,
+            request.adults,
+            request.children,
+            request.infants,
+        )
+
+    def get(self, request: FlightSearchRequest) -> Optional[List[FlightOffer]]:
+        key = self.key_for(request)
+        entry = self._entries.get(key)
+        if entry and entry[0] > time.monotonic():
+            self.hits += 1
+            return entry[1]
+        if entry:
+            del self._entries[key]
+        self.misses += 1
+        return None
+
+    def put(self, request: FlightSearchRequest, parsed_offers: List[FlightOffer]) -> None:
+        if self.ttl_seconds <= 0:
+            return
+        if len(self._entries) >= self.max_entries:
+            # Drop the entry closest to expiry to stay bounded
+            oldest_key = min(self._entries, key=lambda k: self._entries[k][0])
+            del self._entries[oldest_key]
+        self._entries[self.key_for(request)] = (time.monotonic() + self.ttl_seconds, parsed_offers)
+
+
+class FlightSearchService:
+    """Search pipeline shared by the single and batch flight search endpoints"""
+
+    def __init__(self, amadeus_service: Optional[AmadeusService] = None):
+        self.amadeus_service = amadeus_service or AmadeusService()
+        self.search_cache = SearchResultCache()
+        self.batch_semaphore = asyncio.Semaphore(BATCH_SEARCH_CONCURRENCY)
+
+    def _record(self, request: FlightSearchRequest, source: str, offer_count: int, started: float) -> None:
+        search_log_service.record(
+            origin=request.origin,
+            destination=request.destination,
+            departure_date=request.departure_date,
+            passenger_mix=passenger_mix(request.adults, request.children, request.infants),
+            source=source,
+            offer_count=offer_count,
+            latency_ms=(time.perf_counter() - started) * 1000,
+        )
+
+    async def fetch_offers(
+        self,
+        request: FlightSearchRequest,
+        priority: RequestPriority = RequestPriority.INTERACTIVE,
+        record: bool = True,
+    ) -> List[FlightOffer]:
+        """
+        Return parsed offers for a search, from the search cache or the upstream API.
+        Offers that fail to parse or do not match the requested route are dropped.
+        Upstream calls are scheduled at the given priority.
+        """
+        started = time.perf_counter()
+        cached = self.search_cache.get(request)
+        if cached is not None:
+            logger.info(f"Search cache hit: {request.origin} -> {request.destination} on {request.departure_date}")
+            if record:
+                self._record(request, "memory", len(cached), started)
+            return cached
+
+        parsed_offers = await self._fetch_upstream(request, priority)
+        if record:
+            self._record(request, "upstream", len(parsed_offers), started)
+        return parsed_offers
+
+    async def ensure_offers(
+        self,
+        db: AsyncSession,
+        request: FlightSearchRequest,
+        priority: RequestPriority = RequestPriority.INTERACTIVE,
+        record: bool = True,
+    ) -> str:
+        """
+        Make sure cached_offers holds a recent result for a search, and return where it
+        came from: "memory" (this process searched it within the search cache TTL),
+        "shared" (any process persisted offers for it within FLIGHT_SEARCH_SHARED_TTL,
+        e.g. the cache warm-up) or "upstream" (searched and persisted now).
+        """
+        started = time.perf_counter()
+        cached = self.search_cache.get(request)
+        if cached is not None:
+            source, offer_count = "memory", len(cached)
+        else:
+            offer_count = await db.run_sync(self.recent_offer_count, request)
+            source = "shared"
+            if offer_count:
+                await db.run_sync(self._refresh_index, request)
+            else:
+                parsed_offers = await self._fetch_upstream(request, priority)
+                await db.run_sync(self.persist_offers, parsed_offers)
+                source, offer_count = "upstream", len(parsed_offers)
+        if record:
+            self._record(request, source, offer_count, started)
+        return source
+
+    @staticmethod
+    def _refresh_index(db: Session, request: FlightSearchRequest) -> None:
+        """Another worker cached this search: load its offers into this worker's inventory index now"""
+        day = datetime.strptime(request.departure_date, "%Y-%m-%d").date()
+        inventory_index.refresh_route(db, request.origin.upper(), request.destination.upper(), day)
+
+    def recent_offer_count(self, db: Session, request: FlightSearchRequest) -> int:
+        """Unexpired offers for the search's route, day and passengers cached within the shared TTL"""
+        if SEARCH_SHARED_TTL_SECONDS <= 0:
+            return 0
+        day_start = datetime.strptime(request.departure_date, "%Y-%m-%d")
+        now = utc_now()
+        return db.query(CachedOffer.offer_id).filter(
+            *self._route_filters(request, day_start, day_start + timedelta(days=1)),
+            CachedOffer.cached_at >= now - timedelta(seconds=SEARCH_SHARED_TTL_SECONDS),
+            CachedOffer.expire_at > now,
+        ).count()
+
+    @staticmethod
+    def _route_filters(request: FlightSearchRequest, window_start: datetime, window_end: datetime) -> list:
+        filters = [
+            CachedOffer.origin == request.origin.upper(),
+            CachedOffer.destination == request.destination.upper(),
+            CachedOffer.depart_ts >= window_start,
+            CachedOffer.depart_ts < window_end,
+            CachedOffer.passenger_mix == passenger_mix(request.adults, request.children, request.infants),
+        ]
+        if request.return_date:
+            return_day = datetime.strptime(request.return_date, "%Y-%m-%d")
+            filters += [
+                CachedOffer.return_depart_ts >= return_day,
+                CachedOffer.return_depart_ts < return_day + timedelta(days=1),
+            ]
+        else:
+            filters.append(CachedOffer.return_depart_ts.is_(None))
+        return filters
+
+    @staticmethod
+    def _departure_window(request: FlightSearchRequest) -> Tuple[datetime, datetime]:
+        """[start, end) of the departure times a search's depart_after/depart_before allow"""
+        day_start = datetime.strptime(request.departure_date, "%Y-%m-%d")
+        window_start = day_start
+        window_end = day_start + timedelta(days=1)
+        if request.depart_after:
+            hours, minutes = map(int, request.depart_after.split(":"))
+            window_start = day_start + timedelta(hours=hours, minutes=minutes)
+        if request.depart_before:
+            hours, minutes = map(int, request.depart_before.split(":"))
+            window_end = min(window_end, day_start + timedelta(hours=hours, minutes=minutes + 1))
+        return window_start, window_end
+
+    def offer_matches(self, request: FlightSearchRequest, offer: FlightOffer) -> bool:
+        """Whether a parsed offer passes the search's route and filters, as query_offers applies them"""
+        window_start, window_end = self._departure_window(request)
+        return_date = offer.return_depart_ts.date().isoformat() if offer.is_round_trip else None
+        return (
+            offer.origin == request.origin.upper()
+            and offer.destination == request.destination.upper()
+            and return_date == request.return_date
+            and offer.passenger_mix == passenger_mix(request.adults, request.children, request.infants)
+            and window_start <= offer.depart_ts < window_end
+            and (request.min_price is None or offer.price_minor >= to_minor(request.min_price))
+            and (request.max_price is None or offer.price_minor <= to_minor(request.max_price))
+            and (not request.airlines or offer.airline in {code.upper() for code in request.airlines})
+            and (request.max_stops is None or offer.stops <= request.max_stops)
+            and (request.max_duration_minutes is None or offer.duration_minutes <= request.max_duration_minutes)
+        )
+
+    async def stream_search(
+        self,
+        db: AsyncSession,
+        request: FlightSearchRequest,
+        include_payload: bool = True,
+        priority: RequestPriority = RequestPriority.INTERACTIVE,
+    ) -> AsyncIterator[Tuple[str, list]]:
+        """
+        A search's matching offers as each source returns them, as (source, offers),
+        unpaged and unsorted. A search this process or another one ran recently is
+        answered from cached_offers in one batch ("memory" or "shared", CachedOffer
+        rows). Otherwise the upstream sources stream FlightOffers ("upstream", "mock",
+        "paired") and each source's offers are persisted in the background, off the
+        response path; a one-way search with no offer at all then gets connecting
+        itineraries ("connection"). The generator finishes once everything is stored,
+        so offers are bookable by the time it is exhausted.
+        """
+        started = time.perf_counter()
+        offer_count = 0
+        everything = request.model_copy(update={"limit": MAX_OFFERS_PER_SEARCH, "cursor": None})
+
+        source = "memory" if self.search_cache.get(request) is not None else None
+        if source is None and await db.run_sync(self.recent_offer_count, request):
+            source = "shared"
+            await db.run_sync(self._refresh_index, request)
+        if source is not None:
+            offers, _ = await db.run_sync(self.query_offers, everything, include_payload)
+            self._record(request, source, len(offers), started)
+            yield source, offers
+            return
+
+        parsed_offers: List[FlightOffer] = []
+        persisting: List[asyncio.Task] = []
+        pending: List[FlightOffer] = []
+        try:
+            sources = self._stream_upstream(request, priority)
+            async with aclosing(sources):
+                async for source, offers in sources:
+                    parsed_offers += offers
+                    if source == "upstream":
+                        # Upstream offers arrive one by one; they are stored together once that source ends
+                        pending += offers
+                    else:
+                        if pending:
+                            persisting.append(self.persist_offers_in_background(pending))
+                            pending = []
+                        persisting.append(self.persist_offers_in_background(offers))
+                    matching = [offer for offer in offers if self.offer_matches(request, offer)]
+                    offer_count += len(matching)
+                    if matching:
+                        yield source, matching
+        finally:
+            # Stored even when the search fails or the client disconnects mid-stream
+            if pending:
+                persisting.append(self.persist_offers_in_background(pending))
+            results = await asyncio.gather(*persisting, return_exceptions=True)
+            for result in results:
+                if isinstance(result, BaseException):
+                    logger.error(f"Background persistence of streamed offers failed: {str(result)}")
+
+        if parsed_offers:
+            self.search_cache.put(request, parsed_offers)
+        self._record(request, "upstream", len(parsed_offers), started)
+
+        if not offer_count and not request.return_date and await self.propose_connections(db, request):
+            offers, _ = await db.run_sync(self.query_offers, everything, include_payload)
+            if offers:
+                yield "connection", offers
+
+    def persist_offers_in_background(self, offers: List[FlightOffer]) -> "asyncio.Task":
+        """persist_offers in a worker thread with its own session; returns the task"""
+        def persist() -> int:
+            db = SessionLocal()
+            try:
+                return len(self.persist_offers(db, offers))
+            finally:
+                db.close()
+
+        return asyncio.create_task(asyncio.to_thread(persist))
+
+    async def _fetch_upstream(self, request: FlightSearchRequest, priority: RequestPriority) -> List[FlightOffer]:
+        """Search the upstream sources to completion and put the offers in the search cache"""
+        parsed_offers: List[FlightOffer] = []
+        sources = self._stream_upstream(request, priority)
+        async with aclosing(sources):
+            async for _, offers in sources:
+                parsed_offers += offers
+
+        if parsed_offers:
+            self.search_cache.put(request, parsed_offers)
+        return parsed_offers
+
+    async def _stream_upstream(
+        self,
+        request: FlightSearchRequest,
+        priority: RequestPriority,
+    ) -> AsyncIterator[Tuple[str, List[FlightOffer]]]:
+        """
+        Search Amadeus, parse and validate the offers, yielding (source, offers) as each
+        source returns them: "upstream" offers one at a time as they stream in (so the
+        raw response is never held whole), then mock flights topping up a thin one-way
+        result ("mock"), or, for round trips with too few upstream combinations, the
+        pairs of separately searched legs followed by the legs themselves ("paired").
+        """
+        offer_stream = self.amadeus_service.stream_flight_offers(
+            origin=request.origin,
+            destination=request.destination,
+            departure_date=request.departure_date,
+            return_date=request.return_date,
+            adults=request.adults,
+            children=request.children,
+            infants=request.infants,
+            priority=priority,
+        )
+
+        upstream_count = 0
+        seen_flights: Set[Tuple[str, str]] = set()
+        airlines: Set[str] = set()
+        async with aclosing(offer_stream):
+            async for offer in offer_stream:
+                parsed = self._parse_for_request(offer, request)
+                if parsed is None:
+                    continue
+                upstream_count += 1
+                seen_flights.add(parsed.first_flight)
+                airlines.add(parsed.airline)
+                yield "upstream", [parsed]
+                if upstream_count >= MAX_OFFERS_PER_SEARCH:
+                    break
+
+        if not request.return_date:
+            mock_offers = self._mock_top_up(request, upstream_count, seen_flights, airlines)
+            if mock_offers:
+                yield "mock", mock_offers
+        elif upstream_count < ROUND_TRIP_MIN_COMBINATIONS:
+            paired_offers = await self._pair_round_trips(request, priority, upstream_count)
+            if paired_offers:
+                yield "paired", paired_offers
+
+    @staticmethod
+    def _parse_for_request(offer: dict, request: FlightSearchRequest) -> Optional[FlightOffer]:
+        """Parse an upstream offer, or None if it fails to parse or does not match the search"""
+        try:
+            parsed = parse_amadeus_offer(offer)
+        except (ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Failed to parse offer {offer.get('id', 'unknown')}: {str(e)}")
+            return None
+
+        # Validate that parsed offer matches search parameters
+        if parsed.origin != request.origin.upper():
+            logger.warning(f"Offer {parsed.offer_id} origin mismatch: expected {request.origin}, got {parsed.origin}")
+            return None
+        if parsed.destination != request.destination.upper():
+            logger.warning(f"Offer {parsed.offer_id} destination mismatch: expected {request.destination}, got {parsed.destination}")
+            return None
+        return_date = parsed.return_depart_ts.date().isoformat() if parsed.is_round_trip else None
+        if return_date != request.return_date:
+            logger.warning(f"Offer {parsed.offer_id} return mismatch: expected {request.return_date}, got {return_date}")
+            return None
+        return parsed
+
+    def _mock_top_up(
+        self,
+        request: FlightSearchRequest,
+        offer_count: int,
+        seen_flights: Set[Tuple[str, str]],
+        airlines: Set[str],
+    ) -> List[FlightOffer]:
+        """
+        Mock flights to add to a one-way result with fewer than MIN_OFFERS_FOR_VARIETY
+        offers or fewer than 3 airlines, skipping the result's flights (seen_flights)
+        """
+        airlines = {airline for airline in airlines if airline}
+        if len(airlines) >= 3 and offer_count >= MIN_OFFERS_FOR_VARIETY:
+            return []
+        if offer_count:
+            logger.info(f"Only {len(airlines)} airline(s) ({', '.join(sorted(airlines))}) found in real API results, supplementing with mock data to ensure variety")
+        # Add mock flights that don't duplicate real ones, prioritizing real ones
+        added: List[FlightOffer] = []
+        mock_flights = self.amadeus_service.get_mock_flights(
+            request.origin, request.destination, request.departure_date,
+            request.adults, request.children, request.infants,
+        )
+        for mock_flight in mock_flights:
+            if offer_count + len(added) >= MIN_OFFERS_FOR_VARIETY and added:
+                break
+            parsed = self._parse_for_request(mock_flight, request)
+            if parsed is None or parsed.first_flight in seen_flights:
+                continue
+            seen_flights.add(parsed.first_flight)
+            added.append(parsed)
+        logger.info(f"Added {len(added)} mock flights")
+        return added
+
+    async def _pair_round_trips(
+        self,
+        request: FlightSearchRequest,
+        priority: RequestPriority,
+        upstream_count: int,
+    ) -> List[FlightOffer]:
+        """
+        Search the outbound and inbound legs as one-way trips concurrently and pair them
+        into the ROUND_TRIP_PAIRS cheapest and ROUND_TRIP_PAIRS best round trips.
+        Returns the paired round trips followed by the leg offers, which are stored as
+        ordinary one-way offers too. A shed leg search only propagates when there are
+        no upstream round trips to fall back on.
+        """
+        leg_fields = {"return_date": None, "cursor": None}
+        outbound_request = request.model_copy(update=leg_fields)
+        inbound_request = request.model_copy(update={
+            **leg_fields,
+            "origin": request.destination,
+            "destination": request.origin,
+            "departure_date": request.return_date,
+        })
+        outcomes = await asyncio.gather(
+            self.fetch_offers(outbound_request, priority, record=False),
+            self.fetch_offers(inbound_request, priority, record=False),
+            return_exceptions=True,
+        )
+        for outcome in outcomes:
+            if isinstance(outcome, BaseException):
+                if isinstance(outcome, AmadeusOverloadedError) and not upstream_count:
+                    raise outcome
+                logger.warning(f"Round trip leg search failed, keeping upstream combinations only: {str(outcome)}")
+                return []
+        outbound, inbound = outcomes
+
+        paired: Dict[str, FlightOffer] = {}
+        for cost in (cheapest_cost, best_cost):
+            for outbound_offer, inbound_offer in top_k_pairs(outbound, inbound, ROUND_TRIP_PAIRS, cost):
+                parsed = parse_amadeus_offer(pair_payload(outbound_offer, inbound_offer))
+                paired.setdefault(parsed.offer_id, parsed)
+        logger.info(
+            f"Paired {len(paired)} round trips from {len(outbound)} outbound and {len(inbound)} inbound offers "
+            f"({upstream_count} upstream combinations)"
+        )
+        return list(paired.values()) + outbound + inbound
+
+    async def fetch_offers_limited(
+        self,
+        request: FlightSearchRequest,
+        priority: RequestPriority = RequestPriority.PREFETCH,
+        record: bool = True,
+    ) -> List[FlightOffer]:
+        """fetch_offers under the process-wide batch concurrency limit, at prefetch priority by default"""
+        async with self.batch_semaphore:
+            return await self.fetch_offers(request, priority, record)
+
+    async def propose_connections(
+        self,
+        db: AsyncSession,
+        request: FlightSearchRequest,
+        priority: RequestPriority = RequestPriority.PREFETCH,
+    ) -> int:
+        """
+        Build connecting itineraries for a one-way search with no direct offer and store
+        them as offers of the searched route (offer_source "connection"), so they page,
+        filter and book like any other offer. Returns how many were stored.
+
+        The itineraries come from the connection graph of cached flights. When it has
+        none, the missing legs between the route's airports and CONNECTION_HUBS are
+        searched first (at most CONNECTION_MAX_HUB_SEARCHES, concurrently); a shed
+        leg search is skipped.
+        """
+        max_stops = min(CONNECTION_MAX_STOPS, request.max_stops if request.max_stops is not None else CONNECTION_MAX_STOPS)
+        if max_stops < 1:
+            return 0
+        origin, destination = request.origin.upper(), request.destination.upper()
+        mix = passenger_mix(request.adults, request.children, request.infants)
+        day_start = datetime.strptime(request.departure_date, "%Y-%m-%d")
+
+        await db.run_sync(connection_graph.ensure_synced)
+        itineraries = connection_graph.search(origin, destination, day_start, mix, max_stops, CONNECTION_ITINERARIES)
+        if not itineraries:
+            leg_routes = [
+                (leg_origin, leg_destination)
+                for hub in CONNECTION_HUBS if hub not in (origin, destination)
+                for leg_origin, leg_destination in ((origin, hub), (hub, destination))
+                if not connection_graph.has_departures(mix, leg_origin, leg_destination, day_start)
+            ][:CONNECTION_MAX_HUB_SEARCHES]
+            leg_fields = {"return_date": None, "cursor": None}
+            outcomes = await asyncio.gather(
+                *(
+                    self.fetch_offers_limited(
+                        request.model_copy(update={**leg_fields, "origin": leg_origin, "destination": leg_destination}),
+                        priority,
+                        record=False,
+                    )
+                    for leg_origin, leg_destination in leg_routes
+                ),
+                return_exceptions=True,
+            )
+            for (leg_origin, leg_destination), outcome in zip(leg_routes, outcomes):
+                if isinstance(outcome, BaseException):
+                    logger.warning(f"Connection leg search {leg_origin} -> {leg_destination} failed: {str(outcome)}")
+            await db.run_sync(
+                self.persist_offers, [offer for outcome in outcomes if isinstance(outcome, list) for offer in outcome]
+            )
+            itineraries = connection_graph.search(origin, destination, day_start, mix, max_stops, CONNECTION_ITINERARIES)
+        if not itineraries:
+            logger.info(f"No connecting itineraries for {origin} -> {destination} on {request.departure_date}")
+            return 0
+
+        # Legs' payloads are only read for the itineraries being stored
+        leg_ids = {flight.offer_id for itinerary in itineraries for flight in itinerary.flights}
+        legs = await db.run_sync(self._load_offers, leg_ids)
+        composed = []
+        for itinerary in itineraries:
+            if all(flight.offer_id in legs for flight in itinerary.flights):
+                itinerary_legs = [legs[flight.offer_id] for flight in itinerary.flights]
+                composed.append(parse_amadeus_offer(connection_payload(itinerary_legs, itinerary.travel_minutes)))
+        stored = await db.run_sync(self.persist_offers, composed)
+        logger.info(
+            f"Stored {len(stored)} connecting itineraries for {origin} -> {destination} on {request.departure_date} "
+            f"(graph search {connection_graph.stats['last_search_ms']} ms)"
+        )
+        return len(stored)
+
+    @staticmethod
+    def _load_offers(db: Session, offer_ids: Set[str]) -> Dict[str, FlightOffer]:
+        """Cached offers with their payloads, as FlightOffers by offer ID"""
+        return {
+            offer.offer_id: FlightOffer.from_row(offer)
+            for offer in db.query(CachedOffer).options(undefer(CachedOffer.payload)).filter(CachedOffer.offer_id.in_(offer_ids))
+        }
+
+    def persist_offers(self, db: Session, parsed_offers: List[FlightOffer]) -> List[Dict[str, Any]]:
+        """
+        Upsert parsed offers with a single INSERT ... ON CONFLICT ... RETURNING and commit.
+        Returns the stored rows as dicts in input order, one per distinct offer_id.
+
+        Round trips: one statement plus the commit, regardless of the number of offers.
+        Existing offers get their price, payload and expiry refreshed; seats are left
+        as stored. Rows cached under the same id for a different route or departure
+        are not touched and are omitted.
+        """
+        # De-duplicate by offer_id, keeping the first occurrence; ON CONFLICT cannot
+        # affect the same row twice in one statement
+        unique_offers: Dict[str, FlightOffer] = {}
+        for parsed in parsed_offers:
+            unique_offers.setdefault(parsed.offer_id, parsed)
+        if not unique_offers:
+            return []
+
+        now = utc_now()
+        # Sorted by key so concurrent upserts of overlapping offers lock rows in the same order
+        rows = [
+            {**unique_offers[offer_id].as_row(), "cached_at": now, "expire_at": now + OFFER_TTL}
+            for offer_id in sorted(unique_offers)
+        ]
+        table = CachedOffer.__table__
+        stmt = pg_insert(table).values(rows)
+        # A partitioned cached_offers can only enforce uniqueness together with its partition key
+        conflict_columns = [table.c.offer_id, table.c.depart_ts] if is_partitioned(db) else [table.c.offer_id]
+        stmt = stmt.on_conflict_do_update(
+            index_elements=conflict_columns,
+            set_={
+                "price_minor": stmt.excluded.price_minor,
+                "currency": stmt.excluded.currency,
+                "source_currency": stmt.excluded.source_currency,
+                "source_price_minor": stmt.excluded.source_price_minor,
+                "payload": stmt.excluded.payload,
+                "cached_at": stmt.excluded.cached_at,
+                "expire_at": stmt.excluded.expire_at,
+            },
+            where=(
+                (table.c.origin == stmt.excluded.origin)
+                & (table.c.destination == stmt.excluded.destination)
+                & (table.c.depart_ts == stmt.excluded.depart_ts)
+            ),
+        # The payload is not read back: the stored value is the one just written
+        ).returning(*(column for column in table.c if column.name != "payload"))
+
+        try:
+            stored = {
+                row["offer_id"]: {
+                    **row,
+                    "price": from_minor(row["price_minor"], row["currency"]),
+                    "payload": unique_offers[row["offer_id"]].payload,
+                }
+                for row in db.execute(stmt).mappings()
+            }
+            # Exploration fares move with the offers, in the same transaction
+            route_min_price_service.record(db, stored.values())
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+        # Warm the offer detail cache for the select/pay flow that usually follows
+        offer_detail_cache.put_rows(stored.values())
+        # New one-way flights become connection graph edges right away
+        connection_graph.add_offers(stored.values())
+        inventory_index.add_offers(stored.values())
+
+        skipped = len(unique_offers) - len(stored)
+        if skipped:
+            logger.warning(f"Skipped {skipped} offer(s) already cached for a different route or departure")
+        return [stored[offer_id] for offer_id in unique_offers if offer_id in stored]
+
+    def query_offers(
+        self,
+        db: Session,
+        request: FlightSearchRequest,
+        include_payload: bool = True,
+    ) -> Tuple[List[CachedOffer], Optional[str]]:
+        """
+        One page of unexpired cached offers for a search, filtered and sorted as requested.
+        Returns the offers and the cursor of the next page (None on the last page).
+        With request.rank, the page is instead the top `limit` offers under that scoring
+        profile, and there is no next page.
+
+        Paging is keyset-based on (sort column, offer_id), so each page is an index
+        range scan of the route's departure day regardless of how deep it is.
+        Raises ValueError for a malformed cursor or one issued for a different search.
+        """
+        sort_column = SORT_COLUMNS[request.sort_by]
+        query_hash = hashlib.sha256(
+            json.dumps(request.model_dump(mode="json", exclude=PAGE_FIELDS), sort_keys=True).encode()
+        ).hexdigest()[:16]
+
+        window_start, window_end = self._departure_window(request)
+        query = db.query(CachedOffer).filter(
+            *self._route_filters(request, window_start, window_end),
+            CachedOffer.expire_at > utc_now(),
+        )
+        if request.min_price is not None:
+            query = query.filter(CachedOffer.price_minor >= to_minor(request.min_price))
+        if request.max_price is not None:
+            query = query.filter(CachedOffer.price_minor <= to_minor(request.max_price))
+        if request.airlines:
+            query = query.filter(CachedOffer.airline.in_([code.upper() for code in request.airlines]))
+        if request.max_stops is not None:
+            query = query.filter(CachedOffer.stops <= request.max_stops)
+        if request.max_duration_minutes is not None:
+            query = query.filter(CachedOffer.duration_minutes <= request.max_duration_minutes)
+
+        if request.rank:
+            if request.cursor:
+                raise ValueError("Ranked results are not paged")
+            return self._ranked_offers(db, request, query, include_payload), None
+
+        if request.cursor:
+            position = decode_cursor(request.cursor)
+            if position.get("q") != query_hash:
+                raise ValueError("Cursor does not belong to this search")
+            last_value = position.get("v")
+            if request.sort_by in (OfferSort.departure, OfferSort.arrival):
+                last_value = datetime.fromisoformat(last_value)
+            query = query.filter(tuple_(sort_column, CachedOffer.offer_id) > tuple_(last_value, position.get("id")))
+
+        if include_payload:
+            query = query.options(undefer(CachedOffer.payload))
+        # One extra row tells whether another page exists
+        offers = query.order_by(sort_column, CachedOffer.offer_id).limit(request.limit + 1).all()
+
+        next_cursor = None
+        if len(offers) > request.limit:
+            offers = offers[:request.limit]
+            last = offers[-1]
+            last_value = getattr(last, sort_column.key)
+            next_cursor = encode_cursor({
+                "q": query_hash,
+                "v": last_value.isoformat() if isinstance(last_value, datetime) else last_value,
+                "id": last.offer_id,
+            })
+        return offers, next_cursor
+
+    def _index_view(self, db: Session, request: FlightSearchRequest) -> Optional[RouteView]:
+        """The search's matching offers from the inventory index, or None if it cannot answer"""
+        day_start = datetime.strptime(request.departure_date, "%Y-%m-%d")
+        if not inventory_index.ensure_synced(db):
+            return None
+        window_start, window_end = self._departure_window(request)
+        return inventory_index.route_view(
+            request.origin.upper(),
+            request.destination.upper(),
+            day_start.date(),
+            passenger_mix(request.adults, request.children, request.infants),
+            return_day=datetime.strptime(request.return_date, "%Y-%m-%d").date() if request.return_date else None,
+            depart_window=(
+                int((window_start - day_start).total_seconds() // 60),
+                int((window_end - day_start).total_seconds() // 60),
+            ),
+            min_price_minor=to_minor(request.min_price) if request.min_price is not None else None,
+            max_price_minor=to_minor(request.max_price) if request.max_price is not None else None,
+            airlines=[code.upper() for code in request.airlines] if request.airlines else None,
+            max_stops=request.max_stops,
+            max_duration_minutes=request.max_duration_minutes,
+        )
+
+    def _ranked_offers(self, db: Session, request: FlightSearchRequest, query, include_payload: bool) -> List[CachedOffer]:
+        """
+        The request's top `limit` offers under its scoring profile. The offers are
+        scored from the inventory index when it covers the date; otherwise only the
+        ranked columns of the matching rows (at most RANKING_MAX_CANDIDATES, cheapest
+        first) are read. Full rows are loaded for the winners alone.
+        """
+        view = self._index_view(db, request)
+        if view is not None:
+            best = offer_ranker.rank_columns(view, request.rank, request.limit, request.preferred_airlines)
+            ranked_ids = view.offer_ids(best).tolist()
+        else:
+            candidates = query.with_entities(
+                CachedOffer.offer_id,
+                CachedOffer.price_minor,
+                CachedOffer.duration_minutes,
+                CachedOffer.stops,
+                CachedOffer.depart_ts,
+                CachedOffer.airline,
+            ).order_by(CachedOffer.price_minor, CachedOffer.offer_id).limit(RANKING_MAX_CANDIDATES).all()
+            ranked_ids = [
+                row.offer_id
+                for row in offer_ranker.rank(candidates, request.rank, request.limit, request.preferred_airlines)
+            ]
+        if not ranked_ids:
+            return []
+
+        rows = db.query(CachedOffer).filter(CachedOffer.offer_id.in_(ranked_ids), CachedOffer.expire_at > utc_now())
+        if include_payload:
+            rows = rows.options(undefer(CachedOffer.payload))
+        by_id = {offer.offer_id: offer for offer in rows}
+        return [by_id[offer_id] for offer_id in ranked_ids if offer_id in by_id]
+
+flight_search_service = FlightSearchService()
@@ -0,0 +1,163 @@
+"""
+FX Rate Service
+In-process cache of the fx_rates table, used to normalize prices into the base
+currency once, at ingestion
+"""
+import os
+import time
+import asyncio
+import threading
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Dict, Any, Optional, Callable, Union
+from sqlalchemy import column, table
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+from app.db import SessionLocal
+from app.models.cached_offer import utc_now
+from app.models.fx_rate import FxRate
+from app.utils.logger import get_logger
+from app.utils.money import BASE_CURRENCY, currency_exponent
+
+logger = get_logger(__name__)
+
+FX_RATES_REFRESH_SECONDS = int(os.getenv("FX_RATES_REFRESH_SECONDS", "3600"))
+# Rates an empty fx_rates starts with, in units of the base currency per unit: the rate
+# previously hard-coded for USD, plus any listed in FX_SEED_RATES, e.g. "EUR=90.5,GBP=105.2"
+INITIAL_FX_RATES: Dict[str, Decimal] = {BASE_CURRENCY: Decimal(1), "USD": Decimal("83")}
+FX_SEED_RATES = os.getenv("FX_SEED_RATES", "")
+
+# fx_rates as migration 008 creates it, so the migration can seed it too
+_fx_rates = table("fx_rates", column("currency"), column("rate"), column("updated_at"))
+
+
+def seed_rates() -> Dict[str, Decimal]:
+    """INITIAL_FX_RATES with FX_SEED_RATES applied"""
+    rates = dict(INITIAL_FX_RATES)
+    for item in FX_SEED_RATES.split(","):
+        if item.strip():
+            currency, _, rate = item.partition("=")
+            rates[currency.strip().upper()] = Decimal(rate.strip())
+    return rates
+
+
+def seed_fx_rates(db: Union[Connection, Session]) -> int:
+    """
+    Insert the seed rates fx_rates does not hold yet, in the caller's transaction; rates
+    already stored are kept. Returns how many were inserted.
+    """
+    now = utc_now()
+    stmt = pg_insert(_fx_rates).values([
+        {"currency": currency, "rate": rate, "updated_at": now} for currency, rate in seed_rates().items()
+    ]).on_conflict_do_nothing().returning(_fx_rates.c.currency)
+    return len(db.execute(stmt).all())
+
+
+class UnknownCurrencyError(ValueError):
+    """Raised when no FX rate is configured for a currency"""
+
+
+class FxRateService:
+    """
+    Rates are loaded from fx_rates at startup and reloaded every FX_RATES_REFRESH_SECONDS
+    by a background task, in a worker thread; lookups only read the loaded rates, so
+    they never wait on the database. If a reload fails the previous rates stay in use.
+    Scripts call refresh() themselves.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session] = SessionLocal,
+        refresh_seconds: int = FX_RATES_REFRESH_SECONDS,
+    ):
+        self.session_factory = session_factory
+        self.refresh_seconds = refresh_seconds
+        self._rates: Dict[str, Decimal] = {BASE_CURRENCY: Decimal(1)}
+        self._loaded_at: Optional[float] = None
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.refreshes = 0
+        self.refresh_failures = 0
+
+    def refresh(self) -> Dict[str, Decimal]:
+        db = self.session_factory()
+        try:
+            rates = {row.currency.upper(): Decimal(row.rate) for row in db.query(FxRate).all()}
+        finally:
+            db.close()
+        rates[BASE_CURRENCY] = Decimal(1)
+        with self._lock:
+            self._rates = rates
+            self._loaded_at = time.monotonic()
+            self.refreshes += 1
+        return rates
+
+    async def load(self) -> None:
+        """refresh() in a worker thread, keeping the previous rates if it fails"""
+        try:
+            rates = await asyncio.to_thread(self.refresh)
+        except Exception as e:
+            self.refresh_failures += 1
+            logger.error(f"FX rate refresh failed, keeping previous rates: {str(e)}")
+            return
+        if len(rates) == 1:
+            logger.error(f"fx_rates holds no rate besides {BASE_CURRENCY}; offers quoted in other currencies will be dropped")
+
+    def rates(self) -> Dict[str, Decimal]:
+        return self._rates
+
+    def rate(self, currency: str) -> Decimal:
+        """Units of the base currency per unit of the given currency"""
+        currency = (currency or BASE_CURRENCY).upper()
+        rate = self.rates().get(currency)
+        if rate is None:
+            raise UnknownCurrencyError(f"No FX rate for {currency}")
+        return rate
+
+    def to_base_minor(self, amount: Union[str, int, float, Decimal], currency: str) -> int:
+        """Convert a major-unit amount in any configured currency to base-currency minor units"""
+        converted = Decimal(str(amount)) * self.rate(currency)
+        return int(converted.scaleb(currency_exponent(BASE_CURRENCY)).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+    def set_rate(self, db: Session, currency: str, rate: Union[str, float, Decimal]) -> None:
+        """Insert or update a rate; this process uses it at once, others from their next refresh"""
+        stmt = pg_insert(FxRate).values(currency=currency.upper(), rate=Decimal(str(rate)), updated_at=utc_now())
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=[FxRate.currency],
+            set_={"rate": stmt.excluded.rate, "updated_at": stmt.excluded.updated_at},
+        ))
+        db.commit()
+        with self._lock:
+            self._rates = {**self._rates, currency.upper(): Decimal(str(rate))}
+
+    async def run_forever(self) -> None:
+        while True:
+            await asyncio.sleep(self.refresh_seconds)
+            await self.load()
+
+    def start(self) -> Optional[asyncio.Task]:
+        """Reload the rates on an interval; load() them first, before serving"""
+        if self._task is None:
+            self._task = asyncio.create_task(self.run_forever())
+        return self._task
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "base_currency": BASE_CURRENCY,
+            "rates": {currency: str(rate) for currency, rate in sorted(self._rates.items())},
+            "loaded_seconds_ago": round(time.monotonic() - self._loaded_at, 1) if self._loaded_at else None,
+            "refreshes": self.refreshes,
+            "refresh_failures": self.refresh_failures,
+        }
+
+
+fx_rate_service = FxRateService()
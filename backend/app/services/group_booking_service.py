@@ -0,0 +1,137 @@
+"""
+Group Booking Service
+Books many passengers across several offers in one transaction: every booking is
+validated up front, the offers involved are locked once in offer_id order, seats are
+allotted in request order, and the bookings are written with one multi-row INSERT
+"""
+import uuid
+from collections import Counter
+from typing import Any, Dict, List, Optional
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+from app.models.booking import Booking, utc_now
+from app.models.cached_offer import CachedOffer
+from app.schemas.booking import GroupBookingRequest
+from app.services.booking_cache import booking_cache
+from app.services.booking_history_service import booking_dict
+from app.services.seat_inventory import seat_inventory
+from app.utils.logger import get_logger
+from app.utils.money import to_minor
+from app.utils.validators import passenger_error
+
+logger = get_logger(__name__)
+
+FOOD_CHARGE = 200  # INR, added once per booking when food is selected
+
+
+def booking_total_minor(offer: CachedOffer, passengers: int, food_preference: bool) -> int:
+    """Price of a booking in minor units; offer prices are already in INR"""
+    total = offer.price_minor * passengers
+    if food_preference:
+        total += to_minor(FOOD_CHARGE, offer.currency)
+    return total
+
+
+class GroupBookingService:
+    """Bookings of a travel desk's group, made together"""
+
+    def book(self, db: Session, request: GroupBookingRequest) -> List[Dict[str, Any]]:
+        """
+        Make the group's bookings and commit. Returns one result per requested booking, in
+        request order, holding either the booking or why it was not made. Bookings that
+        fail leave the others booked, unless the request is all or nothing.
+        """
+        results: List[Dict[str, Any]] = [
+            {"index": index, "offer_id": item.offer_id, "booking": None, "error": None}
+            for index, item in enumerate(request.bookings)
+        ]
+        for result, item in zip(results, request.bookings):
+            result["error"] = next(filter(None, map(passenger_error, item.passengers)), None)
+
+        # Every offer and composed leg in two queries, then one lock of all of them
+        offers = {
+            offer.offer_id: offer
+            for offer in db.query(CachedOffer).filter(
+                CachedOffer.offer_id.in_({item.offer_id for item in request.bookings})
+            )
+        }
+        leg_ids = seat_inventory.leg_ids(db, offers.values())
+        seat_counts: List[Optional[Dict[str, int]]] = []
+        for result, item in zip(results, request.bookings):
+            offer = offers.get(item.offer_id)
+            if offer is None:
+                result["error"] = result["error"] or "Offer not found"
+            seat_counts.append(
+                seat_inventory.seat_counts(db, offer, len(item.passengers), leg_ids.get(offer.offer_id, []))
+                if offer and not result["error"] else None
+            )
+        seats_left = seat_inventory.lock(db, {offer_id for counts in seat_counts if counts for offer_id in counts})
+
+        # Allot seats in request order; a booking that does not fit leaves them to later ones.
+        # Legs no longer cached are skipped, as reserve() skips them.
+        taken: Counter = Counter()
+        for result, item, counts in zip(results, request.bookings, seat_counts):
+            if counts is None:
+                continue
+            counts = {
+                offer_id: seats for offer_id, seats in counts.items()
+                if offer_id in seats_left or offer_id == item.offer_id
+            }
+            if any(seats_left.get(offer_id, 0) - taken[offer_id] < seats for offer_id, seats in counts.items()):
+                available = min(seats_left.get(offer_id, 0) - taken[offer_id] for offer_id in counts)
+                result["error"] = (
+                    f"Not enough seats available. Requested: {len(item.passengers)}, Available: {max(available, 0)}"
+                )
+                continue
+            taken.update(counts)
+
+        failed = sum(1 for result in results if result["error"])
+        if request.all_or_nothing and failed:
+            db.rollback()
+            for result in results:
+                result["error"] = result["error"] or "Not booked: another booking in the group failed"
+            return results
+        if failed == len(results):
+            db.rollback()
+            return results
+
+        reserved = seat_inventory.reserve(db, dict(taken))
+        if set(reserved) != set(taken):
+            # The offers are locked and their seats checked, so this means a bug or a
+            # concurrent delete of a locked offer; book nothing
+            db.rollback()
+            raise RuntimeError(f"Seat reservation of group booking failed for {sorted(set(taken) - set(reserved))}")
+
+        now = utc_now()
+        rows = []
+        for result, item in zip(results, request.bookings):
+            if result["error"]:
+                continue
+            offer = offers[item.offer_id]
+            row = {
+                "booking_id": str(uuid.uuid4()),
+                "user_email": request.user_email,
+                "offer_id": item.offer_id,
+                "passengers": [p.model_dump() for p in item.passengers],
+                "total_amount_minor": booking_total_minor(offer, len(item.passengers), item.food_preference),
+                "currency": offer.currency,
+                "payment_status": "paid",
+                "status": "confirmed",
+                "food_preference": item.food_preference,
+                "created_at": now,
+            }
+            rows.append(row)
+            result["booking"] = booking_dict(Booking(**row), offer.origin, offer.destination, offer.depart_ts)
+        db.execute(insert(Booking), rows)
+        booking_cache.publish(db, request.user_email)
+        db.commit()
+        seat_inventory.forget(reserved)
+
+        logger.info(
+            f"Group booking for {request.user_email}: {len(rows)} bookings made, {failed} failed, "
+            f"{sum(len(row['passengers']) for row in rows)} passengers"
+        )
+        return results
+
+
+group_booking_service = GroupBookingService()
@@ -0,0 +1,565 @@
+"""
+Inventory Index
+Per-worker columnar index of live cached offers: one NumPy array per field for each
+(origin, destination, departure date), answering min-price, range and top-k queries
+in memory instead of reading cached_offers row by row. Kept current from the cache
+write path, the expiry sweep and a periodic read of rows other workers cached
+"""
+import os
+import time
+import asyncio
+import threading
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+import numpy as np
+from sqlalchemy.orm import Session
+from app.db import SessionLocal
+from app.models.cached_offer import CachedOffer, utc_now
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+INVENTORY_INDEX_ENABLED = os.getenv("INVENTORY_INDEX_ENABLED", "true").lower() == "true"
+# Most offers one worker holds; past it the farthest departure dates are left to the database
+INVENTORY_INDEX_MAX_ROWS = int(os.getenv("INVENTORY_INDEX_MAX_ROWS", "200000"))
+# Offers cached by other processes are picked up this often, in seconds
+INVENTORY_INDEX_SYNC_SECONDS = float(os.getenv("INVENTORY_INDEX_SYNC_SECONDS", "30"))
+# Rows fetched per round trip while rebuilding from cached_offers
+INVENTORY_INDEX_LOAD_BATCH = int(os.getenv("INVENTORY_INDEX_LOAD_BATCH", "5000"))
+# Each sync re-reads rows cached this long before the previous one, so a write that
+# committed after a sync with an earlier cached_at is not missed
+SYNC_OVERLAP = timedelta(seconds=10)
+# Once pruning leaves fewer offers than this share of max_rows, syncs move the horizon
+# forward, loading the departure dates past it that fit
+HORIZON_EXTEND_BELOW = 0.9
+
+_EPOCH = datetime(1970, 1, 1)
+
+# Indexed fields and their array types; codes index the index's string vocabulary
+COLUMN_TYPES = {
+    "price_minor": np.int64,
+    "depart_minute": np.int16,  # minute of the departure day, airport-local like depart_ts
+    "duration": np.int32,
+    "stops": np.int16,
+    "seats": np.int16,
+    "airline_code": np.int32,
+    "mix_code": np.int32,
+    "source_code": np.int32,
+    "return_day": np.int32,  # date.toordinal() of the return departure, 0 for one-way
+    "expire_at": np.int64,  # epoch seconds
+}
+# cached_offers columns read to index an offer
+INDEXED_COLUMNS = [
+    CachedOffer.offer_id, CachedOffer.origin, CachedOffer.destination, CachedOffer.depart_ts,
+    CachedOffer.price_minor, CachedOffer.duration_minutes, CachedOffer.stops, CachedOffer.seats,
+    CachedOffer.airline, CachedOffer.passenger_mix, CachedOffer.offer_source,
+    CachedOffer.return_depart_ts, CachedOffer.expire_at, CachedOffer.cached_at,
+]
+
+RouteDayKey = Tuple[str, str, date]
+
+
+def epoch_seconds(moment: datetime) -> int:
+    return int((moment - _EPOCH).total_seconds())
+
+
+class _RouteDay:
+    """
+    The offers of one route and departure date. Re-cached offers are updated in place;
+    new ones wait in `pending` and are appended to the arrays in one step when the
+    group is next read, so a write of many offers costs one concatenation.
+    """
+
+    __slots__ = ("offer_ids", "positions", "columns", "pending")
+
+    def __init__(self):
+        self.offer_ids: List[str] = []
+        self.positions: Dict[str, int] = {}
+        self.columns: Dict[str, np.ndarray] = {name: np.empty(0, dtype) for name, dtype in COLUMN_TYPES.items()}
+        self.pending: Dict[str, Tuple[int, ...]] = {}
+
+    def __len__(self) -> int:
+        return len(self.offer_ids) + len(self.pending)
+
+    def upsert(self, offer_id: str, values: Tuple[int, ...]) -> bool:
+        """Store an offer's column values; True if the offer is new to the group"""
+        position = self.positions.get(offer_id)
+        if position is not None:
+            for column, value in zip(self.columns.values(), values):
+                column[position] = value
+            return False
+        is_new = offer_id not in self.pending
+        self.pending[offer_id] = values
+        return is_new
+
+    def merge(self) -> None:
+        if not self.pending:
+            return
+        block = np.array(list(self.pending.values()), dtype=np.int64)
+        for position, (name, dtype) in enumerate(COLUMN_TYPES.items()):
+            self.columns[name] = np.concatenate((self.columns[name], block[:, position].astype(dtype)))
+        for offer_id in self.pending:
+            self.positions[offer_id] = len(self.offer_ids)
+            self.offer_ids.append(offer_id)
+        self.pending.clear()
+
+    def keep(self, mask: np.ndarray) -> int:
+        """Drop the offers where mask is False (after merging); returns how many were dropped"""
+        dropped = len(mask) - int(np.count_nonzero(mask))
+        if dropped:
+            self.columns = {name: column[mask] for name, column in self.columns.items()}
+            # A new list, so views holding the old one keep their positions
+            self.offer_ids = [offer_id for offer_id, kept in zip(self.offer_ids, mask) if kept]
+            self.positions = {offer_id: position for position, offer_id in enumerate(self.offer_ids)}
+        return dropped
+
+
+class RouteView:
+    """
+    The live offers of one route and day matching a query, copied out of the index so
+    later writes do not change it. Exposes price, duration, stops, depart_minute,
+    airline and offer_ids(indices) like OfferColumns, so OfferRanker can rank a view.
+    """
+
+    def __init__(self, columns: Dict[str, np.ndarray], offer_ids: Sequence[str], names: Sequence[str]):
+        self._offer_ids = offer_ids
+        self._names = names
+        self.price = columns["price_minor"]
+        self.duration = columns["duration"]
+        self.stops = columns["stops"]
+        self.depart_minute = columns["depart_minute"]
+        self.seats = columns["seats"]
+        self._airline_codes = columns["airline_code"]
+        self._positions = columns["position"]
+
+    def __len__(self) -> int:
+        return len(self.price)
+
+    @property
+    def airline(self) -> np.ndarray:
+        return np.array(self._names, dtype=str)[self._airline_codes] if len(self) else np.empty(0, dtype=str)
+
+    def offer_ids(self, indices: Optional[Iterable[int]] = None) -> np.ndarray:
+        """IDs of the offers at the given view positions (all offers by default)"""
+        positions = self._positions if indices is None else self._positions[np.asarray(indices, dtype=np.intp)]
+        return np.array([self._offer_ids[position] for position in positions], dtype=str)
+
+    def min_price(self) -> Optional[int]:
+        return int(self.price.min()) if len(self) else None
+
+    def price_range(self) -> Optional[Tuple[int, int]]:
+        return (int(self.price.min()), int(self.price.max())) if len(self) else None
+
+    def cheapest(self, k: int) -> List[str]:
+        """IDs of the k cheapest offers, cheapest first, ties by offer ID"""
+        if k <= 0 or not len(self):
+            return []
+        candidates = np.arange(len(self))
+        if k < len(self):
+            kth_price = np.partition(self.price, k - 1)[k - 1]
+            candidates = np.flatnonzero(self.price <= kth_price)
+        order = np.lexsort((self.offer_ids(candidates), self.price[candidates]))
+        return self.offer_ids(candidates[order[:k]]).tolist()
+
+
+class InventoryIndex:
+    """
+    Route-day groups of live offers, loaded from cached_offers at startup in departure
+    order. At most max_rows offers are held: when there are more, the index covers the
+    departure dates up to `horizon` and queries for later dates return None, for the
+    caller to answer from the database. Expired offers are skipped by queries and
+    dropped by prune(), which the expiry sweep and every sync run; a sync that leaves
+    room moves the horizon forward again.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session] = SessionLocal,
+        max_rows: int = INVENTORY_INDEX_MAX_ROWS,
+        sync_seconds: float = INVENTORY_INDEX_SYNC_SECONDS,
+    ):
+        self.session_factory = session_factory
+        self.max_rows = max_rows
+        self.sync_seconds = sync_seconds
+        self._groups: Dict[RouteDayKey, _RouteDay] = {}
+        self._codes: Dict[str, int] = {}
+        self._names: List[str] = []
+        self._rows = 0
+        self._loaded = False
+        self._rebuilding = False
+        self.horizon: Optional[date] = None
+        # Room the first departure date past the horizon needed when it last did not fit
+        self._extend_needs = 0
+        self._watermark: Optional[datetime] = None
+        self._synced_at: Optional[float] = None
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.stats: Dict[str, Any] = {
+            "rebuilds": 0,
+            "last_rebuild_rows": None,
+            "last_rebuild_ms": None,
+            "syncs": 0,
+            "last_sync_rows": None,
+            "rows_pruned_total": 0,
+            "horizon_extensions": 0,
+            "queries": 0,
+        }
+
+    def _code(self, name: Optional[str]) -> int:
+        name = name or ""
+        code = self._codes.get(name)
+        if code is None:
+            code = self._codes[name] = len(self._names)
+            self._names.append(name)
+        return code
+
+    def _values(self, offer: Any, get: Callable[[Any, str], Any]) -> Tuple[int, ...]:
+        depart_ts = get(offer, "depart_ts")
+        return_depart_ts = get(offer, "return_depart_ts")
+        return (
+            get(offer, "price_minor"),
+            depart_ts.hour * 60 + depart_ts.minute,
+            get(offer, "duration_minutes") or 0,
+            get(offer, "stops") or 0,
+            min(get(offer, "seats") or 0, np.iinfo(np.int16).max),
+            self._code(get(offer, "airline")),
+            self._code(get(offer, "passenger_mix")),
+            self._code(get(offer, "offer_source")),
+            return_depart_ts.toordinal() if return_depart_ts is not None else 0,
+            epoch_seconds(get(offer, "expire_at")),
+        )
+
+    def covers(self, day: date) -> bool:
+        """Whether queries for a departure date can be answered from the index"""
+        return self._loaded and (self.horizon is None or day <= self.horizon)
+
+    def add_offers(self, offers: Iterable[Any]) -> int:
+        """
+        Index stored offers: cached_offers rows as dicts or mappings, or objects with the
+        same attributes. Offers departing past the horizon are skipped. Returns how many
+        offers were new to the index.
+        """
+        added = 0
+        with self._lock:
+            if not self._loaded:
+                return 0
+            for offer in offers:
+                get = dict.get if isinstance(offer, dict) else getattr
+                day = get(offer, "depart_ts").date()
+                if self.horizon is not None and day > self.horizon:
+                    continue
+                key = (get(offer, "origin"), get(offer, "destination"), day)
+                group = self._groups.get(key)
+                if group is None:
+                    group = self._groups[key] = _RouteDay()
+                if group.upsert(get(offer, "offer_id"), self._values(offer, get)):
+                    added += 1
+            self._rows += added
+            if self._rows > self.max_rows:
+                self._shrink_horizon()
+        return added
+
+    def _shrink_horizon(self) -> None:
+        """Drop the farthest departure dates until max_rows holds"""
+        days = sorted({day for _, _, day in self._groups}, reverse=True)
+        for day in days:
+            if self._rows <= self.max_rows:
+                break
+            for key in [key for key in self._groups if key[2] == day]:
+                self._rows -= len(self._groups.pop(key))
+            self.horizon = day - timedelta(days=1)
+        logger.info(f"Inventory index holds departures up to {self.horizon} ({self._rows} offers)")
+
+    def prune(self, now: Optional[datetime] = None) -> int:
+        """Drop expired offers and past departure dates; returns how many offers were dropped"""
+        now = now or utc_now()
+        now_seconds = epoch_seconds(now)
+        # Departure dates are airport-local; a day of slack covers every time zone
+        oldest_day = now.date() - timedelta(days=1)
+        dropped = 0
+        with self._lock:
+            for key in list(self._groups):
+                group = self._groups[key]
+                if key[2] < oldest_day:
+                    dropped += len(self._groups.pop(key))
+                    # A day has passed; the dates past the horizon may fit now
+                    self._extend_needs = 0
+                    continue
+                group.merge()
+                dropped += group.keep(group.columns["expire_at"] > now_seconds)
+                if not len(group):
+                    del self._groups[key]
+            self._rows -= dropped
+        self.stats["rows_pruned_total"] += dropped
+        return dropped
+
+    def rebuild(self, db: Optional[Session] = None) -> int:
+        """
+        Load every live offer from cached_offers, nearest departures first, streaming
+        INVENTORY_INDEX_LOAD_BATCH rows at a time and packing each departure date into
+        arrays once it has been read. Stops at max_rows, keeping only whole departure
+        dates. Returns the number of offers indexed.
+        """
+        started = time.perf_counter()
+        self._rebuilding = True
+        own_session = db is None
+        db = db or self.session_factory()
+        now = utc_now()
+        groups: Dict[RouteDayKey, _RouteDay] = {}
+        rows = 0
+        horizon = None
+        watermark = None
+        last_day = None
+        day_groups: List[_RouteDay] = []
+        try:
+            query = (
+                db.query(*INDEXED_COLUMNS)
+                .filter(CachedOffer.expire_at > now)
+                .order_by(CachedOffer.depart_ts)
+                .yield_per(INVENTORY_INDEX_LOAD_BATCH)
+            )
+            for row in query:
+                day = row.depart_ts.date()
+                if rows >= self.max_rows:
+                    if day == last_day:
+                        # The last date is only partly loaded: leave all of it out
+                        for key in [key for key in groups if key[2] == day]:
+                            rows -= len(groups.pop(key))
+                        horizon = day - timedelta(days=1)
+                    else:
+                        horizon = last_day if last_day is not None else day - timedelta(days=1)
+                    break
+                if day != last_day:
+                    for group in day_groups:
+                        group.merge()
+                    day_groups = []
+                    last_day = day
+                key = (row.origin, row.destination, day)
+                group = groups.get(key)
+                if group is None:
+                    group = groups[key] = _RouteDay()
+                    day_groups.append(group)
+                with self._lock:
+                    values = self._values(row, getattr)
+                rows += group.upsert(row.offer_id, values)
+                if watermark is None or row.cached_at > watermark:
+                    watermark = row.cached_at
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            self._rebuilding = False
+            if own_session:
+                db.close()
+
+        for group in groups.values():
+            group.merge()
+        with self._lock:
+            self._groups = groups
+            self._rows = rows
+            self.horizon = horizon
+            self._extend_needs = 0
+            self._watermark = watermark or now
+            self._loaded = True
+            self._synced_at = time.monotonic()
+        self.stats["rebuilds"] += 1
+        self.stats["last_rebuild_rows"] = rows
+        self.stats["last_rebuild_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        logger.info(
+            f"Inventory index rebuilt: {rows} offers in {len(groups)} route-days "
+            f"in {self.stats['last_rebuild_ms']} ms" + (f", departures up to {horizon}" if horizon else "")
+        )
+        return rows
+
+    def sync(self, db: Session) -> int:
+        """Index offers cached since the last sync, then prune; rebuilds if never loaded"""
+        if not self._loaded:
+            return self.rebuild(db)
+        query = db.query(*INDEXED_COLUMNS).filter(
+            CachedOffer.expire_at > utc_now(),
+            CachedOffer.cached_at > self._watermark - SYNC_OVERLAP,
+        )
+        if self.horizon is not None:
+            after_horizon = datetime.combine(self.horizon + timedelta(days=1), datetime.min.time())
+            query = query.filter(CachedOffer.depart_ts < after_horizon)
+        rows = query.all()
+        self.add_offers(rows)
+        if rows:
+            self._watermark = max(self._watermark, max(row.cached_at for row in rows))
+        self.prune()
+        if self.horizon is not None and self._rows < self.max_rows * HORIZON_EXTEND_BELOW:
+            self._extend_horizon(db)
+        self._synced_at = time.monotonic()
+        self.stats["syncs"] += 1
+        self.stats["last_sync_rows"] = len(rows)
+        return len(rows)
+
+    def _extend_horizon(self, db: Session) -> int:
+        """
+        Load the whole departure dates past the horizon that fit under max_rows, nearest
+        first, and move the horizon past them. Returns how many offers were added.
+        """
+        room = self.max_rows - self._rows
+        if room < self._extend_needs:
+            return 0
+        after_horizon = datetime.combine(self.horizon + timedelta(days=1), datetime.min.time())
+        rows = (
+            db.query(*INDEXED_COLUMNS)
+            .filter(CachedOffer.expire_at > utc_now(), CachedOffer.depart_ts >= after_horizon)
+            .order_by(CachedOffer.depart_ts)
+            .limit(room + 1)
+            .all()
+        )
+        if len(rows) > room:
+            # The last date read is only partly loaded: leave all of it out
+            horizon = rows[-1].depart_ts.date() - timedelta(days=1)
+            rows = [row for row in rows if row.depart_ts.date() <= horizon]
+        else:
+            horizon = None
+        if not rows:
+            self._extend_needs = room + 1
+            return 0
+        with self._lock:
+            self.horizon = horizon
+            self._extend_needs = 0
+        added = self.add_offers(rows)
+        self.stats["horizon_extensions"] += 1
+        logger.info(
+            f"Inventory index extended by {added} offers, "
+            + (f"departures up to {self.horizon}" if self.horizon else "all departures")
+        )
+        return added
+
+    def refresh_route(self, db: Session, origin: str, destination: str, day: date) -> int:
+        """Re-read one route-day from cached_offers, e.g. after another worker searched it"""
+        if not self.covers(day):
+            return 0
+        day_start = datetime.combine(day, datetime.min.time())
+        rows = db.query(*INDEXED_COLUMNS).filter(
+            CachedOffer.origin == origin,
+            CachedOffer.destination == destination,
+            CachedOffer.depart_ts >= day_start,
+            CachedOffer.depart_ts < day_start + timedelta(days=1),
+            CachedOffer.expire_at > utc_now(),
+        ).all()
+        self.add_offers(rows)
+        return len(rows)
+
+    def ensure_synced(self, db: Session) -> bool:
+        """Sync if the last sync is older than sync_seconds; False if the index is unusable"""
+        if not INVENTORY_INDEX_ENABLED:
+            return False
+        if self._rebuilding:
+            # The startup rebuild is still reading; answer from the database meanwhile
+            return self._loaded
+        if self._synced_at is None or time.monotonic() - self._synced_at > self.sync_seconds:
+            try:
+                self.sync(db)
+            except Exception as e:
+                db.rollback()
+                logger.warning(f"Inventory index sync failed, answering from the offers already loaded: {str(e)}")
+                self._synced_at = time.monotonic()
+        return self._loaded
+
+    def route_view(
+        self,
+        origin: str,
+        destination: str,
+        day: date,
+        passenger_mix: str,
+        return_day: Optional[date] = None,
+        depart_window: Optional[Tuple[int, int]] = None,
+        min_price_minor: Optional[int] = None,
+        max_price_minor: Optional[int] = None,
+        airlines: Optional[Iterable[str]] = None,
+        max_stops: Optional[int] = None,
+        max_duration_minutes: Optional[int] = None,
+        now: Optional[datetime] = None,
+    ) -> Optional[RouteView]:
+        """
+        The unexpired offers of a route and departure date for a passenger mix, one-way
+        or returning on return_day, that pass the given filters; depart_window is
+        [start, end) in minutes of the day. None when the date is not covered.
+        """
+        if not self.covers(day):
+            return None
+        self.stats["queries"] += 1
+        with self._lock:
+            group = self._groups.get((origin, destination, day))
+            mix_code = self._codes.get(passenger_mix)
+            if group is None or mix_code is None:
+                return self._empty_view()
+            group.merge()
+            columns = group.columns
+            offer_ids = group.offer_ids
+            mask = (columns["mix_code"] == mix_code) & (columns["expire_at"] > epoch_seconds(now or utc_now()))
+            mask &= columns["return_day"] == (return_day.toordinal() if return_day else 0)
+            if depart_window is not None:
+                mask &= (columns["depart_minute"] >= depart_window[0]) & (columns["depart_minute"] < depart_window[1])
+            if min_price_minor is not None:
+                mask &= columns["price_minor"] >= min_price_minor
+            if max_price_minor is not None:
+                mask &= columns["price_minor"] <= max_price_minor
+            if airlines:
+                codes = [self._codes[code] for code in airlines if code in self._codes]
+                mask &= np.isin(columns["airline_code"], codes)
+            if max_stops is not None:
+                mask &= columns["stops"] <= max_stops
+            if max_duration_minutes is not None:
+                mask &= columns["duration"] <= max_duration_minutes
+            positions = np.flatnonzero(mask)
+            selected = {name: column[positions] for name, column in columns.items()}
+        selected["position"] = positions
+        return RouteView(selected, offer_ids, self._names)
+
+    def _empty_view(self) -> RouteView:
+        columns = {name: np.empty(0, dtype) for name, dtype in COLUMN_TYPES.items()}
+        columns["position"] = np.empty(0, dtype=np.intp)
+        return RouteView(columns, [], self._names)
+
+    def min_prices(
+        self,
+        origin: str,
+        destination: str,
+        days: Iterable[date],
+        passenger_mix: str,
+    ) -> Dict[date, Optional[int]]:
+        """Cheapest one-way price per departure date, for the covered dates among days"""
+        prices = {}
+        for day in days:
+            view = self.route_view(origin, destination, day, passenger_mix)
+            if view is not None:
+                prices[day] = view.min_price()
+        return prices
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            array_bytes = sum(
+                column.nbytes for group in self._groups.values() for column in group.columns.values()
+            )
+            return {
+                **self.stats,
+                "loaded": self._loaded,
+                "offers": self._rows,
+                "route_days": len(self._groups),
+                "horizon": self.horizon.isoformat() if self.horizon else None,
+                "array_bytes": array_bytes,
+                "synced_seconds_ago": round(time.monotonic() - self._synced_at, 1) if self._synced_at else None,
+            }
+
+    def start(self) -> Optional[asyncio.Task]:
+        """Rebuild from cached_offers in a worker thread, without delaying startup"""
+        if INVENTORY_INDEX_ENABLED and self._task is None:
+            self._task = asyncio.create_task(asyncio.to_thread(self.rebuild))
+        return self._task
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            try:
+                await self._task
+            except Exception as e:
+                logger.error(f"Inventory index rebuild failed: {str(e)}")
+            self._task = None
+
+
+inventory_index = InventoryIndex()
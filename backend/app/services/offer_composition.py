@@ -0,0 +1,77 @@
+"""
+Offer Composition
+Builds Amadeus-shaped offers out of several cached one-way offers (round-trip pairs and
+connecting itineraries), so they parse, are identified and are stored like upstream offers
+"""
+from typing import Any, Dict, List, Tuple
+from app.services.flight_offer import FlightOffer
+from app.utils.money import BASE_CURRENCY, from_minor
+
+# payload "source" of composed offers, and the cached_offers.offer_source they map to
+COMPOSED_SOURCES = {"PAIRED": "paired", "CONNECTION": "connection"}
+UPSTREAM_SOURCE = "upstream"
+
+
+def offer_source(payload: Dict[str, Any]) -> str:
+    return COMPOSED_SOURCES.get(payload.get("source", ""), UPSTREAM_SOURCE)
+
+
+def composed_price(legs: List[FlightOffer]) -> Tuple[str, float]:
+    """
+    Currency and total of a composed offer: in the legs' quoted currency when they all
+    agree, otherwise the sum of their normalized base-currency prices
+    """
+    currencies = {leg.source_currency for leg in legs}
+    if len(currencies) == 1:
+        currency = currencies.pop()
+        return currency, from_minor(sum(leg.source_price_minor for leg in legs), currency)
+    return BASE_CURRENCY, from_minor(sum(leg.price_minor for leg in legs), BASE_CURRENCY)
+
+
+def composed_traveler_pricings(legs: List[FlightOffer]) -> List[Dict[str, Any]]:
+    """The first leg's travelers, with every leg's fare details (legs share the passenger mix)"""
+    leg_travelers = [leg.payload.get("travelerPricings", []) for leg in legs]
+    return [
+        {
+            "travelerId": traveler.get("travelerId"),
+            "travelerType": traveler.get("travelerType", "ADULT"),
+            "fareDetailsBySegment": [
+                fare
+                for travelers in leg_travelers if index < len(travelers)
+                for fare in travelers[index].get("fareDetailsBySegment", [])
+            ],
+        }
+        for index, traveler in enumerate(leg_travelers[0])
+    ]
+
+
+def composed_payload(
+    legs: List[FlightOffer],
+    source: str,
+    itineraries: List[Dict[str, Any]],
+    one_way: bool,
+) -> Dict[str, Any]:
+    currency, total = composed_price(legs)
+    return {
+        "type": "flight-offer",
+        "source": source,
+        "oneWay": one_way,
+        "numberOfBookableSeats": min(leg.seats for leg in legs),
+        "itineraries": itineraries,
+        "price": {"currency": currency, "total": f"{total}", "grandTotal": f"{total}"},
+        "travelerPricings": composed_traveler_pricings(legs),
+        # The legs' full offers stay cached under these ids
+        "composedOfferIds": [leg.offer_id for leg in legs],
+    }
+
+
+def connection_payload(legs: List[FlightOffer], travel_minutes: int) -> Dict[str, Any]:
+    """One-way offer whose single itinerary chains the legs' segments, layovers included"""
+    segments = [segment for leg in legs for segment in leg.payload["itineraries"][0]["segments"]]
+    hours, minutes = divmod(travel_minutes, 60)
+    return composed_payload(
+        legs,
+        source="CONNECTION",
+        itineraries=[{"duration": f"PT{hours}H{minutes}M", "segments": segments}],
+        one_way=True,
+    )
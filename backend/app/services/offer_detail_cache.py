@@ -0,0 +1,112 @@
+"""
+Offer Detail Cache
+Bounded in-process LRU of serialized /api/flight/offer/{offer_id} responses. Seat
+changes are published with Postgres NOTIFY in the booking's transaction, and every
+worker drops the offer when it commits.
+"""
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, Any, Optional, Tuple, Iterable
+from app.models.cached_offer import utc_now
+from app.schemas.flight import OfferDetail, OfferSummary, OfferView
+from app.services.db_notifications import db_notifications
+
+OFFER_CACHE_MAX_ENTRIES = int(os.getenv("OFFER_CACHE_MAX_ENTRIES", "5000"))
+# Upper bound on staleness across workers while notifications are not being received
+OFFER_CACHE_MAX_TTL_SECONDS = int(os.getenv("OFFER_CACHE_MAX_TTL", "900"))
+
+OFFER_CHANGES_CHANNEL = "offer_changes"
+
+
+class OfferDetailCache:
+    """
+    LRU of offer responses serialized to JSON bytes, holding both the full and the
+    summary (payload-free) rendering. An entry lives until the offer's expire_at or
+    OFFER_CACHE_MAX_TTL, whichever comes first.
+    """
+
+    def __init__(self, max_entries: int = OFFER_CACHE_MAX_ENTRIES, max_ttl_seconds: int = OFFER_CACHE_MAX_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.max_ttl = timedelta(seconds=max_ttl_seconds)
+        self._entries: "OrderedDict[str, Tuple[datetime, Dict[OfferView, bytes]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, offer_id: str, view: OfferView = OfferView.full) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(offer_id)
+            if entry is None:
+                self.misses += 1
+                return None
+            valid_until, bodies = entry
+            if valid_until <= utc_now():
+                del self._entries[offer_id]
+                self.misses += 1
+                return None
+            body = bodies.get(view)
+            if body is None:
+                # Only the summary was cached, e.g. by a summary lookup
+                self.misses += 1
+                return None
+            self._entries.move_to_end(offer_id)
+            self.hits += 1
+            return body
+
+    def put(self, offer_id: str, bodies: Dict[OfferView, bytes], expire_at: Optional[datetime]) -> None:
+        valid_until = utc_now() + self.max_ttl
+        if expire_at is not None:
+            valid_until = min(valid_until, expire_at)
+        with self._lock:
+            self._entries[offer_id] = (valid_until, bodies)
+            self._entries.move_to_end(offer_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def put_offer(self, offer: OfferSummary, expire_at: Optional[datetime], view: OfferView = OfferView.full) -> bytes:
+        """
+        Serialize an offer once per rendering, cache it and return the requested rendering.
+        An OfferSummary (no payload loaded) only fills the summary rendering.
+        """
+        bodies = {OfferView.summary: offer.model_dump_json(exclude={"payload"}).encode()}
+        if isinstance(offer, OfferDetail):
+            bodies[OfferView.full] = offer.model_dump_json().encode()
+        self.put(offer.offer_id, bodies, expire_at)
+        return bodies.get(view, bodies[OfferView.summary])
+
+    def put_rows(self, rows: Iterable[Dict[str, Any]]) -> None:
+        """Cache freshly persisted cached_offers rows"""
+        for row in rows:
+            self.put_offer(OfferDetail.model_validate(row), row.get("expire_at"))
+
+    def invalidate(self, offer_id: str) -> None:
+        """Drop an offer, e.g. after its seat count changed"""
+        with self._lock:
+            if self._entries.pop(offer_id, None) is not None:
+                self.invalidations += 1
+
+    def clear(self) -> None:
+        """Drop everything, e.g. when seat changes may have been missed while not listening"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+offer_detail_cache = OfferDetailCache()
+db_notifications.subscribe(OFFER_CHANGES_CHANNEL, offer_detail_cache.invalidate, offer_detail_cache.clear)
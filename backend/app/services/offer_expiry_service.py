@@ -0,0 +1,286 @@
+"""
+Offer Expiry Service
+Background sweeper that deletes expired cached offers in small batches,
+plus maintenance of the optional departure-date partitions of cached_offers
+"""
+import os
+import time
+import asyncio
+from typing import Dict, Any, List, Optional, Callable
+from datetime import date, datetime, timedelta
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+from app.db import SessionLocal
+from app.models.cached_offer import utc_now
+from app.services.booking_idempotency import booking_idempotency
+from app.services.inventory_index import inventory_index
+from app.services.route_min_price_service import route_min_price_service
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+SWEEP_ENABLED = os.getenv("OFFER_SWEEP_ENABLED", "true").lower() == "true"
+SWEEP_INTERVAL_SECONDS = int(os.getenv("OFFER_SWEEP_INTERVAL", "300"))
+SWEEP_BATCH_SIZE = int(os.getenv("OFFER_SWEEP_BATCH_SIZE", "500"))
+SWEEP_MAX_BATCHES = int(os.getenv("OFFER_SWEEP_MAX_BATCHES", "200"))
+SWEEP_BATCH_PAUSE_SECONDS = float(os.getenv("OFFER_SWEEP_BATCH_PAUSE", "0.05"))
+PARTITION_DAYS_AHEAD = int(os.getenv("OFFER_PARTITION_DAYS_AHEAD", "30"))
+PARTITION_RETAIN_DAYS = int(os.getenv("OFFER_PARTITION_RETAIN_DAYS", "1"))
+PARTITION_LOCK_TIMEOUT = os.getenv("OFFER_PARTITION_LOCK_TIMEOUT", "2s")
+PARTITION_ADVISORY_LOCK_KEY = 734_021_901  # serializes partition DDL across workers
+
+PARTITION_PREFIX = "cached_offers_p"
+DEFAULT_PARTITION = "cached_offers_default"
+# Same payload storage as the unpartitioned table (see migration 004)
+PARTITION_STORAGE_OPTIONS = "WITH (toast_tuple_target = 256)"
+
+# Deletes one batch of expired offers. Offers referenced by a booking are skipped,
+# and rows locked by in-flight bookings (FK key-share locks) are skipped rather than
+# waited on, so the sweeper never blocks the booking path.
+_SWEEP_BATCH_SQL = text("""
+    DELETE FROM cached_offers
+    WHERE offer_id IN (
+        SELECT c.offer_id
+        FROM cached_offers c
+        WHERE c.expire_at < :now
+          AND NOT EXISTS (SELECT 1 FROM bookings b WHERE b.offer_id = c.offer_id)
+        ORDER BY c.expire_at
+        LIMIT :batch_size
+        FOR UPDATE SKIP LOCKED
+    )
+""")
+
+_TABLE_SIZE_SQL = text("""
+    WITH tree AS (
+        SELECT relid, isleaf, level FROM pg_partition_tree('cached_offers')
+    ), relations AS (
+        SELECT relid, isleaf, level FROM tree
+        UNION ALL
+        SELECT 'cached_offers'::regclass, true, 0 WHERE NOT EXISTS (SELECT 1 FROM tree)
+    )
+    SELECT COALESCE(SUM(pg_total_relation_size(r.relid)), 0) AS total_bytes,
+           COALESCE(SUM(CASE WHEN r.isleaf THEN GREATEST(c.reltuples, 0) ELSE 0 END), 0) AS estimated_rows,
+           COUNT(*) FILTER (WHERE r.isleaf AND r.level > 0) AS partitions
+    FROM relations r
+    JOIN pg_class c ON c.oid = r.relid
+""")
+
+_partitioned: Optional[bool] = None
+
+
+def is_partitioned(db: Session) -> bool:
+    """Whether cached_offers is a partitioned table, checked once per process"""
+    global _partitioned
+    if _partitioned is None:
+        _partitioned = bool(db.execute(text(
+            "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table p "
+            "JOIN pg_class c ON c.oid = p.partrelid WHERE c.relname = 'cached_offers')"
+        )).scalar())
+    return _partitioned
+
+
+def partition_name(day: date) -> str:
+    return f"{PARTITION_PREFIX}{day:%Y%m%d}"
+
+
+class OfferExpiryService:
+    """Deletes expired cached offers in the background and exposes sweep statistics"""
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session] = SessionLocal,
+        batch_size: int = SWEEP_BATCH_SIZE,
+        interval_seconds: int = SWEEP_INTERVAL_SECONDS,
+        max_batches: int = SWEEP_MAX_BATCHES,
+    ):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.interval_seconds = interval_seconds
+        self.max_batches = max_batches
+        self._task: Optional[asyncio.Task] = None
+        self.stats: Dict[str, Any] = {
+            "sweeps": 0,
+            "rows_swept_total": 0,
+            "last_sweep_rows": 0,
+            "last_sweep_duration_ms": None,
+            "last_sweep_at": None,
+            "partitions_created_total": 0,
+            "partitions_dropped_total": 0,
+            "last_error": None,
+        }
+
+    def sweep_once(self) -> int:
+        """Delete expired offers batch by batch, each batch in its own short transaction"""
+        started = time.perf_counter()
+        swept = 0
+        db = self.session_factory()
+        try:
+            for _ in range(self.max_batches):
+                deleted = db.execute(_SWEEP_BATCH_SQL, {"now": utc_now(), "batch_size": self.batch_size}).rowcount
+                db.commit()
+                swept += deleted
+                if deleted < self.batch_size:
+                    break
+                time.sleep(SWEEP_BATCH_PAUSE_SECONDS)
+
+            if is_partitioned(db):
+                self.maintain_partitions(db)
+            # Expired and departed offers leave this worker's inventory index and the
+            # exploration fares too
+            inventory_index.prune()
+            route_min_price_service.prune(db)
+            # Booking idempotency keys past their TTL go with the same sweep
+            booking_idempotency.prune(db)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+        duration_ms = round((time.perf_counter() - started) * 1000, 1)
+        self.stats["sweeps"] += 1
+        self.stats["rows_swept_total"] += swept
+        self.stats["last_sweep_rows"] = swept
+        self.stats["last_sweep_duration_ms"] = duration_ms
+        self.stats["last_sweep_at"] = utc_now().isoformat()
+        if swept:
+            logger.info(f"Offer sweep deleted {swept} expired offers in {duration_ms} ms")
+        return swept
+
+    def maintain_partitions(self, db: Session) -> None:
+        """Create upcoming and drop departed partitions, giving up this round on lock contention"""
+        try:
+            self.ensure_partitions(db)
+            self.drop_departed_partitions(db)
+        except OperationalError as e:
+            db.rollback()
+            logger.warning(f"Partition maintenance skipped, cached_offers is busy: {str(e.orig).strip()}")
+
+    def _begin_ddl(self, db: Session) -> bool:
+        """
+        Start a partition DDL transaction. Only one worker may hold it at a time, and
+        DDL waits at most PARTITION_LOCK_TIMEOUT for table locks so queries queued
+        behind it are not stalled.
+        """
+        acquired = db.execute(
+            text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": PARTITION_ADVISORY_LOCK_KEY}
+        ).scalar()
+        if not acquired:
+            db.rollback()
+            return False
+        db.execute(text(f"SET LOCAL lock_timeout = '{PARTITION_LOCK_TIMEOUT}'"))
+        return True
+
+    def list_partitions(self, db: Session) -> List[date]:
+        """Departure days that currently have their own partition"""
+        rows = db.execute(text(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = 'cached_offers' AND c.relname LIKE :prefix"
+        ), {"prefix": f"{PARTITION_PREFIX}%"}).scalars().all()
+        return sorted(datetime.strptime(name[len(PARTITION_PREFIX):], "%Y%m%d").date() for name in rows)
+
+    def ensure_partitions(self, db: Session, days_ahead: int = PARTITION_DAYS_AHEAD) -> int:
+        """
+        Create daily partitions from today up to days_ahead. Rows that landed in the
+        default partition for a new day are moved into it before it is attached.
+        """
+        existing = set(self.list_partitions(db))
+        today = utc_now().date()
+        created = 0
+        for offset in range(days_ahead + 1):
+            day = today + timedelta(days=offset)
+            if day in existing:
+                continue
+            if not self._begin_ddl(db):
+                break
+            name = partition_name(day)
+            bounds = {
+                "start": datetime.combine(day, datetime.min.time()),
+                "end": datetime.combine(day + timedelta(days=1), datetime.min.time()),
+            }
+            db.execute(text(
+                f"CREATE TABLE {name} (LIKE cached_offers INCLUDING DEFAULTS INCLUDING COMPRESSION) "
+                f"{PARTITION_STORAGE_OPTIONS}"
+            ))
+            db.execute(text(
+                f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} "
+                f"WHERE depart_ts >= :start AND depart_ts < :end RETURNING *) "
+                f"INSERT INTO {name} SELECT * FROM moved"
+            ), bounds)
+            db.execute(text(
+                f"ALTER TABLE cached_offers ATTACH PARTITION {name} "
+                f"FOR VALUES FROM ('{bounds['start']:%Y-%m-%d}') TO ('{bounds['end']:%Y-%m-%d}')"
+            ))
+            db.commit()
+            created += 1
+            self.stats["partitions_created_total"] += 1
+        if created:
+            logger.info(f"Created {created} cached_offers partition(s)")
+        return created
+
+    def drop_departed_partitions(self, db: Session, retain_days: int = PARTITION_RETAIN_DAYS) -> int:
+        """
+        Drop partitions whose departure day is more than retain_days in the past.
+        Offers referenced by a booking are re-inserted first; with their range gone
+        they land in the default partition.
+        """
+        cutoff = utc_now().date() - timedelta(days=retain_days)
+        dropped = 0
+        for day in self.list_partitions(db):
+            if day >= cutoff:
+                continue
+            if not self._begin_ddl(db):
+                break
+            name = partition_name(day)
+            db.execute(text(f"ALTER TABLE cached_offers DETACH PARTITION {name}"))
+            kept = db.execute(text(
+                f"INSERT INTO cached_offers SELECT * FROM {name} p "
+                f"WHERE EXISTS (SELECT 1 FROM bookings b WHERE b.offer_id = p.offer_id)"
+            )).rowcount
+            db.execute(text(f"DROP TABLE {name}"))
+            db.commit()
+            dropped += 1
+            self.stats["partitions_dropped_total"] += 1
+            logger.info(f"Dropped partition {name} (kept {kept} booked offers)")
+        return dropped
+
+    def table_stats(self, db: Session) -> Dict[str, Any]:
+        """Current size of cached_offers across all of its partitions"""
+        row = db.execute(_TABLE_SIZE_SQL).mappings().one()
+        return {
+            "total_bytes": int(row["total_bytes"]),
+            "estimated_rows": int(row["estimated_rows"]),
+            "partitioned": is_partitioned(db),
+            "partitions": int(row["partitions"]),
+        }
+
+    async def run_forever(self) -> None:
+        """Sweep on an interval; the blocking DB work runs in a worker thread"""
+        while True:
+            try:
+                await asyncio.to_thread(self.sweep_once)
+                self.stats["last_error"] = None
+            except Exception as e:
+                self.stats["last_error"] = str(e)
+                logger.error(f"Offer sweep failed: {str(e)}", exc_info=True)
+            await asyncio.sleep(self.interval_seconds)
+
+    def start(self) -> Optional[asyncio.Task]:
+        if SWEEP_ENABLED and self._task is None:
+            self._task = asyncio.create_task(self.run_forever())
+        return self._task
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+offer_expiry_service = OfferExpiryService()
@@ -0,0 +1,209 @@
+"""
+Offer Ranking
+Scores offer sets under named profiles over columnar NumPy arrays of price, duration,
+departure time, stops and airline, and returns the top k without sorting the whole set
+"""
+import os
+import json
+from dataclasses import dataclass, fields, replace
+from functools import cached_property
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+import numpy as np
+from app.services.round_trip_pairing import ROUND_TRIP_HOUR_VALUE, ROUND_TRIP_STOP_PENALTY
+from app.utils.logger import get_logger
+from app.utils.money import to_minor
+
+logger = get_logger(__name__)
+
+# Most offers one ranked query scores; cached offers beyond it are dropped cheapest-first
+RANKING_MAX_CANDIDATES = int(os.getenv("RANKING_MAX_CANDIDATES", "5000"))
+# What a preferred airline is worth, in base currency, when a request names airlines to prefer
+RANKING_PREFERRED_AIRLINE_BONUS = float(os.getenv("RANKING_PREFERRED_AIRLINE_BONUS", "1000"))
+# Extra or overriding profiles as JSON, e.g. {"red_eye": {"departure_window": [22, 6], "off_window_penalty": 500}}
+RANKING_PROFILES = os.getenv("RANKING_PROFILES", "")
+
+
+@dataclass(frozen=True)
+class ScoringProfile:
+    """
+    Weights of one ranking; an offer's score is in base currency, lower is better:
+    price_weight * price + hour_value per hour of travel + stop_penalty per stop
+    + off_window_penalty per hour the departure is outside departure_window
+    - preferred_airline_bonus for an offer on one of preferred_airlines.
+    departure_window is [start, end) in hours and wraps past midnight when start > end.
+    Ties go to the cheaper offer, then to the lower offer ID.
+    """
+    name: str
+    price_weight: float = 1.0
+    hour_value: float = 0.0
+    stop_penalty: float = 0.0
+    departure_window: Tuple[float, float] = (0, 24)
+    off_window_penalty: float = 0.0
+    preferred_airlines: Tuple[str, ...] = ()
+    preferred_airline_bonus: float = RANKING_PREFERRED_AIRLINE_BONUS
+
+
+DEFAULT_PROFILES = [
+    ScoringProfile(name="cheapest"),
+    ScoringProfile(name="fastest", price_weight=0.0, hour_value=1.0),
+    # The same trade-off as the "best" round-trip pairs
+    ScoringProfile(name="best", hour_value=ROUND_TRIP_HOUR_VALUE, stop_penalty=ROUND_TRIP_STOP_PENALTY),
+    ScoringProfile(
+        name="convenient",
+        hour_value=ROUND_TRIP_HOUR_VALUE,
+        stop_penalty=2 * ROUND_TRIP_STOP_PENALTY,
+        departure_window=(7, 21),
+        off_window_penalty=ROUND_TRIP_HOUR_VALUE,
+    ),
+]
+
+
+def load_profiles(overrides: str = RANKING_PROFILES) -> Dict[str, ScoringProfile]:
+    """The default profiles, updated and extended by a JSON object of profile name -> weights"""
+    profiles = {profile.name: profile for profile in DEFAULT_PROFILES}
+    if not overrides:
+        return profiles
+    try:
+        configured = json.loads(overrides)
+        weights = {field.name for field in fields(ScoringProfile)} - {"name"}
+        for name, values in configured.items():
+            unknown = set(values) - weights
+            if unknown:
+                raise ValueError(f"unknown weights {', '.join(sorted(unknown))} in profile {name}")
+            values = dict(values)
+            for key in ("departure_window", "preferred_airlines"):
+                if key in values:
+                    values[key] = tuple(values[key])
+            base = profiles.get(name, ScoringProfile(name=name))
+            profiles[name] = replace(base, **values)
+    except (ValueError, TypeError, AttributeError) as e:
+        logger.error(f"Ignoring RANKING_PROFILES: {str(e)}")
+        return {profile.name: profile for profile in DEFAULT_PROFILES}
+    return profiles
+
+
+class OfferColumns:
+    """
+    The ranked attributes of a list of offers as arrays, one entry per offer.
+    Offers are anything with offer_id, price_minor, duration_minutes, stops, depart_ts
+    and airline attributes: FlightOffer, CachedOffer or a query row of those columns.
+    Airlines are only read when a profile prefers some, and offer IDs only for the
+    candidates of a top k.
+    """
+
+    def __init__(self, offers: Sequence[Any]):
+        self.offers = offers
+        count = len(offers)
+        self.price = np.fromiter((offer.price_minor for offer in offers), dtype=np.int64, count=count)
+        self.duration = np.fromiter((offer.duration_minutes or 0 for offer in offers), dtype=np.int64, count=count)
+        self.stops = np.fromiter((offer.stops or 0 for offer in offers), dtype=np.int64, count=count)
+        self.depart_minute = np.fromiter(
+            (offer.depart_ts.hour * 60 + offer.depart_ts.minute for offer in offers), dtype=np.int64, count=count
+        )
+
+    @cached_property
+    def airline(self) -> np.ndarray:
+        return np.array([offer.airline for offer in self.offers], dtype=str)
+
+    def offer_ids(self, indices: np.ndarray) -> np.ndarray:
+        return np.array([self.offers[index].offer_id for index in indices], dtype=str)
+
+    def __len__(self) -> int:
+        return len(self.offers)
+
+
+def hours_outside_window(depart_minute: np.ndarray, window: Tuple[float, float]) -> np.ndarray:
+    """Hours each departure is before or after a [start, end) daily window, 0 inside it"""
+    start, end = window
+    width = (end - start) % 24
+    if width == 0:
+        # (0, 24) and the like: the whole day
+        return np.zeros(len(depart_minute))
+    hour = depart_minute / 60.0
+    inside = (hour - start) % 24 < width
+    return np.where(inside, 0.0, np.minimum((start - hour) % 24, (hour - end) % 24))
+
+
+class OfferRanker:
+    """Named scoring profiles and the batched scoring and top-k selection over them"""
+
+    def __init__(self, profiles: Optional[Dict[str, ScoringProfile]] = None):
+        self.profiles = profiles if profiles is not None else load_profiles()
+
+    def profile(self, name: str) -> ScoringProfile:
+        """Raises ValueError for an unknown profile name"""
+        profile = self.profiles.get((name or "").lower())
+        if profile is None:
+            raise ValueError(f"Unknown ranking profile {name}; use one of: {', '.join(sorted(self.profiles))}")
+        return profile
+
+    def scores(
+        self,
+        columns: Any,
+        profile: ScoringProfile,
+        preferred_airlines: Optional[Iterable[str]] = None,
+    ) -> np.ndarray:
+        """
+        Score of every offer under a profile, in base-currency minor units. Weights are
+        applied as floats, so narrow integer columns are widened rather than overflowed.
+        """
+        scores = profile.price_weight * columns.price.astype(np.float64)
+        if profile.hour_value:
+            scores += to_minor(profile.hour_value) / 60.0 * columns.duration
+        if profile.stop_penalty:
+            scores += float(to_minor(profile.stop_penalty)) * columns.stops
+        if profile.off_window_penalty:
+            scores += float(to_minor(profile.off_window_penalty)) * hours_outside_window(
+                columns.depart_minute, profile.departure_window
+            )
+        airlines = {code.upper() for code in (preferred_airlines or ())} | set(profile.preferred_airlines)
+        if airlines and profile.preferred_airline_bonus:
+            preferred = np.isin(columns.airline, sorted(airlines))
+            scores -= float(to_minor(profile.preferred_airline_bonus)) * preferred
+        return scores
+
+    def top_k(self, columns: Any, scores: np.ndarray, k: int) -> np.ndarray:
+        """
+        Indices of the k best offers, best first. A partition finds the k-th score in
+        linear time; only offers scoring at most that are sorted, by score, price and
+        offer ID, so the result is the same as a full sort's first k.
+        """
+        if k <= 0 or not len(columns):
+            return np.empty(0, dtype=np.intp)
+        if k < len(columns):
+            kth_score = np.partition(scores, k - 1)[k - 1]
+            candidates = np.flatnonzero(scores <= kth_score)
+        else:
+            candidates = np.arange(len(columns))
+        order = np.lexsort((columns.offer_ids(candidates), columns.price[candidates], scores[candidates]))
+        return candidates[order[:k]]
+
+    def rank(
+        self,
+        offers: Sequence[Any],
+        profile_name: str,
+        k: int,
+        preferred_airlines: Optional[Iterable[str]] = None,
+    ) -> List[Any]:
+        """The k best offers under a named profile, best first"""
+        self.profile(profile_name)
+        if not offers:
+            return []
+        return [offers[index] for index in self.rank_columns(OfferColumns(offers), profile_name, k, preferred_airlines)]
+
+    def rank_columns(
+        self,
+        columns: Any,
+        profile_name: str,
+        k: int,
+        preferred_airlines: Optional[Iterable[str]] = None,
+    ) -> np.ndarray:
+        """
+        Positions of the k best offers in columns (OfferColumns, or anything with the
+        same arrays, such as an inventory index view) under a named profile, best first
+        """
+        profile = self.profile(profile_name)
+        return self.top_k(columns, self.scores(columns, profile, preferred_airlines), k)
+
+
+offer_ranker = OfferRanker()
@@ -0,0 +1,93 @@
+"""
+Round Trip Pairing
+Combines separately searched outbound and inbound one-way offers into round trips,
+taking the k best pairs from a heap walk over the two sorted leg lists
+"""
+import os
+import heapq
+from datetime import timedelta
+from typing import Any, Callable, Dict, List, Set, Tuple
+from app.services.flight_offer import FlightOffer
+from app.services.offer_composition import composed_payload
+from app.utils.money import to_minor
+
+# Shortest time at the destination between the outbound arrival and the inbound departure
+ROUND_TRIP_MIN_STAY_MINUTES = int(os.getenv("ROUND_TRIP_MIN_STAY_MINUTES", "120"))
+# "Best" ranking: what an hour of travel time and each stop are worth, in base currency
+ROUND_TRIP_HOUR_VALUE = float(os.getenv("ROUND_TRIP_HOUR_VALUE", "600"))
+ROUND_TRIP_STOP_PENALTY = float(os.getenv("ROUND_TRIP_STOP_PENALTY", "1500"))
+# Candidate pairs looked at per pair returned, bounding the walk when most pairs are invalid
+MAX_CANDIDATES_PER_PAIR = 50
+
+_HOUR_VALUE_MINOR = to_minor(ROUND_TRIP_HOUR_VALUE)
+_STOP_PENALTY_MINOR = to_minor(ROUND_TRIP_STOP_PENALTY)
+
+
+def cheapest_cost(offer: FlightOffer) -> int:
+    return offer.price_minor
+
+
+def best_cost(offer: FlightOffer) -> int:
+    """Price plus the value of the time spent travelling and changing planes"""
+    return offer.price_minor + _HOUR_VALUE_MINOR * offer.duration_minutes // 60 + _STOP_PENALTY_MINOR * offer.stops
+
+
+def legs_compatible(outbound: FlightOffer, inbound: FlightOffer) -> bool:
+    """
+    The inbound leg must start where the outbound leg ended and return to its origin, for
+    the same passengers, leaving at least ROUND_TRIP_MIN_STAY_MINUTES after arrival
+    (both times are local to the destination airport)
+    """
+    return (
+        inbound.origin == outbound.destination
+        and inbound.destination == outbound.origin
+        and inbound.passenger_mix == outbound.passenger_mix
+        and inbound.depart_ts >= outbound.arrive_ts + timedelta(minutes=ROUND_TRIP_MIN_STAY_MINUTES)
+    )
+
+
+def top_k_pairs(
+    outbound: List[FlightOffer],
+    inbound: List[FlightOffer],
+    k: int,
+    cost: Callable[[FlightOffer], int],
+    compatible: Callable[[FlightOffer, FlightOffer], bool] = legs_compatible,
+) -> List[Tuple[FlightOffer, FlightOffer]]:
+    """
+    The k compatible (outbound, inbound) pairs with the lowest cost(outbound) + cost(inbound),
+    cheapest first. Both lists are sorted by cost and pairs are popped from a min-heap
+    that starts at (0, 0) and only pushes the two neighbours of each popped pair, so the
+    walk touches O(k) candidates instead of the full cross product. Incompatible pairs
+    are skipped; the walk gives up after MAX_CANDIDATES_PER_PAIR * k candidates.
+    """
+    if not outbound or not inbound or k <= 0:
+        return []
+    outbound = sorted(outbound, key=cost)
+    inbound = sorted(inbound, key=cost)
+    outbound_costs = [cost(offer) for offer in outbound]
+    inbound_costs = [cost(offer) for offer in inbound]
+
+    heap = [(outbound_costs[0] + inbound_costs[0], 0, 0)]
+    queued: Set[Tuple[int, int]] = {(0, 0)}
+    pairs: List[Tuple[FlightOffer, FlightOffer]] = []
+    budget = MAX_CANDIDATES_PER_PAIR * k
+    while heap and len(pairs) < k and budget > 0:
+        _, i, j = heapq.heappop(heap)
+        budget -= 1
+        if compatible(outbound[i], inbound[j]):
+            pairs.append((outbound[i], inbound[j]))
+        for next_i, next_j in ((i + 1, j), (i, j + 1)):
+            if next_i < len(outbound) and next_j < len(inbound) and (next_i, next_j) not in queued:
+                queued.add((next_i, next_j))
+                heapq.heappush(heap, (outbound_costs[next_i] + inbound_costs[next_j], next_i, next_j))
+    return pairs
+
+
+def pair_payload(outbound: FlightOffer, inbound: FlightOffer) -> Dict[str, Any]:
+    """Amadeus-shaped round-trip offer with the outbound and inbound legs as its two itineraries"""
+    return composed_payload(
+        [outbound, inbound],
+        source="PAIRED",
+        itineraries=[outbound.payload["itineraries"][0], inbound.payload["itineraries"][0]],
+        one_way=False,
+    )
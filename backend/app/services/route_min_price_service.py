@@ -0,0 +1,186 @@
+"""
+Route Min Price Service
+Keeps route_min_prices, the cheapest cached one-way fare per route, passenger mix and
+departure day, up to date as searches and the cache warm-up store offers, and answers
+exploration ("where can I fly from X under budget") and fare-calendar queries from it
+"""
+import os
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import delete, extract, or_, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+from app.data.airports import get_city_by_code
+from app.models.cached_offer import utc_now
+from app.models.route_min_price import RouteMinPrice
+from app.utils.logger import get_logger
+from app.utils.money import from_minor
+
+logger = get_logger(__name__)
+
+# Departure range searched when a query gives no end date
+EXPLORE_DEFAULT_DAYS = int(os.getenv("EXPLORE_DEFAULT_DAYS", "30"))
+# Widest departure range one exploration or calendar query may span
+EXPLORE_MAX_DAYS = int(os.getenv("EXPLORE_MAX_DAYS", "90"))
+# ISO weekdays a "weekend trip" may depart on: Friday and Saturday
+WEEKEND_DEPART_DAYS = (5, 6)
+
+_RouteDayKey = Tuple[str, str, str, date]
+
+
+class RouteMinPriceService:
+    """
+    Maintains one row per (origin, destination, passenger mix, departure day) holding
+    the cheapest one-way offer cached for it. A stored fare is replaced by a cheaper
+    one, by any fare once its offer has expired, and by the batch's cheapest fare when
+    the batch re-quotes the stored offer itself, so a fare that went up does not linger
+    until expiry. Round trips are left out: their price covers two departure days.
+    """
+
+    def __init__(self):
+        self.stats: Dict[str, Any] = {
+            "fares_recorded": 0,
+            "rows_pruned_total": 0,
+        }
+
+    def record(self, db: Session, offers: Iterable[Dict[str, Any]]) -> int:
+        """
+        Fold stored cached_offers rows into the table, in the caller's transaction.
+        Returns the number of route days offered a fare.
+        """
+        cheapest: Dict[_RouteDayKey, Dict[str, Any]] = {}
+        offer_ids: List[str] = []
+        for offer in offers:
+            if offer["return_depart_ts"] is not None:
+                continue
+            offer_ids.append(offer["offer_id"])
+            key = (offer["origin"], offer["destination"], offer["passenger_mix"], offer["depart_ts"].date())
+            best = cheapest.get(key)
+            if best is None or (offer["price_minor"], offer["offer_id"]) < (best["price_minor"], best["offer_id"]):
+                cheapest[key] = offer
+        if not cheapest:
+            return 0
+
+        now = utc_now()
+        # Sorted by key so concurrent upserts lock rows in the same order
+        rows = [
+            {
+                "origin": origin,
+                "destination": destination,
+                "passenger_mix": mix,
+                "depart_date": day,
+                "price_minor": offer["price_minor"],
+                "currency": offer["currency"],
+                "offer_id": offer["offer_id"],
+                "airline": offer["airline"],
+                "expire_at": offer["expire_at"],
+                "updated_at": now,
+            }
+            for (origin, destination, mix, day), offer in sorted(cheapest.items())
+        ]
+        table = RouteMinPrice.__table__
+        stmt = pg_insert(table).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.origin, table.c.destination, table.c.passenger_mix, table.c.depart_date],
+            set_={
+                column: stmt.excluded[column]
+                for column in ("price_minor", "currency", "offer_id", "airline", "expire_at", "updated_at")
+            },
+            where=or_(
+                table.c.price_minor > stmt.excluded.price_minor,
+                table.c.expire_at <= stmt.excluded.updated_at,
+                table.c.offer_id.in_(offer_ids),
+            ),
+        )
+        db.execute(stmt)
+        self.stats["fares_recorded"] += len(rows)
+        return len(rows)
+
+    def explore(
+        self,
+        db: Session,
+        origin: str,
+        passenger_mix: str,
+        date_from: date,
+        date_to: date,
+        max_price_minor: Optional[int] = None,
+        weekends_only: bool = False,
+        limit: int = 20,
+    ) -> List[Dict[str, Any]]:
+        """
+        The cheapest known fare to each destination from an origin departing between
+        date_from and date_to, cheapest destination first. One index range scan of the
+        origin's days; DISTINCT ON keeps each destination's cheapest day.
+        """
+        conditions = [
+            RouteMinPrice.origin == origin,
+            RouteMinPrice.passenger_mix == passenger_mix,
+            RouteMinPrice.depart_date.between(date_from, date_to),
+            RouteMinPrice.expire_at > utc_now(),
+        ]
+        if max_price_minor is not None:
+            conditions.append(RouteMinPrice.price_minor <= max_price_minor)
+        if weekends_only:
+            conditions.append(extract("isodow", RouteMinPrice.depart_date).in_(WEEKEND_DEPART_DAYS))
+        cheapest = (
+            select(RouteMinPrice)
+            .where(*conditions)
+            .distinct(RouteMinPrice.destination)
+            .order_by(RouteMinPrice.destination, RouteMinPrice.price_minor, RouteMinPrice.depart_date)
+            .subquery()
+        )
+        stmt = select(cheapest).order_by(cheapest.c.price_minor, cheapest.c.destination).limit(limit)
+        return [
+            {**self._fare(row), "destination": row["destination"], "city": get_city_by_code(row["destination"])}
+            for row in db.execute(stmt).mappings()
+        ]
+
+    def calendar(
+        self,
+        db: Session,
+        origin: str,
+        destination: str,
+        passenger_mix: str,
+        date_from: date,
+        date_to: date,
+    ) -> List[Dict[str, Any]]:
+        """Cheapest known fare per departure day of one route, by day; days with none are absent"""
+        stmt = (
+            select(RouteMinPrice)
+            .where(
+                RouteMinPrice.origin == origin,
+                RouteMinPrice.destination == destination,
+                RouteMinPrice.passenger_mix == passenger_mix,
+                RouteMinPrice.depart_date.between(date_from, date_to),
+                RouteMinPrice.expire_at > utc_now(),
+            )
+            .order_by(RouteMinPrice.depart_date)
+        )
+        return [self._fare(row) for row in db.execute(stmt).scalars()]
+
+    def prune(self, db: Session, now: Optional[datetime] = None) -> int:
+        """Delete fares whose offer has expired or whose day has passed, and commit"""
+        now = now or utc_now()
+        pruned = db.execute(
+            delete(RouteMinPrice).where(
+                or_(RouteMinPrice.expire_at <= now, RouteMinPrice.depart_date < now.date())
+            )
+        ).rowcount
+        db.commit()
+        self.stats["rows_pruned_total"] += pruned
+        return pruned
+
+    @staticmethod
+    def _fare(row: Any) -> Dict[str, Any]:
+        get = row.get if hasattr(row, "get") else lambda column: getattr(row, column)
+        return {
+            "depart_date": get("depart_date"),
+            "price": from_minor(get("price_minor"), get("currency")),
+            "price_minor": get("price_minor"),
+            "currency": get("currency"),
+            "airline": get("airline"),
+            "offer_id": get("offer_id"),
+        }
+
+
+route_min_price_service = RouteMinPriceService()
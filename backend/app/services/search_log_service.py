@@ -0,0 +1,184 @@
+"""
+Search Log Service
+Buffers flight search records in memory and appends them to search_log in batches,
+and answers the popularity and hit-rate questions the cache warm-up relies on
+"""
+import os
+import time
+import asyncio
+from datetime import date, timedelta
+from typing import Dict, Any, List, Optional, Callable
+from sqlalchemy import insert, text
+from sqlalchemy.orm import Session
+from app.db import SessionLocal
+from app.models.cached_offer import utc_now
+from app.models.search_log import SearchLog
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+SEARCH_LOG_ENABLED = os.getenv("SEARCH_LOG_ENABLED", "true").lower() == "true"
+SEARCH_LOG_BATCH_SIZE = int(os.getenv("SEARCH_LOG_BATCH_SIZE", "200"))
+SEARCH_LOG_FLUSH_INTERVAL = float(os.getenv("SEARCH_LOG_FLUSH_INTERVAL", "5"))
+SEARCH_LOG_MAX_BUFFER = int(os.getenv("SEARCH_LOG_MAX_BUFFER", "10000"))
+SEARCH_LOG_RETENTION_DAYS = int(os.getenv("SEARCH_LOG_RETENTION_DAYS", "30"))
+PRUNE_INTERVAL_SECONDS = 3600
+
+_TOP_ROUTES_SQL = text("""
+    SELECT origin, destination, passenger_mix, COUNT(*) AS searches
+    FROM search_log
+    WHERE created_at >= :since
+    GROUP BY origin, destination, passenger_mix
+    ORDER BY searches DESC, origin, destination
+    LIMIT :limit
+""")
+
+_SOURCE_COUNTS_SQL = text("""
+    SELECT source, COUNT(*) AS searches, AVG(latency_ms) AS avg_latency_ms
+    FROM search_log
+    WHERE created_at >= :since
+    GROUP BY source
+""")
+
+_PRUNE_SQL = text("""
+    DELETE FROM search_log
+    WHERE id IN (SELECT id FROM search_log WHERE created_at < :cutoff LIMIT 5000)
+""")
+
+
+class SearchLogService:
+    """
+    Append-only search log. record() only touches an in-memory buffer; a background
+    task writes the buffer with one multi-row INSERT every SEARCH_LOG_FLUSH_INTERVAL
+    seconds or as soon as SEARCH_LOG_BATCH_SIZE records are waiting. When the database
+    falls behind the oldest buffered records are dropped, never the search itself.
+    """
+
+    def __init__(self, session_factory: Callable[[], Session] = SessionLocal):
+        self.session_factory = session_factory
+        self._buffer: List[Dict[str, Any]] = []
+        self._flush_requested = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._pruned_at = 0.0
+        self.stats: Dict[str, Any] = {
+            "recorded": 0,
+            "written": 0,
+            "dropped": 0,
+            "flushes": 0,
+            "last_error": None,
+        }
+
+    def record(
+        self,
+        origin: str,
+        destination: str,
+        departure_date: str,
+        passenger_mix: str,
+        source: str,
+        offer_count: int,
+        latency_ms: float,
+    ) -> None:
+        if not SEARCH_LOG_ENABLED:
+            return
+        self._buffer.append({
+            "created_at": utc_now(),
+            "origin": origin.upper(),
+            "destination": destination.upper(),
+            "departure_date": date.fromisoformat(departure_date),
+            "passenger_mix": passenger_mix,
+            "source": source,
+            "offer_count": offer_count,
+            "latency_ms": int(round(latency_ms)),
+        })
+        self.stats["recorded"] += 1
+        if len(self._buffer) > SEARCH_LOG_MAX_BUFFER:
+            overflow = len(self._buffer) - SEARCH_LOG_MAX_BUFFER
+            del self._buffer[:overflow]
+            self.stats["dropped"] += overflow
+        if len(self._buffer) >= SEARCH_LOG_BATCH_SIZE:
+            self._flush_requested.set()
+
+    def _write(self, rows: List[Dict[str, Any]]) -> None:
+        db = self.session_factory()
+        try:
+            db.execute(insert(SearchLog), rows)
+            if time.monotonic() - self._pruned_at > PRUNE_INTERVAL_SECONDS:
+                db.execute(_PRUNE_SQL, {"cutoff": utc_now() - timedelta(days=SEARCH_LOG_RETENTION_DAYS)})
+                self._pruned_at = time.monotonic()
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    async def flush(self) -> int:
+        """Write everything buffered so far; on failure the records go back to the buffer"""
+        if not self._buffer:
+            return 0
+        rows, self._buffer = self._buffer, []
+        try:
+            await asyncio.to_thread(self._write, rows)
+        except Exception:
+            self._buffer[:0] = rows
+            raise
+        self.stats["written"] += len(rows)
+        self.stats["flushes"] += 1
+        return len(rows)
+
+    async def run_forever(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_requested.wait(), timeout=SEARCH_LOG_FLUSH_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_requested.clear()
+            try:
+                await self.flush()
+                self.stats["last_error"] = None
+            except Exception as e:
+                self.stats["last_error"] = str(e)
+                logger.error(f"Search log flush failed: {str(e)}")
+
+    def start(self) -> Optional[asyncio.Task]:
+        if SEARCH_LOG_ENABLED and self._task is None:
+            self._flush_requested = asyncio.Event()
+            self._task = asyncio.create_task(self.run_forever())
+        return self._task
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error(f"Search log final flush failed, {len(self._buffer)} records lost: {str(e)}")
+
+    def top_routes(self, db: Session, days: int, limit: int) -> List[Dict[str, Any]]:
+        """Most searched (origin, destination, passenger mix) over the last days"""
+        rows = db.execute(_TOP_ROUTES_SQL, {"since": utc_now() - timedelta(days=days), "limit": limit}).mappings()
+        return [dict(row) for row in rows]
+
+    def source_breakdown(self, db: Session, hours: int = 24) -> Dict[str, Any]:
+        """Searches per source over the last hours, and the share served without an upstream call"""
+        rows = db.execute(_SOURCE_COUNTS_SQL, {"since": utc_now() - timedelta(hours=hours)}).mappings().all()
+        sources = {
+            row["source"]: {"searches": row["searches"], "avg_latency_ms": round(float(row["avg_latency_ms"]), 1)}
+            for row in rows
+        }
+        total = sum(source["searches"] for source in sources.values())
+        cached = total - sources.get("upstream", {}).get("searches", 0)
+        return {
+            "window_hours": hours,
+            "searches": total,
+            "hit_rate": round(cached / total, 4) if total else None,
+            "sources": sources,
+        }
+
+
+search_log_service = SearchLogService()
@@ -0,0 +1,139 @@
+"""
+Seat Inventory
+Takes seats off cached offers when they are booked and puts them back on cancellation,
+with conditional UPDATEs that run in the booking's own transaction, which also tells
+every worker to drop the offers changed from its offer detail cache once it commits
+"""
+from collections import Counter
+from typing import Dict, Iterable, List, Optional
+from sqlalchemy import bindparam, text
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.orm import Session
+from sqlalchemy.types import Integer, String
+from app.models.cached_offer import CachedOffer
+from app.services.offer_composition import UPSTREAM_SOURCE
+from app.services.db_notifications import db_notifications
+from app.services.offer_detail_cache import OFFER_CHANGES_CHANNEL, offer_detail_cache
+
+# Locks every offer involved in offer_id order, so concurrent bookings of overlapping
+# offers cannot deadlock, then decrements all of them only if every one still has the
+# seats wanted. Nothing is updated otherwise.
+_RESERVE_SQL = text("""
+    WITH wanted AS (
+        SELECT * FROM unnest(:offer_ids, :seats) AS w(offer_id, seats)
+    ), locked AS (
+        SELECT c.offer_id, c.seats, w.seats AS wanted
+        FROM cached_offers c
+        JOIN wanted w ON w.offer_id = c.offer_id
+        ORDER BY c.offer_id
+        FOR UPDATE OF c
+    )
+    UPDATE cached_offers c
+    SET seats = c.seats - l.wanted
+    FROM locked l
+    WHERE c.offer_id = l.offer_id
+      AND NOT EXISTS (SELECT 1 FROM locked WHERE COALESCE(seats, 0) < wanted)
+    RETURNING c.offer_id
+""").bindparams(
+    bindparam("offer_ids", type_=ARRAY(String)),
+    bindparam("seats", type_=ARRAY(Integer)),
+)
+
+_RELEASE_SQL = text("""
+    WITH wanted AS (
+        SELECT * FROM unnest(:offer_ids, :seats) AS w(offer_id, seats)
+    ), locked AS (
+        SELECT c.offer_id, w.seats AS released
+        FROM cached_offers c
+        JOIN wanted w ON w.offer_id = c.offer_id
+        ORDER BY c.offer_id
+        FOR UPDATE OF c
+    )
+    UPDATE cached_offers c
+    SET seats = COALESCE(c.seats, 0) + l.released
+    FROM locked l
+    WHERE c.offer_id = l.offer_id
+    RETURNING c.offer_id
+""").bindparams(
+    bindparam("offer_ids", type_=ARRAY(String)),
+    bindparam("seats", type_=ARRAY(Integer)),
+)
+
+
+class SeatInventory:
+    """
+    Seat counts of cached offers as bookable inventory. Booking a round-trip pair or a
+    connecting itinerary also takes the seats off the one-way offers it was composed
+    from, so the legs cannot be sold again on their own.
+    """
+
+    def leg_ids(self, db: Session, offers: Iterable[CachedOffer]) -> Dict[str, List[str]]:
+        """The one-way offers each composed offer among offers was built from, in one query"""
+        composed = [offer.offer_id for offer in offers if offer.offer_source != UPSTREAM_SOURCE]
+        if not composed:
+            return {}
+        rows = db.query(CachedOffer.offer_id, CachedOffer.payload["composedOfferIds"]).filter(
+            CachedOffer.offer_id.in_(composed)
+        ).all()
+        return {offer_id: list(leg_ids or ()) for offer_id, leg_ids in rows}
+
+    def seat_counts(
+        self, db: Session, offer: CachedOffer, passengers: int, leg_ids: Optional[List[str]] = None
+    ) -> Dict[str, int]:
+        """
+        Seats a booking of offer takes from each cached offer involved. Pass leg_ids when
+        already known from leg_ids(), to skip looking them up again.
+        """
+        counts = Counter({offer.offer_id: passengers})
+        if leg_ids is None:
+            leg_ids = self.leg_ids(db, [offer]).get(offer.offer_id, [])
+        for leg_id in leg_ids:
+            counts[leg_id] += passengers
+        return dict(counts)
+
+    def lock(self, db: Session, offer_ids: Iterable[str]) -> Dict[str, int]:
+        """
+        Lock offers, in offer_id order as reserve() does, until the caller's transaction
+        ends, and return their seats left. Offers no longer cached are absent.
+        """
+        rows = db.query(CachedOffer.offer_id, CachedOffer.seats).filter(
+            CachedOffer.offer_id.in_(sorted(set(offer_ids)))
+        ).order_by(CachedOffer.offer_id).with_for_update().all()
+        return {offer_id: seats or 0 for offer_id, seats in rows}
+
+    def reserve(self, db: Session, counts: Dict[str, int]) -> List[str]:
+        """
+        Take the seats in counts (offer_id -> seats) off their offers, all or nothing,
+        in the caller's transaction, and return the offers updated. Offers no longer
+        cached are skipped. Returns no offers, changing nothing, if any offer involved
+        has too few seats left.
+        """
+        offer_ids = sorted(counts)
+        updated = db.execute(
+            _RESERVE_SQL, {"offer_ids": offer_ids, "seats": [counts[offer_id] for offer_id in offer_ids]}
+        ).scalars().all()
+        db_notifications.publish(db, OFFER_CHANGES_CHANNEL, updated)
+        return updated
+
+    def release(self, db: Session, counts: Dict[str, int]) -> List[str]:
+        """Put seats back on their offers in the caller's transaction; returns the offers updated"""
+        offer_ids = sorted(counts)
+        updated = db.execute(
+            _RELEASE_SQL, {"offer_ids": offer_ids, "seats": [counts[offer_id] for offer_id in offer_ids]}
+        ).scalars().all()
+        db_notifications.publish(db, OFFER_CHANGES_CHANNEL, updated)
+        return updated
+
+    def seats_left(self, db: Session, offer_id: str) -> int:
+        return db.query(CachedOffer.seats).filter(CachedOffer.offer_id == offer_id).scalar() or 0
+
+    def forget(self, offer_ids: Iterable[str]) -> None:
+        """
+        Drop offers whose seats changed from this worker's offer detail cache right after
+        the commit; other workers drop them when the notification arrives
+        """
+        for offer_id in offer_ids:
+            offer_detail_cache.invalidate(offer_id)
+
+
+seat_inventory = SeatInventory()
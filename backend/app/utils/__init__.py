@@ -8,6 +8,10 @@ from .validators import (
     validate_phone,
     validate_date_format,
 )
+from .offer_ids import derive_offer_id
+from .cursors import encode_cursor, decode_cursor
+from .money import BASE_CURRENCY, to_minor, from_minor
+from .json_stream import JsonArrayItemParser
 
 __all__ = [
     "get_logger",
@@ -15,5 +19,12 @@ __all__ = [
     "validate_airport_code",
     "validate_phone",
     "validate_date_format",
+    "derive_offer_id",
+    "encode_cursor",
+    "decode_cursor",
+    "BASE_CURRENCY",
+    "to_minor",
+    "from_minor",
+    "JsonArrayItemParser",
 ]
 
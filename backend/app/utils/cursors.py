@@ -0,0 +1,25 @@
+"""
+Keyset pagination cursors
+Opaque, URL-safe tokens carrying the sort key of the last row on a page
+"""
+import base64
+import json
+from typing import Dict, Any
+
+
+def encode_cursor(position: Dict[str, Any]) -> str:
+    """Encode a JSON-serializable position as an unpadded URL-safe base64 string"""
+    raw = json.dumps(position, separators=(",", ":"), sort_keys=True).encode()
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Dict[str, Any]:
+    """Decode a cursor produced by encode_cursor, raising ValueError if it is malformed"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        position = json.loads(raw)
+    except (ValueError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
+    if not isinstance(position, dict):
+        raise ValueError("Invalid cursor")
+    return position
@@ -0,0 +1,146 @@
+"""
+Incremental JSON decoding
+Decodes the items of one array inside a top-level JSON object as the bytes arrive,
+without holding or parsing the whole document
+"""
+import codecs
+import json
+import re
+from typing import Any, List, Optional
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_VALUE_END = frozenset(" \t\n\r,:]}")
+_COMPACT_AT = 1 << 16  # drop consumed text once this many characters have been decoded
+
+
+class JsonArrayItemParser:
+    """
+    Feed it chunks of a JSON object such as {"meta": {...}, "data": [...], ...} and it
+    returns each item of the array under `key` as soon as the item is complete. Values
+    of other keys before the array are decoded and discarded; everything after the
+    array is ignored, so `done` turns true and the caller can stop reading.
+
+    Raises ValueError for malformed input, or from close() if the document ended early.
+    """
+
+    def __init__(self, key: str):
+        self.key = key
+        self.done = False
+        self.items_decoded = 0
+        self._decoder = json.JSONDecoder()
+        self._text_decoder = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        self._pos = 0
+        self._state = "object_start"
+        self._current_key: Optional[str] = None
+
+    def feed(self, chunk: bytes) -> List[Any]:
+        """Add a chunk of the document and return the array items it completed"""
+        if self.done:
+            return []
+        self._buffer += self._text_decoder.decode(chunk)
+        items = self._advance(final=False)
+        if self._pos > _COMPACT_AT:
+            self._buffer = self._buffer[self._pos:]
+            self._pos = 0
+        return items
+
+    def close(self) -> List[Any]:
+        """Signal the end of the document and return any items still pending"""
+        if self.done:
+            return []
+        self._buffer += self._text_decoder.decode(b"", final=True)
+        items = self._advance(final=True)
+        if not self.done:
+            raise ValueError(f"JSON document ended before the end of the '{self.key}' array")
+        return items
+
+    def _skip_whitespace(self) -> Optional[str]:
+        self._pos = _WHITESPACE.match(self._buffer, self._pos).end()
+        return self._buffer[self._pos] if self._pos < len(self._buffer) else None
+
+    def _expect(self, char: Optional[str], expected: str) -> None:
+        if char not in expected:
+            raise ValueError(f"Expected one of {expected!r} at offset {self._pos}, got {char!r}")
+
+    def _decode_value(self, final: bool) -> Any:
+        """Decode the value at the current position, or raise _NeedMoreData"""
+        try:
+            value, end = self._decoder.raw_decode(self._buffer, self._pos)
+        except json.JSONDecodeError as e:
+            if final:
+                raise ValueError(f"Malformed JSON: {e.msg} at offset {e.pos}") from e
+            raise _NeedMoreData() from e
+        # A number cut by a chunk boundary ("12" of "12.5") decodes early; only accept a
+        # value once the character after it shows it has ended
+        if end >= len(self._buffer) or self._buffer[end] not in _VALUE_END:
+            if not final:
+                raise _NeedMoreData()
+            if end < len(self._buffer):
+                raise ValueError(f"Malformed JSON: unexpected {self._buffer[end]!r} at offset {end}")
+        self._pos = end
+        return value
+
+    def _advance(self, final: bool) -> List[Any]:
+        items: List[Any] = []
+        try:
+            while not self.done:
+                char = self._skip_whitespace()
+                if char is None:
+                    raise _NeedMoreData()
+                if self._state == "object_start":
+                    self._expect(char, "{")
+                    self._pos += 1
+                    self._state = "key_or_end"
+                elif self._state == "key_or_end":
+                    if char == "}":
+                        # The array never appeared; there is nothing to yield
+                        self.done = True
+                        break
+                    self._expect(char, '"')
+                    self._current_key = self._decode_value(final)
+                    self._state = "colon"
+                elif self._state == "colon":
+                    self._expect(char, ":")
+                    self._pos += 1
+                    self._state = "array_start" if self._current_key == self.key else "skip_value"
+                elif self._state == "skip_value":
+                    self._decode_value(final)
+                    self._state = "member_end"
+                elif self._state == "member_end":
+                    self._expect(char, ",}")
+                    self._pos += 1
+                    if char == "}":
+                        self.done = True
+                    else:
+                        self._state = "key_or_end"
+                elif self._state == "array_start":
+                    self._expect(char, "[")
+                    self._pos += 1
+                    self._state = "item_or_end"
+                elif self._state == "item_or_end":
+                    if char == "]":
+                        self._pos += 1
+                        self.done = True
+                        break
+                    items.append(self._decode_value(final))
+                    self.items_decoded += 1
+                    self._state = "item_end"
+                elif self._state == "item_end":
+                    self._expect(char, ",]")
+                    self._pos += 1
+                    if char == "]":
+                        self.done = True
+                    else:
+                        self._state = "item"
+                elif self._state == "item":
+                    items.append(self._decode_value(final))
+                    self.items_decoded += 1
+                    self._state = "item_end"
+        except _NeedMoreData:
+            pass
+        return items
+
+
+class _NeedMoreData(Exception):
+    """The buffer ends in the middle of the next token"""
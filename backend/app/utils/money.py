@@ -0,0 +1,34 @@
+"""
+Money helpers
+Amounts are stored as integers in the currency's minor unit (paise for INR)
+"""
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Union
+
+BASE_CURRENCY = "INR"
+
+# ISO 4217 minor-unit exponents that differ from the usual 2
+CURRENCY_EXPONENTS = {
+    "JPY": 0,
+    "KRW": 0,
+    "VND": 0,
+    "BHD": 3,
+    "KWD": 3,
+    "OMR": 3,
+    "JOD": 3,
+}
+
+
+def currency_exponent(currency: str) -> int:
+    return CURRENCY_EXPONENTS.get((currency or BASE_CURRENCY).upper(), 2)
+
+
+def to_minor(amount: Union[str, int, float, Decimal], currency: str = BASE_CURRENCY) -> int:
+    """Convert a major-unit amount such as "1234.50" to minor units, rounding half up"""
+    scaled = Decimal(str(amount)).scaleb(currency_exponent(currency))
+    return int(scaled.quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def from_minor(amount_minor: int, currency: str = BASE_CURRENCY) -> float:
+    """Major-unit amount for display and JSON responses"""
+    return float(Decimal(amount_minor).scaleb(-currency_exponent(currency)))
@@ -0,0 +1,53 @@
+"""
+Stable offer identifiers
+Offer IDs are derived from the itinerary content so the same flight, fare
+and passenger mix always maps to the same cached_offers row
+"""
+import base64
+import hashlib
+from collections import Counter
+from typing import Dict, Any, List
+
+OFFER_ID_PREFIX = "OFFER_"
+OFFER_ID_HASH_LENGTH = 12  # base32 characters, 60 bits
+_DIGEST_BYTES = (OFFER_ID_HASH_LENGTH * 5 + 39) // 40 * 5
+
+
+def offer_identity_parts(offer: Dict[str, Any]) -> List[str]:
+    """
+    Content that identifies an offer: every segment's carrier, flight number,
+    endpoints and departure time, the fare bases, and the passenger mix
+    """
+    parts = []
+    for itinerary in offer.get("itineraries", []):
+        for segment in itinerary.get("segments", []):
+            departure = segment.get("departure", {})
+            arrival = segment.get("arrival", {})
+            parts.append(
+                f"{segment.get('carrierCode', '')}{segment.get('number', '')}"
+                f"@{departure.get('iataCode', '')}{departure.get('at', '')}"
+                f">{arrival.get('iataCode', '')}"
+            )
+        parts.append("|")  # itinerary boundary
+
+    fare_bases = set()
+    traveler_types = Counter()
+    for traveler in offer.get("travelerPricings", []):
+        traveler_types[traveler.get("travelerType", "ADULT")] += 1
+        for fare in traveler.get("fareDetailsBySegment", []):
+            if fare.get("fareBasis"):
+                fare_bases.add(fare["fareBasis"])
+    parts.append("fare:" + ",".join(sorted(fare_bases)))
+    parts.append("pax:" + ",".join(f"{kind}{count}" for kind, count in sorted(traveler_types.items())))
+    return parts
+
+
+def derive_offer_id(offer: Dict[str, Any]) -> str:
+    """
+    Deterministic short offer ID such as OFFER_K3J9QX2MZP4A.
+    Only uppercase letters and digits follow the prefix so IDs are easy to match in chat text.
+    """
+    digest = hashlib.sha256("\n".join(offer_identity_parts(offer)).encode()).digest()
+    # Base32 maps every 5 bytes to 8 characters, so the leading bytes are all the id needs
+    encoded = base64.b32encode(digest[:_DIGEST_BYTES]).decode("ascii")
+    return f"{OFFER_ID_PREFIX}{encoded[:OFFER_ID_HASH_LENGTH]}"
@@ -24,6 +24,17 @@ def validate_phone(phone: str) -> bool:
     return cleaned.isdigit() and 10 <= len(cleaned) <= 15
 
 
+def passenger_error(passenger) -> Optional[str]:
+    """Why a booking's passenger details are invalid, or None when they are valid"""
+    if not validate_email(passenger.email):
+        return f"Invalid email for passenger: {passenger.full_name}"
+    if not validate_phone(passenger.phone):
+        return f"Invalid phone for passenger: {passenger.full_name}"
+    if not passenger.date_of_birth:
+        return f"Date of birth is required for passenger: {passenger.full_name}"
+    return None
+
+
 def validate_date_format(date_str: str) -> bool:
     """Validate date format YYYY-MM-DD"""
     pattern = r'^\d{4}-\d{2}-\d{2}$'
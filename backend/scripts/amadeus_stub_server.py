@@ -0,0 +1,357 @@
+"""
+Local Amadeus-compatible stand-in server for load testing
+Implements the subset of the Amadeus API used by AmadeusService:
+  POST /v1/security/oauth2/token
+  GET  /v2/shopping/flight-offers
+
+Serves deterministic generated inventory with configurable latency,
+error rates, rate limits and token expiry. Point AMADEUS_BASE_URL at it:
+
+    python scripts/amadeus_stub_server.py --port 9000 --latency lognormal:250,0.5
+    AMADEUS_BASE_URL=http://127.0.0.1:9000 AMADEUS_API_KEY=x AMADEUS_API_SECRET=y uvicorn app.main:app
+"""
+import argparse
+import asyncio
+import hashlib
+import math
+import os
+import random
+import secrets
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional, Tuple
+
+from fastapi import FastAPI, Form, Header, Request
+from fastapi.responses import JSONResponse
+
+CARRIERS = ["AI", "6E", "SG", "UK", "G8", "QP", "IX", "I5"]
+FARE_CLASSES = [("Y", "ECONOMY"), ("M", "ECONOMY"), ("W", "PREMIUM_ECONOMY"), ("J", "BUSINESS")]
+USD_TO_INR = 83.0
+
+
+@dataclass
+class StubConfig:
+    """Runtime configuration for the stand-in server"""
+    latency: str = "fixed:0"  # fixed:<ms> | uniform:<lo>,<hi> | normal:<mu>,<sigma> | lognormal:<median>,<sigma> | exp:<mean>
+    error_rate: float = 0.0  # probability of a 500 on flight-offers
+    timeout_rate: float = 0.0  # probability of hanging for --timeout-seconds before answering
+    timeout_seconds: float = 35.0
+    rate_limit: float = 0.0  # requests per second per client, 0 disables
+    rate_burst: int = 10
+    token_ttl: int = 1799  # seconds, Amadeus default
+    reject_currencies: Tuple[str, ...] = ("INR",)  # currencies answered with 400
+    inventory_size: int = 40  # offers generated per route/date before `max` is applied
+    seed: int = 42
+    client_id: Optional[str] = None  # when set, only this client_id/secret pair is accepted
+    client_secret: Optional[str] = None
+
+
+@dataclass
+class StubState:
+    """Mutable server state: issued tokens, rate limiter buckets and counters"""
+    tokens: Dict[str, float] = field(default_factory=dict)  # token -> expiry epoch
+    buckets: Dict[str, Tuple[float, float]] = field(default_factory=dict)  # client -> (tokens, last refill)
+    counters: Dict[str, int] = field(default_factory=dict)
+
+    def count(self, key: str) -> None:
+        self.counters[key] = self.counters.get(key, 0) + 1
+
+
+def _amadeus_error(status: int, code: int, title: str, detail: str = "") -> JSONResponse:
+    """Build an error body in the Amadeus errors format"""
+    return JSONResponse(
+        status_code=status,
+        content={"errors": [{"status": status, "code": code, "title": title, "detail": detail}]},
+    )
+
+
+def _sample_latency(spec: str, rng: random.Random) -> float:
+    """Sample a latency in seconds from a distribution spec such as `lognormal:250,0.5`"""
+    kind, _, args = spec.partition(":")
+    values = [float(v) for v in args.split(",") if v]
+    if kind == "fixed":
+        ms = values[0] if values else 0.0
+    elif kind == "uniform":
+        ms = rng.uniform(values[0], values[1])
+    elif kind == "normal":
+        ms = max(0.0, rng.gauss(values[0], values[1]))
+    elif kind == "lognormal":
+        ms = rng.lognormvariate(math.log(max(values[0], 1e-3)), values[1])
+    elif kind == "exp":
+        ms = rng.expovariate(1.0 / max(values[0], 1e-3))
+    else:
+        raise ValueError(f"Unknown latency distribution: {spec}")
+    return ms / 1000.0
+
+
+def _take_token(state: StubState, config: StubConfig, client: str) -> bool:
+    """Token-bucket rate limiter, returns False when the request must be rejected with 429"""
+    if config.rate_limit <= 0:
+        return True
+    now = time.monotonic()
+    tokens, last = state.buckets.get(client, (float(config.rate_burst), now))
+    tokens = min(float(config.rate_burst), tokens + (now - last) * config.rate_limit)
+    if tokens < 1.0:
+        state.buckets[client] = (tokens, now)
+        return False
+    state.buckets[client] = (tokens - 1.0, now)
+    return True
+
+
+def _route_rng(config: StubConfig, *parts: str) -> random.Random:
+    """Deterministic RNG per route/date so repeated searches see the same inventory"""
+    digest = hashlib.sha256("|".join((str(config.seed),) + parts).encode()).hexdigest()
+    return random.Random(int(digest[:16], 16))
+
+
+def _iso_duration(minutes: int) -> str:
+    hours, mins = divmod(minutes, 60)
+    return f"PT{hours}H{mins}M" if mins else f"PT{hours}H"
+
+
+def _build_itinerary(
+    rng: random.Random, origin: str, destination: str, day: datetime, carrier: str, stops: int
+) -> Dict[str, Any]:
+    """Generate one itinerary with 1 + stops segments"""
+    hubs = [h for h in ("DEL", "BOM", "BLR", "HYD", "MAA", "CCU") if h not in (origin, destination)]
+    points = [origin] + rng.sample(hubs, stops) + [destination]
+    depart = day + timedelta(hours=rng.randint(5, 22), minutes=rng.choice([0, 10, 15, 25, 30, 40, 45, 55]))
+    segments = []
+    total_minutes = 0
+    for index, (seg_from, seg_to) in enumerate(zip(points, points[1:])):
+        block = rng.randint(60, 170)
+        arrive = depart + timedelta(minutes=block)
+        segments.append({
+            "departure": {"iataCode": seg_from, "terminal": str(rng.randint(1, 3)), "at": depart.isoformat()},
+            "arrival": {"iataCode": seg_to, "terminal": str(rng.randint(1, 3)), "at": arrive.isoformat()},
+            "carrierCode": carrier,
+            "number": str(rng.randint(100, 9899)),
+            "aircraft": {"code": rng.choice(["320", "32N", "321", "738", "7M8", "AT7"])},
+            "operating": {"carrierCode": carrier},
+            "duration": _iso_duration(block),
+            "id": str(index + 1),
+            "numberOfStops": 0,
+            "blacklistedInEU": False,
+        })
+        total_minutes += block
+        if index < stops:
+            layover = rng.randint(60, 240)
+            total_minutes += layover
+            depart = arrive + timedelta(minutes=layover)
+    return {"duration": _iso_duration(total_minutes), "segments": segments}
+
+
+def generate_offers(config: StubConfig, params: Dict[str, str]) -> List[Dict[str, Any]]:
+    """Generate Amadeus-shaped flight offers for a search"""
+    origin = params["originLocationCode"].upper()
+    destination = params["destinationLocationCode"].upper()
+    departure_date = params["departureDate"]
+    return_date = params.get("returnDate")
+    adults = int(params.get("adults", 1))
+    children = int(params.get("children", 0) or 0)
+    infants = int(params.get("infants", 0) or 0)
+    currency = params.get("currencyCode", "USD").upper()
+    non_stop = str(params.get("nonStop", "false")).lower() == "true"
+    limit = int(params.get("max", 250))
+
+    rng = _route_rng(config, origin, destination, departure_date, return_date or "")
+    outbound_day = datetime.strptime(departure_date, "%Y-%m-%d")
+    inbound_day = datetime.strptime(return_date, "%Y-%m-%d") if return_date else None
+    travelers = ["ADULT"] * adults + ["CHILD"] * children + ["HELD_INFANT"] * infants
+    type_factor = {"ADULT": 1.0, "CHILD": 0.75, "HELD_INFANT": 0.1}
+
+    offers = []
+    for index in range(config.inventory_size):
+        carrier = rng.choice(CARRIERS)
+        stops = 0 if non_stop else rng.choice([0, 0, 0, 1, 1, 2])
+        itineraries = [_build_itinerary(rng, origin, destination, outbound_day, carrier, stops)]
+        if inbound_day:
+            itineraries.append(_build_itinerary(rng, destination, origin, inbound_day, carrier, stops))
+        fare_class, cabin = rng.choice(FARE_CLASSES)
+        base_usd = rng.uniform(45, 180) * (1.0 + 0.35 * stops) * (1.9 if cabin == "BUSINESS" else 1.0)
+        base_usd *= len(itineraries)
+        rate = USD_TO_INR if currency == "INR" else 1.0
+
+        traveler_pricings = []
+        grand_total = 0.0
+        segment_ids = [seg["id"] for itin in itineraries for seg in itin["segments"]]
+        for traveler_id, traveler_type in enumerate(travelers, 1):
+            traveler_total = round(base_usd * type_factor[traveler_type] * rate, 2)
+            grand_total += traveler_total
+            traveler_pricings.append({
+                "travelerId": str(traveler_id),
+                "fareOption": "STANDARD",
+                "travelerType": traveler_type,
+                "price": {
+                    "currency": currency,
+                    "total": f"{traveler_total:.2f}",
+                    "base": f"{traveler_total * 0.85:.2f}",
+                },
+                "fareDetailsBySegment": [
+                    {
+                        "segmentId": segment_id,
+                        "cabin": cabin,
+                        "fareBasis": f"{fare_class}{carrier}{stops}{rng.randint(10, 99)}",
+                        "class": fare_class,
+                        "includedCheckedBags": {"weight": 15, "weightUnit": "KG"},
+                    }
+                    for segment_id in segment_ids
+                ],
+            })
+
+        offers.append({
+            "type": "flight-offer",
+            "id": str(index + 1),
+            "source": "GDS",
+            "instantTicketingRequired": False,
+            "nonHomogeneous": False,
+            "oneWay": not inbound_day,
+            "lastTicketingDate": departure_date,
+            "numberOfBookableSeats": rng.randint(1, 9),
+            "itineraries": itineraries,
+            "price": {
+                "currency": currency,
+                "total": f"{grand_total:.2f}",
+                "base": f"{grand_total * 0.85:.2f}",
+                "fees": [{"amount": "0.00", "type": "SUPPLIER"}, {"amount": "0.00", "type": "TICKETING"}],
+                "grandTotal": f"{grand_total:.2f}",
+            },
+            "pricingOptions": {"fareType": ["PUBLISHED"], "includedCheckedBagsOnly": True},
+            "validatingAirlineCodes": [carrier],
+            "travelerPricings": traveler_pricings,
+        })
+
+    offers.sort(key=lambda offer: float(offer["price"]["grandTotal"]))
+    for index, offer in enumerate(offers[:limit], 1):
+        offer["id"] = str(index)
+    return offers[:limit]
+
+
+def create_app(config: StubConfig) -> FastAPI:
+    """Build the stand-in FastAPI application"""
+    app = FastAPI(title="Amadeus stand-in", version="1.0.0")
+    state = StubState()
+    latency_rng = random.Random(config.seed)
+
+    @app.post("/v1/security/oauth2/token")
+    async def issue_token(
+        grant_type: str = Form(...),
+        client_id: str = Form(...),
+        client_secret: str = Form(...),
+    ):
+        state.count("token_requests")
+        if grant_type != "client_credentials":
+            return _amadeus_error(400, 38187, "Invalid parameters", "grant_type must be client_credentials")
+        if config.client_id and (client_id, client_secret) != (config.client_id, config.client_secret):
+            return _amadeus_error(401, 38190, "Invalid parameters", "Client credentials are invalid")
+        token = secrets.token_urlsafe(24)
+        state.tokens[token] = time.time() + config.token_ttl
+        return {
+            "type": "amadeusOAuth2Token",
+            "username": "stub@example.com",
+            "application_name": "amadeus-stub",
+            "client_id": client_id,
+            "token_type": "Bearer",
+            "access_token": token,
+            "expires_in": config.token_ttl,
+            "state": "approved",
+            "scope": "",
+        }
+
+    @app.get("/v2/shopping/flight-offers")
+    async def flight_offers(request: Request, authorization: str = Header("")):
+        state.count("search_requests")
+        token = authorization[7:] if authorization.startswith("Bearer ") else ""
+        expires_at = state.tokens.get(token)
+        if expires_at is None:
+            state.count("401")
+            return _amadeus_error(401, 38191, "Invalid access token")
+        if time.time() >= expires_at:
+            state.tokens.pop(token, None)
+            state.count("401")
+            return _amadeus_error(401, 38192, "Access token expired")
+        if not _take_token(state, config, token):
+            state.count("429")
+            return _amadeus_error(429, 38194, "Too many requests")
+
+        params = dict(request.query_params)
+        for required in ("originLocationCode", "destinationLocationCode", "departureDate", "adults"):
+            if not params.get(required):
+                state.count("400")
+                return _amadeus_error(400, 32171, "MANDATORY DATA MISSING", f"{required} is required")
+
+        if latency_rng.random() < config.timeout_rate:
+            await asyncio.sleep(config.timeout_seconds)
+        delay = _sample_latency(config.latency, latency_rng)
+        if delay:
+            await asyncio.sleep(delay)
+        if latency_rng.random() < config.error_rate:
+            state.count("500")
+            return _amadeus_error(500, 141, "SYSTEM ERROR HAS OCCURRED")
+
+        if params.get("currencyCode", "").upper() in config.reject_currencies:
+            state.count("400")
+            return _amadeus_error(400, 477, "INVALID FORMAT", "currencyCode is not supported")
+
+        offers = generate_offers(config, params)
+        state.count("200")
+        return {
+            "meta": {"count": len(offers)},
+            "data": offers,
+            "dictionaries": {
+                "currencies": {"USD": "US DOLLAR", "INR": "INDIAN RUPEE"},
+                "carriers": {code: code for code in CARRIERS},
+            },
+        }
+
+    @app.get("/_stub/stats")
+    async def stats():
+        return {"counters": state.counters, "live_tokens": len(state.tokens)}
+
+    return app
+
+
+def _config_from_args() -> Tuple[StubConfig, str, int]:
+    """Parse CLI arguments, defaulting to STUB_AMADEUS_* environment variables"""
+    env = os.getenv
+    parser = argparse.ArgumentParser(description="Local Amadeus-compatible stand-in server")
+    parser.add_argument("--host", default=env("STUB_AMADEUS_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(env("STUB_AMADEUS_PORT", "9000")))
+    parser.add_argument("--latency", default=env("STUB_AMADEUS_LATENCY", "fixed:0"))
+    parser.add_argument("--error-rate", type=float, default=float(env("STUB_AMADEUS_ERROR_RATE", "0")))
+    parser.add_argument("--timeout-rate", type=float, default=float(env("STUB_AMADEUS_TIMEOUT_RATE", "0")))
+    parser.add_argument("--timeout-seconds", type=float, default=float(env("STUB_AMADEUS_TIMEOUT_SECONDS", "35")))
+    parser.add_argument("--rate-limit", type=float, default=float(env("STUB_AMADEUS_RATE_LIMIT", "0")))
+    parser.add_argument("--rate-burst", type=int, default=int(env("STUB_AMADEUS_RATE_BURST", "10")))
+    parser.add_argument("--token-ttl", type=int, default=int(env("STUB_AMADEUS_TOKEN_TTL", "1799")))
+    parser.add_argument("--reject-currencies", default=env("STUB_AMADEUS_REJECT_CURRENCIES", "INR"))
+    parser.add_argument("--inventory-size", type=int, default=int(env("STUB_AMADEUS_INVENTORY_SIZE", "40")))
+    parser.add_argument("--seed", type=int, default=int(env("STUB_AMADEUS_SEED", "42")))
+    parser.add_argument("--client-id", default=env("STUB_AMADEUS_CLIENT_ID"))
+    parser.add_argument("--client-secret", default=env("STUB_AMADEUS_CLIENT_SECRET"))
+    args = parser.parse_args()
+
+    config = StubConfig(
+        latency=args.latency,
+        error_rate=args.error_rate,
+        timeout_rate=args.timeout_rate,
+        timeout_seconds=args.timeout_seconds,
+        rate_limit=args.rate_limit,
+        rate_burst=args.rate_burst,
+        token_ttl=args.token_ttl,
+        reject_currencies=tuple(c.strip().upper() for c in args.reject_currencies.split(",") if c.strip()),
+        inventory_size=args.inventory_size,
+        seed=args.seed,
+        client_id=args.client_id,
+        client_secret=args.client_secret,
+    )
+    _sample_latency(config.latency, random.Random(0))  # fail fast on a bad spec
+    return config, args.host, args.port
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    stub_config, host, port = _config_from_args()
+    uvicorn.run(create_app(stub_config), host=host, port=port, log_level="warning")
@@ -0,0 +1,195 @@
+"""
+Benchmark of the in-process offer representation
+Parses a search's worth of generated Amadeus offers into FlightOffer objects and,
+for comparison, into the per-offer dicts the search path used before, then reports
+the memory each representation retains and the CPU time, per search, of parsing,
+of the pipeline steps that read the parsed offers (route validation, first-flight
+de-duplication, ranking) and of building the cached_offers rows written at the end:
+
+    python scripts/benchmark_offer_model.py --offers 250 --searches 200
+
+Prices are generated in INR, so no FX rate lookup is needed beyond the base currency.
+"""
+import sys
+import os
+import argparse
+import gc
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Tuple
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from amadeus_stub_server import StubConfig, generate_offers
+from app.models.cached_offer import OFFER_TTL, utc_now
+from app.services.flight_offer import FlightOffer
+from app.services.flight_search_service import (
+    offer_passenger_mix,
+    parse_amadeus_offer,
+    parse_iso_duration_minutes,
+)
+from app.services.fx_rate_service import fx_rate_service
+from app.services.offer_composition import offer_source
+from app.services.round_trip_pairing import ROUND_TRIP_HOUR_VALUE, ROUND_TRIP_STOP_PENALTY, best_cost
+from app.utils.money import BASE_CURRENCY, to_minor
+from app.utils.offer_ids import derive_offer_id
+
+HOUR_VALUE_MINOR = to_minor(ROUND_TRIP_HOUR_VALUE)
+STOP_PENALTY_MINOR = to_minor(ROUND_TRIP_STOP_PENALTY)
+
+
+def legacy_parse(offer: dict) -> Dict[str, Any]:
+    """The previous parse: one dict per itinerary, merged into one dict per offer"""
+    def parse_itinerary(itinerary: dict) -> dict:
+        segments = itinerary["segments"]
+        first_segment, last_segment = segments[0], segments[-1]
+        depart_ts = time_of(first_segment.get("departure", {}).get("at", ""))
+        arrive_ts = time_of(last_segment.get("arrival", {}).get("at", ""))
+        return {
+            "origin": first_segment.get("departure", {}).get("iataCode", "").upper(),
+            "destination": last_segment.get("arrival", {}).get("iataCode", "").upper(),
+            "depart_ts": depart_ts,
+            "arrive_ts": arrive_ts,
+            "airline": first_segment.get("carrierCode", ""),
+            "flight_no": f"{first_segment.get('carrierCode', '')}{first_segment.get('number', '')}",
+            "duration_minutes": parse_iso_duration_minutes(itinerary.get("duration", "")) or 0,
+            "stops": len(segments) - 1 + sum(segment.get("numberOfStops", 0) for segment in segments),
+        }
+
+    def time_of(value: str):
+        from datetime import datetime
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).replace(tzinfo=None)
+
+    itineraries = offer.get("itineraries") or [{}]
+    outbound = parse_itinerary(itineraries[0])
+    price_info = offer.get("price", {})
+    source_currency = (price_info.get("currency") or BASE_CURRENCY).upper()
+    source_total = price_info.get("total", "0")
+    return {
+        **outbound,
+        "offer_id": derive_offer_id(offer),
+        "return_depart_ts": None,
+        "return_arrive_ts": None,
+        "return_flight_no": None,
+        "price_minor": fx_rate_service.to_base_minor(source_total, source_currency),
+        "currency": BASE_CURRENCY,
+        "source_currency": source_currency,
+        "source_price_minor": to_minor(source_total, source_currency),
+        "seats": offer.get("numberOfBookableSeats", 1),
+        "passenger_mix": offer_passenger_mix(offer),
+        "offer_source": offer_source(offer),
+        "payload": offer,
+    }
+
+
+def legacy_reads(offers: List[Dict[str, Any]], origin: str, destination: str) -> List[Dict[str, Any]]:
+    matching = [
+        offer for offer in offers
+        if offer.get("origin", "").upper() == origin and offer.get("destination", "").upper() == destination
+    ]
+    # The real/mock merge walked each payload for the first segment's carrier and number,
+    # keeping one offer per flight
+    seen = set()
+    unique = []
+    for offer in matching:
+        segment = (offer["payload"].get("itineraries") or [{}])[0].get("segments")[0]
+        flight = (segment.get("carrierCode", ""), segment.get("number", ""))
+        if flight not in seen:
+            seen.add(flight)
+            unique.append(offer)
+    return sorted(
+        unique,
+        key=lambda offer: offer["price_minor"] + HOUR_VALUE_MINOR * offer["duration_minutes"] // 60 + STOP_PENALTY_MINOR * offer["stops"],
+    )
+
+
+def reads(offers: List[FlightOffer], origin: str, destination: str) -> List[FlightOffer]:
+    matching = [offer for offer in offers if offer.origin == origin and offer.destination == destination]
+    # The same merge, on the first flight carried by each offer
+    seen = set()
+    unique = []
+    for offer in matching:
+        if offer.first_flight not in seen:
+            seen.add(offer.first_flight)
+            unique.append(offer)
+    return sorted(unique, key=best_cost)
+
+
+def legacy_rows(offers: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    now = utc_now()
+    return [{**offer, "cached_at": now, "expire_at": now + OFFER_TTL} for offer in offers]
+
+
+def rows(offers: List[FlightOffer]) -> List[Dict[str, Any]]:
+    now = utc_now()
+    return [offer.as_row(cached_at=now, expire_at=now + OFFER_TTL) for offer in offers]
+
+
+def retained_bytes(build: Callable[[], list]) -> Tuple[int, list]:
+    """Bytes allocated by build() that are still referenced by its result"""
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size, result
+
+
+def time_ms(run: Callable[[], Any], repeats: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeats):
+        run()
+    return (time.perf_counter() - started) * 1000 / repeats
+
+
+def benchmark(offer_count: int, searches: int) -> None:
+    origin, destination = "DEL", "BOM"
+    raw_offers = generate_offers(
+        StubConfig(inventory_size=offer_count),
+        {
+            "originLocationCode": origin,
+            "destinationLocationCode": destination,
+            "departureDate": "2026-11-20",
+            "adults": "1",
+            "currencyCode": BASE_CURRENCY,
+            "max": str(offer_count),
+        },
+    )
+    # Load the FX rates before measuring; payloads are the decoded upstream JSON in
+    # both cases and are not counted
+    legacy_parse(raw_offers[0])
+    parse_amadeus_offer(raw_offers[0])
+    legacy_bytes, legacy_offers = retained_bytes(lambda: [legacy_parse(offer) for offer in raw_offers])
+    slotted_bytes, slotted_offers = retained_bytes(lambda: [parse_amadeus_offer(offer) for offer in raw_offers])
+
+    results = {
+        "retained KiB per search": (legacy_bytes / 1024, slotted_bytes / 1024),
+        "parse ms per search": (
+            time_ms(lambda: [legacy_parse(offer) for offer in raw_offers], searches),
+            time_ms(lambda: [parse_amadeus_offer(offer) for offer in raw_offers], searches),
+        ),
+        "pipeline reads ms": (
+            time_ms(lambda: legacy_reads(legacy_offers, origin, destination), searches),
+            time_ms(lambda: reads(slotted_offers, origin, destination), searches),
+        ),
+        "cached_offers rows ms": (
+            time_ms(lambda: legacy_rows(legacy_offers), searches),
+            time_ms(lambda: rows(slotted_offers), searches),
+        ),
+    }
+
+    print(f"{len(raw_offers)} offers per search, {searches} searches")
+    print(f"{'':<26}{'dicts':>12}{'FlightOffer':>14}{'saved':>9}")
+    for label, (legacy, slotted) in results.items():
+        saved = 1 - slotted / legacy if legacy else 0.0
+        print(f"{label:<26}{legacy:>12.2f}{slotted:>14.2f}{saved:>9.0%}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare parsed offer representations")
+    parser.add_argument("--offers", type=int, default=250, help="offers per search")
+    parser.add_argument("--searches", type=int, default=200, help="repetitions for the timings")
+    args = parser.parse_args()
+    benchmark(args.offers, args.searches)
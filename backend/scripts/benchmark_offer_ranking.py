@@ -0,0 +1,101 @@
+"""
+Benchmark of the offer ranking engine
+Ranks a candidate set of generated offers (the size of a calendar or multi-airport
+search) under each scoring profile with the NumPy ranker and, for comparison, with a
+full Python sort and with heapq.nsmallest on the same score computed per offer in
+Python, checking that all three return the same offers:
+
+    python scripts/benchmark_offer_ranking.py --offers 5000 --top 20 --repeats 50
+
+Prices are generated in INR, so no FX rate lookup is needed beyond the base currency.
+"""
+import sys
+import os
+import argparse
+import heapq
+import time
+from typing import Any, Callable, List, Tuple
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from amadeus_stub_server import StubConfig, generate_offers
+from app.services.flight_offer import FlightOffer
+from app.services.flight_search_service import parse_amadeus_offer
+from app.services.offer_ranking import ScoringProfile, offer_ranker
+from app.utils.money import BASE_CURRENCY, to_minor
+
+
+def generated_offers(count: int) -> List[FlightOffer]:
+    raw_offers = generate_offers(
+        StubConfig(inventory_size=count),
+        {
+            "originLocationCode": "DEL",
+            "destinationLocationCode": "BOM",
+            "departureDate": "2026-11-20",
+            "adults": "1",
+            "currencyCode": BASE_CURRENCY,
+            "max": str(count),
+        },
+    )
+    return [parse_amadeus_offer(offer) for offer in raw_offers]
+
+
+def python_key(profile: ScoringProfile) -> Callable[[FlightOffer], Tuple[float, int, str]]:
+    """The profile's score computed per offer in plain Python, with the ranker's tie-breaks"""
+    hour_value = to_minor(profile.hour_value) / 60.0
+    stop_penalty = to_minor(profile.stop_penalty)
+    off_window_penalty = to_minor(profile.off_window_penalty)
+    start, end = profile.departure_window
+    width = (end - start) % 24
+
+    def key(offer: FlightOffer) -> Tuple[float, int, str]:
+        score = profile.price_weight * float(offer.price_minor)
+        if hour_value:
+            score += hour_value * offer.duration_minutes
+        if stop_penalty:
+            score += stop_penalty * offer.stops
+        if off_window_penalty and width:
+            hour = (offer.depart_ts.hour * 60 + offer.depart_ts.minute) / 60.0
+            if (hour - start) % 24 >= width:
+                score += off_window_penalty * min((start - hour) % 24, (hour - end) % 24)
+        return score, offer.price_minor, offer.offer_id
+
+    return key
+
+
+def time_ms(run: Callable[[], Any], repeats: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeats):
+        run()
+    return (time.perf_counter() - started) * 1000 / repeats
+
+
+def benchmark(offer_count: int, top: int, repeats: int) -> None:
+    offers = generated_offers(offer_count)
+    print(f"{len(offers)} offers, top {top}, {repeats} repeats (ms per ranking)")
+    print(f"{'profile':<14}{'sorted':>10}{'nsmallest':>11}{'ranker':>10}")
+    for name, profile in sorted(offer_ranker.profiles.items()):
+        key = python_key(profile)
+        expected = [offer.offer_id for offer in sorted(offers, key=key)[:top]]
+        for label, ranked in (
+            ("nsmallest", heapq.nsmallest(top, offers, key=key)),
+            ("ranker", offer_ranker.rank(offers, name, top)),
+        ):
+            if [offer.offer_id for offer in ranked] != expected:
+                raise SystemExit(f"{name}: {label} disagrees with the full sort")
+        print(
+            f"{name:<14}"
+            f"{time_ms(lambda: sorted(offers, key=key)[:top], repeats):>10.2f}"
+            f"{time_ms(lambda: heapq.nsmallest(top, offers, key=key), repeats):>11.2f}"
+            f"{time_ms(lambda: offer_ranker.rank(offers, name, top), repeats):>10.2f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare offer ranking against Python sorting")
+    parser.add_argument("--offers", type=int, default=5000, help="candidate offers")
+    parser.add_argument("--top", type=int, default=20, help="offers returned per ranking")
+    parser.add_argument("--repeats", type=int, default=50, help="repetitions for the timings")
+    args = parser.parse_args()
+    benchmark(args.offers, args.top, args.repeats)
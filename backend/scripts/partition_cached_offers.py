@@ -0,0 +1,87 @@
+"""
+Script to convert cached_offers into a table partitioned by departure day
+Run this once, with the backend stopped, to enable partition drops in the expiry sweeper
+
+Layout after conversion:
+- cached_offers is PARTITION BY RANGE (depart_ts) with one partition per day
+  (cached_offers_pYYYYMMDD) and a default partition for everything else
+- the primary key becomes (offer_id, depart_ts), as Postgres requires the partition
+  key in every unique constraint; flight search upserts on that pair automatically
+- the bookings -> cached_offers foreign key is dropped, since it can no longer
+  reference offer_id alone. Booked offers are kept by the sweeper, which re-inserts
+  them into the default partition before a departed day's partition is dropped
+"""
+import sys
+import os
+from datetime import timedelta
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+from app.db import SessionLocal
+from app.models.cached_offer import utc_now
+from app.services.offer_expiry_service import (
+    PARTITION_DAYS_AHEAD,
+    DEFAULT_PARTITION,
+    PARTITION_STORAGE_OPTIONS,
+    is_partitioned,
+    partition_name,
+)
+
+
+def partition_cached_offers():
+    """Rebuild cached_offers as a partitioned table and copy existing rows into it"""
+    db = SessionLocal()
+    try:
+        if is_partitioned(db):
+            print("✅ cached_offers is already partitioned")
+            return
+
+        db.execute(text("LOCK TABLE cached_offers, bookings IN ACCESS EXCLUSIVE MODE"))
+        first_day = db.execute(text("SELECT MIN(depart_ts)::date FROM cached_offers")).scalar()
+        today = utc_now().date()
+        first_day = min(first_day or today, today)
+        last_day = today + timedelta(days=PARTITION_DAYS_AHEAD)
+
+        db.execute(text("""
+            CREATE TABLE cached_offers_partitioned (LIKE cached_offers INCLUDING DEFAULTS INCLUDING COMPRESSION)
+            PARTITION BY RANGE (depart_ts)
+        """))
+        db.execute(text("ALTER TABLE cached_offers_partitioned ADD PRIMARY KEY (offer_id, depart_ts)"))
+        db.execute(text(f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF cached_offers_partitioned DEFAULT {PARTITION_STORAGE_OPTIONS}"))
+
+        day = first_day
+        created = 0
+        while day <= last_day:
+            db.execute(text(
+                f"CREATE TABLE {partition_name(day)} PARTITION OF cached_offers_partitioned "
+                f"FOR VALUES FROM ('{day:%Y-%m-%d}') TO ('{day + timedelta(days=1):%Y-%m-%d}') "
+                f"{PARTITION_STORAGE_OPTIONS}"
+            ))
+            day += timedelta(days=1)
+            created += 1
+
+        copied = db.execute(text("INSERT INTO cached_offers_partitioned SELECT * FROM cached_offers")).rowcount
+
+        db.execute(text("ALTER TABLE bookings DROP CONSTRAINT IF EXISTS bookings_offer_id_fkey"))
+        db.execute(text("DROP TABLE cached_offers"))
+        db.execute(text("ALTER TABLE cached_offers_partitioned RENAME TO cached_offers"))
+        db.execute(text("ALTER TABLE cached_offers RENAME CONSTRAINT cached_offers_partitioned_pkey TO cached_offers_pkey"))
+        db.execute(text("CREATE INDEX ix_cached_offers_origin ON cached_offers (origin)"))
+        db.execute(text("CREATE INDEX ix_cached_offers_destination ON cached_offers (destination)"))
+        db.execute(text("CREATE INDEX ix_cached_offers_expire_at ON cached_offers (expire_at)"))
+        db.execute(text("CREATE INDEX ix_cached_offers_route_depart ON cached_offers (origin, destination, depart_ts)"))
+
+        db.commit()
+        print(f"✅ Partitioned cached_offers: {created} daily partitions, {copied} offers copied")
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Error partitioning cached_offers: {str(e)}")
+        raise
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    partition_cached_offers()
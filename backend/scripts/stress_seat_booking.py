@@ -0,0 +1,165 @@
+"""
+Concurrency stress test of seat inventory
+Sets an offer's seats, fires many concurrent bookings of it at a running backend, then
+cancels a share of the confirmed ones (each cancellation sent twice at once), and checks
+against the database that the offer was never oversold and that every seat is accounted
+for: seats left = seats set - passengers on confirmed bookings.
+
+    python scripts/stress_seat_booking.py --seats 50 --requests 500 --concurrency 64
+
+Run the backend with several workers (uvicorn app.main:app --workers 4) so bookings
+really race. Without --offer-id the first offer of a HYD-BOM search is used.
+"""
+import sys
+import os
+import argparse
+import asyncio
+import logging
+import random
+import time
+import uuid
+from collections import Counter
+from datetime import date, timedelta
+from typing import Any, Dict, List, Tuple
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from sqlalchemy import func
+from app.db import SessionLocal
+from app.models.booking import Booking
+from app.models.cached_offer import CachedOffer
+
+
+async def find_offer(client: httpx.AsyncClient) -> str:
+    response = await client.post(
+        "/api/flight/search",
+        params={"view": "summary"},
+        json={
+            "origin": "HYD",
+            "destination": "BOM",
+            "departure_date": (date.today() + timedelta(days=30)).isoformat(),
+            "limit": 1,
+        },
+    )
+    response.raise_for_status()
+    offers = response.json()["offers"]
+    if not offers:
+        raise SystemExit("The search returned no offers; pass --offer-id")
+    return offers[0]["offer_id"]
+
+
+def set_seats(offer_id: str, seats: int) -> None:
+    db = SessionLocal()
+    try:
+        updated = db.query(CachedOffer).filter(CachedOffer.offer_id == offer_id).update({CachedOffer.seats: seats})
+        db.commit()
+        if not updated:
+            raise SystemExit(f"Offer {offer_id} is not cached")
+    finally:
+        db.close()
+
+
+def database_state(offer_id: str, user_email: str) -> Tuple[int, Dict[str, int]]:
+    """Seats left on the offer, and passengers on the run's bookings by status"""
+    db = SessionLocal()
+    try:
+        seats = db.query(CachedOffer.seats).filter(CachedOffer.offer_id == offer_id).scalar()
+        rows = (
+            db.query(Booking.status, func.sum(func.json_array_length(Booking.passengers)))
+            .filter(Booking.user_email == user_email, Booking.offer_id == offer_id)
+            .group_by(Booking.status)
+            .all()
+        )
+        return seats, {status: int(passengers) for status, passengers in rows}
+    finally:
+        db.close()
+
+
+def booking_request(offer_id: str, user_email: str, passengers: int) -> Dict[str, Any]:
+    return {
+        "offer_id": offer_id,
+        "user_email": user_email,
+        "passengers": [
+            {
+                "full_name": f"Stress Passenger {index + 1}",
+                "email": "stress.passenger@example.com",
+                "phone": "9876543210",
+                "date_of_birth": "1990-01-01",
+            }
+            for index in range(passengers)
+        ],
+    }
+
+
+async def run_all(calls: List[Any], concurrency: int) -> Tuple[List[httpx.Response], float]:
+    """Await request coroutines, at most `concurrency` at a time; returns responses and seconds"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def limited(call):
+        async with semaphore:
+            return await call
+
+    started = time.perf_counter()
+    responses = await asyncio.gather(*(limited(call) for call in calls))
+    return responses, time.perf_counter() - started
+
+
+async def stress(args: argparse.Namespace) -> None:
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.backend_url, timeout=60.0, limits=limits) as client:
+        offer_id = args.offer_id or await find_offer(client)
+        set_seats(offer_id, args.seats)
+        user_email = f"stress-{uuid.uuid4().hex[:12]}@example.com"
+        print(f"Offer {offer_id}: {args.seats} seats, {args.requests} bookings of up to {args.passengers} passenger(s)")
+
+        sizes = [random.randint(1, args.passengers) for _ in range(args.requests)]
+        responses, seconds = await run_all(
+            [client.post("/api/booking/simulate_confirm", json=booking_request(offer_id, user_email, size)) for size in sizes],
+            args.concurrency,
+        )
+        statuses = Counter(response.status_code for response in responses)
+        booked = [response.json() for response in responses if response.status_code == 200]
+        print(f"Bookings: {dict(statuses)} in {seconds:.2f} s ({args.requests / seconds:.0f} requests/s)")
+
+        to_cancel = random.sample(booked, int(len(booked) * args.cancel_share))
+        # Each cancellation twice at once: seats must come back exactly once
+        cancel_calls = [
+            client.post(f"/api/booking/{booking['booking_id']}/cancel") for booking in to_cancel for _ in range(2)
+        ]
+        responses, seconds = await run_all(cancel_calls, args.concurrency)
+        cancel_statuses = Counter(response.status_code for response in responses)
+        print(f"Cancellations (each sent twice): {dict(cancel_statuses)} in {seconds:.2f} s")
+
+    seats_left, passengers = database_state(offer_id, user_email)
+    confirmed = passengers.get("confirmed", 0)
+    sold_before_cancel = sum(len(booking["passengers"]) for booking in booked)
+    print(f"Passengers booked: {sold_before_cancel}, confirmed after cancellations: {confirmed}, seats left: {seats_left}")
+
+    problems = []
+    if sold_before_cancel > args.seats:
+        problems.append(f"oversold: {sold_before_cancel} passengers on {args.seats} seats")
+    if seats_left < 0:
+        problems.append(f"negative seats: {seats_left}")
+    if seats_left != args.seats - confirmed:
+        problems.append(f"seats left {seats_left} != {args.seats} - {confirmed} confirmed passengers")
+    if cancel_statuses.get(200, 0) != len(to_cancel):
+        problems.append(f"{cancel_statuses.get(200, 0)} successful cancellations for {len(to_cancel)} bookings")
+    if problems:
+        raise SystemExit("FAILED: " + "; ".join(problems))
+    print("OK: no overselling, every seat accounted for")
+
+
+if __name__ == "__main__":
+    # One log line per request would drown the report
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    parser = argparse.ArgumentParser(description="Stress concurrent booking of one offer")
+    parser.add_argument("--backend-url", default=os.getenv("BACKEND_URL", "http://localhost:8000"))
+    parser.add_argument("--offer-id", help="cached offer to book (default: first offer of a HYD-BOM search)")
+    parser.add_argument("--seats", type=int, default=50, help="seats to give the offer before the run")
+    parser.add_argument("--requests", type=int, default=500, help="booking requests")
+    parser.add_argument("--passengers", type=int, default=2, help="most passengers per booking")
+    parser.add_argument("--concurrency", type=int, default=64, help="requests in flight at once")
+    parser.add_argument("--cancel-share", type=float, default=0.25, help="share of confirmed bookings to cancel")
+    asyncio.run(stress(parser.parse_args()))
@@ -1,38 +1,51 @@
 """
-Script to update all cached offers from USD to INR
-Run this once to migrate existing data
+Script to re-price cached offers that were quoted in a foreign currency
+Run it after changing FX rates so existing offers use the new rates, e.g.
+    python scripts/update_currency_to_inr.py --rate USD=83.5
 """
 import sys
 import os
+import argparse
 
 # Add parent directory to path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from app.db import SessionLocal
 from app.models.cached_offer import CachedOffer
+from app.services.fx_rate_service import fx_rate_service
+from app.utils.money import BASE_CURRENCY, currency_exponent, from_minor
 
-def update_currency_to_inr():
-    """Update all USD offers to INR"""
+
+def update_currency_to_inr(rates=None):
+    """Recompute price_minor for every non-INR offer from its source price and the current rates"""
     db = SessionLocal()
     try:
-        # Find all offers with USD currency
-        usd_offers = db.query(CachedOffer).filter(CachedOffer.currency == 'USD').all()
-        
-        print(f"Found {len(usd_offers)} offers with USD currency")
-        
-        if usd_offers:
-            # Convert each offer
-            for offer in usd_offers:
+        for currency, rate in (rates or {}).items():
+            fx_rate_service.set_rate(db, currency, rate)
+            print(f"Set FX rate {currency.upper()} = {rate} {BASE_CURRENCY}")
+        fx_rate_service.refresh()
+
+        # Find all offers quoted in another currency
+        foreign_offers = db.query(CachedOffer).filter(CachedOffer.source_currency != BASE_CURRENCY).all()
+
+        print(f"Found {len(foreign_offers)} offers quoted in a currency other than {BASE_CURRENCY}")
+
+        if foreign_offers:
+            for offer in foreign_offers:
                 old_price = offer.price
-                offer.price = offer.price * 83  # Convert USD to INR (1 USD ≈ 83 INR)
-                offer.currency = "INR"
-                print(f"Updated offer {offer.offer_id}: ${old_price:.2f} USD → ₹{offer.price:.2f} INR")
-            
+                source_amount = from_minor(offer.source_price_minor, offer.source_currency)
+                offer.price_minor = fx_rate_service.to_base_minor(source_amount, offer.source_currency)
+                offer.currency = BASE_CURRENCY
+                print(
+                    f"Updated offer {offer.offer_id}: {source_amount:.{currency_exponent(offer.source_currency)}f} "
+                    f"{offer.source_currency} → ₹{offer.price:.2f} {BASE_CURRENCY} (was ₹{old_price:.2f})"
+                )
+
             db.commit()
-            print(f"\n✅ Successfully updated {len(usd_offers)} offers to INR")
+            print(f"\n✅ Successfully re-priced {len(foreign_offers)} offers")
         else:
-            print("✅ No USD offers found - all offers are already in INR")
-            
+            print(f"✅ No foreign-currency offers found - all offers are already in {BASE_CURRENCY}")
+
     except Exception as e:
         db.rollback()
         print(f"❌ Error updating offers: {str(e)}")
@@ -40,6 +53,16 @@ def update_currency_to_inr():
     finally:
         db.close()
 
-if __name__ == "__main__":
-    update_currency_to_inr()
 
+def parse_rate(value):
+    currency, _, rate = value.partition("=")
+    if len(currency) != 3 or not rate:
+        raise argparse.ArgumentTypeError("expected CUR=RATE, e.g. USD=83.5")
+    return currency.upper(), rate
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rate", action="append", type=parse_rate, default=[], help="Set an FX rate first, as CUR=RATE")
+    args = parser.parse_args()
+    update_currency_to_inr(dict(args.rate))
@@ -0,0 +1,99 @@
+"""
+persist_offers round trips: a batch of offers is one INSERT ... ON CONFLICT into
+cached_offers, one write of the exploration fares and one commit, however many
+offers it holds. Needs the Postgres database DATABASE_URL points to, migrated.
+"""
+from datetime import timedelta
+from typing import List
+
+import pytest
+from sqlalchemy import delete, event
+from sqlalchemy.exc import OperationalError
+
+from app.db import SessionLocal, engine
+from app.models.cached_offer import CachedOffer, utc_now
+from app.models.route_min_price import RouteMinPrice
+from app.services.flight_offer import FlightOffer
+from app.services.flight_search_service import flight_search_service
+from app.services.offer_expiry_service import is_partitioned
+
+# A route no real search produces, so the test's rows are easy to clean up
+ORIGIN = "ZZA"
+DESTINATION = "ZZB"
+
+
+def make_offer(index: int, price_minor: int) -> FlightOffer:
+    depart_ts = (utc_now() + timedelta(days=300)).replace(hour=6, minute=0, second=0, microsecond=0)
+    return FlightOffer(
+        offer_id=f"OFFER_TEST_PERSIST_{index}",
+        origin=ORIGIN,
+        destination=DESTINATION,
+        depart_ts=depart_ts + timedelta(hours=index),
+        arrive_ts=depart_ts + timedelta(hours=index + 2),
+        airline="ZZ",
+        flight_number=str(100 + index),
+        price_minor=price_minor,
+        currency="INR",
+        source_currency="INR",
+        source_price_minor=price_minor,
+        seats=9,
+        duration_minutes=120,
+        stops=0,
+        passenger_mix="1-0-0",
+        offer_source="test",
+        payload={"id": str(index)},
+    )
+
+
+@pytest.fixture
+def db():
+    try:
+        with engine.connect():
+            pass
+    except OperationalError as e:
+        pytest.skip(f"Database not reachable: {e}")
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.rollback()
+        session.execute(delete(CachedOffer).where(CachedOffer.origin == ORIGIN))
+        session.execute(delete(RouteMinPrice).where(RouteMinPrice.origin == ORIGIN))
+        session.commit()
+        session.close()
+
+
+def test_persist_offers_is_one_upsert_and_one_commit(db):
+    offers = [make_offer(index, 500_000 + index * 1_000) for index in range(20)]
+    # Repeated offer ids, as a search and its round-trip pairing can return the same offer
+    offers += [make_offer(index, 400_000) for index in range(5)]
+    # Checked once per process; done here so it is not counted below
+    is_partitioned(db)
+
+    statements: List[str] = []
+    commits: List[bool] = []
+
+    def on_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    def on_commit(conn):
+        commits.append(True)
+
+    event.listen(engine, "before_cursor_execute", on_execute)
+    event.listen(engine, "commit", on_commit)
+    try:
+        stored = flight_search_service.persist_offers(db, offers)
+    finally:
+        event.remove(engine, "before_cursor_execute", on_execute)
+        event.remove(engine, "commit", on_commit)
+
+    assert [row["offer_id"] for row in stored] == [f"OFFER_TEST_PERSIST_{index}" for index in range(20)]
+    # The first occurrence of a repeated offer id wins
+    assert stored[0]["price_minor"] == 500_000
+
+    writes = [statement for statement in statements if not statement.lstrip().upper().startswith("BEGIN")]
+    assert len(writes) == 2, writes
+    offers_upsert, fares_upsert = writes
+    assert offers_upsert.startswith("INSERT INTO cached_offers") and "ON CONFLICT" in offers_upsert
+    assert fares_upsert.startswith("INSERT INTO route_min_prices") and "ON CONFLICT" in fares_upsert
+    assert len(commits) == 1
@@ -0,0 +1,24 @@
+"""
+extract_search_preferences: phrases match as whole words and are ignored when negated
+"""
+import pytest
+
+from app.agents.flight_search_agent import extract_search_preferences
+
+
+@pytest.mark.parametrize("message, expected", [
+    ("Show me the cheapest flight", {"sort_by": "price"}),
+    ("I need a flight, not the cheapest one", {}),
+    ("I don't want the cheapest, give me the fastest", {"sort_by": "duration"}),
+    ("No, the cheapest please", {"sort_by": "price"}),
+    ("What's the best option?", {"rank": "best"}),
+    ("They bestow miles on frequent flyers", {}),
+    ("A direct flight please", {"max_stops": 0}),
+    ("I want to fly directly after the meeting", {}),
+    ("I don't need a direct flight", {}),
+    ("An overnight flight is fine", {}),
+    ("Morning flights only, no night flights", {"depart_after": "05:00", "depart_before": "11:59"}),
+    ("A non-stop flight at night", {"max_stops": 0, "depart_after": "21:00", "depart_before": "23:59"}),
+])
+def test_extract_search_preferences(message, expected):
+    assert extract_search_preferences(message) == expected
@@ -1,7 +1,9 @@
 import client from './client'
 
-export const createBooking = async (bookingData) => {
-  const response = await client.post('/api/booking/simulate_confirm', bookingData)
+// Retries sent with the same idempotency key return the original booking
+export const createBooking = async ({ idempotencyKey, ...bookingData }) => {
+  const headers = idempotencyKey ? { 'Idempotency-Key': idempotencyKey } : {}
+  const response = await client.post('/api/booking/simulate_confirm', bookingData, { headers })
   return response.data
 }
 
@@ -15,6 +17,14 @@ export const getUserBookings = async (userEmail) => {
   return response.data
 }
 
+export const getBookingHistory = async (userEmail, { cursor, limit, status } = {}) => {
+  const params = { limit }
+  if (cursor) params.cursor = cursor
+  if (status) params.status = status
+  const response = await client.get(`/api/booking/user/${userEmail}/history`, { params })
+  return response.data
+}
+
 export const cancelBooking = async (bookingId) => {
   const response = await client.post(`/api/booking/${bookingId}/cancel`)
   return response.data
@@ -1,4 +1,4 @@
-import client from './client'
+import client, { API_URL } from './client'
 
 export const searchFlights = async (searchParams) => {
   const response = await client.post('/api/flight/search', searchParams)
@@ -10,3 +10,36 @@ export const getOfferDetails = async (offerId) => {
   return response.data
 }
 
+
+/**
+ * Streams a flight search: calls onFrame with each NDJSON frame as it arrives
+ * ({type: 'offers' | 'error' | 'summary', ...}). Uses fetch because axios
+ * buffers the whole response body in the browser.
+ */
+export const streamFlightSearch = async (searchParams, onFrame, signal) => {
+  // A blank return date from the search form means one-way
+  const { return_date: returnDate, ...oneWay } = searchParams
+  const response = await fetch(`${API_URL}/api/flight/search/stream`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify(returnDate ? searchParams : oneWay),
+    signal,
+  })
+  if (!response.ok) {
+    const body = await response.json().catch(() => ({}))
+    throw new Error(body.detail || `Flight search failed (${response.status})`)
+  }
+
+  const reader = response.body.getReader()
+  const decoder = new TextDecoder()
+  let buffered = ''
+  for (;;) {
+    const { value, done } = await reader.read()
+    buffered += decoder.decode(value || new Uint8Array(), { stream: !done })
+    const lines = buffered.split('\n')
+    buffered = lines.pop()
+    lines.filter((line) => line.trim()).forEach((line) => onFrame(JSON.parse(line)))
+    if (done) break
+  }
+  if (buffered.trim()) onFrame(JSON.parse(buffered))
+}
@@ -8,5 +8,7 @@ export { useChat } from './useChat'
 export { useUserEmail } from './useUserEmail'
 export { useScrollToBottom } from './useScrollToBottom'
 export { useFlightSearch } from './useFlightSearch'
+export { useFlightSearchStream } from './useFlightSearchStream'
 export { useBooking } from './useBooking'
+export { useBookingHistory } from './useBookingHistory'
 
@@ -27,6 +27,7 @@ export function useBooking(userEmail) {
     onSuccess: () => {
       // Invalidate and refetch bookings after creating a new one
       queryClient.invalidateQueries({ queryKey: ['userBookings', userEmail] })
+      queryClient.invalidateQueries({ queryKey: ['bookingHistory', userEmail] })
     },
   })
 
@@ -36,6 +37,7 @@ export function useBooking(userEmail) {
     onSuccess: (data, bookingId) => {
       // Invalidate and refetch bookings after cancellation
       queryClient.invalidateQueries({ queryKey: ['userBookings', userEmail] })
+      queryClient.invalidateQueries({ queryKey: ['bookingHistory', userEmail] })
       queryClient.invalidateQueries({ queryKey: ['booking', bookingId] })
     },
   })
@@ -0,0 +1,41 @@
+import { useInfiniteQuery } from '@tanstack/react-query'
+import { getBookingHistory } from '../api/booking'
+
+/**
+ * Custom hook for a user's booking history, fetched a page at a time (newest first)
+ * @param {string} userEmail - User's email address
+ * @param {Object} options - Optional status filter and page size
+ * @returns {Object} Loaded bookings, counts and paging handlers
+ */
+export function useBookingHistory(userEmail, { status, limit = 20 } = {}) {
+  const {
+    data,
+    isLoading,
+    error,
+    refetch,
+    fetchNextPage,
+    hasNextPage,
+    isFetchingNextPage,
+  } = useInfiniteQuery({
+    queryKey: ['bookingHistory', userEmail, status, limit],
+    queryFn: ({ pageParam }) => getBookingHistory(userEmail, { cursor: pageParam, status, limit }),
+    initialPageParam: null,
+    getNextPageParam: (lastPage) => lastPage.next_cursor || undefined,
+    enabled: !!userEmail,
+  })
+
+  const pages = data?.pages || []
+  const firstPage = pages[0]
+
+  return {
+    bookings: pages.flatMap((page) => page.bookings),
+    total: firstPage?.total || 0,
+    statusCounts: firstPage?.status_counts || {},
+    isLoading,
+    error,
+    refetch,
+    fetchNextPage,
+    hasNextPage: !!hasNextPage,
+    isFetchingNextPage,
+  }
+}
@@ -0,0 +1,55 @@
+import { useEffect, useState } from 'react'
+import { streamFlightSearch } from '../api/flight'
+
+/**
+ * Custom hook for a streamed flight search: offers are appended as each source
+ * (cache, Amadeus, mock top-up, paired legs, connections) returns them
+ * @param {Object|null} searchParams - Search to run; null to do nothing
+ * @returns {Object} Offers so far, completion state, error and the final summary
+ */
+export function useFlightSearchStream(searchParams) {
+  const [offers, setOffers] = useState([])
+  const [summary, setSummary] = useState(null)
+  const [error, setError] = useState(null)
+  const [isStreaming, setIsStreaming] = useState(false)
+
+  // Re-run only when the search itself changes, not on every new params object
+  const searchKey = searchParams ? JSON.stringify(searchParams) : null
+
+  useEffect(() => {
+    if (!searchKey) return undefined
+    const controller = new AbortController()
+    setOffers([])
+    setSummary(null)
+    setError(null)
+    setIsStreaming(true)
+
+    const onFrame = (frame) => {
+      if (frame.type === 'offers') {
+        setOffers((prev) => [...prev, ...frame.offers])
+      } else if (frame.type === 'error') {
+        setError(frame.detail)
+      } else if (frame.type === 'summary') {
+        setSummary(frame)
+      }
+    }
+
+    streamFlightSearch(JSON.parse(searchKey), onFrame, controller.signal)
+      .catch((err) => {
+        if (err.name !== 'AbortError') setError(err.message)
+      })
+      .finally(() => {
+        if (!controller.signal.aborted) setIsStreaming(false)
+      })
+
+    return () => controller.abort()
+  }, [searchKey])
+
+  return {
+    offers,
+    summary,
+    error,
+    isStreaming,
+    isComplete: summary !== null,
+  }
+}
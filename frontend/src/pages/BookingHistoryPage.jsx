@@ -1,12 +1,21 @@
 import { format } from 'date-fns'
 import { Link } from 'react-router-dom'
-import { useUserEmail, useBooking } from '../hooks'
+import { useUserEmail, useBooking, useBookingHistory } from '../hooks'
 import LoadingSpinner from '../components/LoadingSpinner.jsx'
 import { useState } from 'react'
 
 export default function BookingHistoryPage() {
   const [userEmail] = useUserEmail()
-  const { bookings, isLoadingBookings: isLoading, cancelBooking, cancelBookingLoading, refetchBookings } = useBooking(userEmail)
+  const { cancelBooking, cancelBookingLoading } = useBooking(userEmail)
+  const {
+    bookings,
+    total,
+    isLoading,
+    refetch: refetchBookings,
+    fetchNextPage,
+    hasNextPage,
+    isFetchingNextPage,
+  } = useBookingHistory(userEmail)
   const [cancellingId, setCancellingId] = useState(null)
 
   const handleCancel = async (bookingId) => {
@@ -36,7 +45,10 @@ export default function BookingHistoryPage() {
 
   return (
     <div className="max-w-6xl mx-auto px-2 sm:px-4 py-4 sm:py-8">
-      <h1 className="text-2xl sm:text-3xl font-bold text-gray-800 mb-4 sm:mb-6">My Bookings</h1>
+      <h1 className="text-2xl sm:text-3xl font-bold text-gray-800 mb-1">My Bookings</h1>
+      <p className="text-xs sm:text-sm text-gray-600 mb-4 sm:mb-6">
+        {total > 0 && `Showing ${bookings.length} of ${total} booking${total !== 1 ? 's' : ''}`}
+      </p>
 
       {!bookings || bookings.length === 0 ? (
         <div className="bg-white rounded-lg shadow-lg p-8 text-center">
@@ -110,6 +122,17 @@ export default function BookingHistoryPage() {
               </div>
             </div>
           ))}
+          {hasNextPage && (
+            <div className="text-center">
+              <button
+                onClick={() => fetchNextPage()}
+                disabled={isFetchingNextPage}
+                className="min-h-[44px] px-6 py-2 text-sm bg-primary-600 text-white rounded-lg hover:bg-primary-700 disabled:opacity-50 disabled:cursor-not-allowed transition-colors"
+              >
+                {isFetchingNextPage ? 'Loading...' : 'Load more'}
+              </button>
+            </div>
+          )}
         </div>
       )}
     </div>
@@ -1,17 +1,29 @@
 import { useLocation, useNavigate } from 'react-router-dom'
 import { format } from 'date-fns'
+import { useFlightSearchStream } from '../hooks'
 
 export default function FlightResultsPage() {
   const location = useLocation()
   const navigate = useNavigate()
-  const offers = location.state?.offers || []
-  const searchParams = location.state?.searchParams || {}
+  const searchParams = location.state?.searchParams || null
+  const { offers, summary, error, isStreaming, isComplete } = useFlightSearchStream(searchParams)
+
+  if (offers.length === 0 && isStreaming) {
+    return (
+      <div className="max-w-4xl mx-auto px-4 py-8">
+        <div className="bg-white rounded-lg shadow-lg p-8 text-center">
+          <h1 className="text-2xl font-bold text-gray-800">Searching flights...</h1>
+        </div>
+      </div>
+    )
+  }
 
   if (offers.length === 0) {
     return (
       <div className="max-w-4xl mx-auto px-4 py-8">
         <div className="bg-white rounded-lg shadow-lg p-8 text-center">
           <h1 className="text-2xl font-bold text-gray-800 mb-4">No Flights Found</h1>
+          {error && <p className="text-red-600 mb-4">{error}</p>}
           <button
             onClick={() => navigate('/search')}
             className="px-6 py-2 bg-primary-600 text-white rounded-lg hover:bg-primary-700"
@@ -25,7 +37,13 @@ export default function FlightResultsPage() {
 
   return (
     <div className="max-w-6xl mx-auto px-2 sm:px-4 py-4 sm:py-8">
-      <h1 className="text-2xl sm:text-3xl font-bold text-gray-800 mb-4 sm:mb-6">Flight Results</h1>
+      <h1 className="text-2xl sm:text-3xl font-bold text-gray-800 mb-2">Flight Results</h1>
+      <p className="text-sm text-gray-500 mb-4 sm:mb-6">
+        {isComplete
+          ? `${summary.count} flights found`
+          : `${offers.length} flights so far, still searching...`}
+      </p>
+      {error && <p className="text-sm text-red-600 mb-4">{error}</p>}
 
       <div className="space-y-3 sm:space-y-4">
         {offers.map((offer) => (
@@ -67,9 +85,11 @@ export default function FlightResultsPage() {
                   {(!offer.currency || offer.currency === 'INR') ? '₹' : '$'}{offer.price.toFixed(2)}
                 </div>
                 <div className="text-xs sm:text-sm text-gray-500 mb-3 sm:mb-4">{offer.currency || 'INR'}</div>
+                {/* Offers are saved for booking by the time the summary frame arrives */}
                 <button
                   onClick={() => navigate(`/booking/${offer.offer_id}`)}
-                  className="w-full sm:w-auto min-h-[44px] px-6 py-2.5 sm:py-2 text-sm sm:text-base bg-primary-600 text-white rounded-lg hover:bg-primary-700 transition-colors"
+                  disabled={!isComplete}
+                  className="w-full sm:w-auto min-h-[44px] px-6 py-2.5 sm:py-2 text-sm sm:text-base bg-primary-600 text-white rounded-lg hover:bg-primary-700 disabled:opacity-50 disabled:cursor-not-allowed transition-colors"
                 >
                   Select Flight
                 </button>
@@ -7,17 +7,12 @@ export default function FlightSearchPage() {
   const {
     searchParams: formData,
     updateSearchParams,
-    performSearch,
-    offers,
-    isLoading,
   } = useFlightSearch()
 
-  const handleSubmit = async (e) => {
+  // The results page streams the search, showing offers as each source returns them
+  const handleSubmit = (e) => {
     e.preventDefault()
-    const data = await performSearch()
-    if (data && data.offers) {
-      navigate('/results', { state: { offers: data.offers, searchParams: formData } })
-    }
+    navigate('/results', { state: { searchParams: formData } })
   }
 
   return (
@@ -96,10 +91,9 @@ export default function FlightSearchPage() {
 
           <button
             type="submit"
-            disabled={isLoading}
             className="w-full min-h-[44px] py-3 text-sm sm:text-base bg-primary-600 text-white rounded-lg hover:bg-primary-700 disabled:opacity-50 disabled:cursor-not-allowed font-semibold transition-colors"
           >
-            {isLoading ? 'Searching...' : 'Search Flights'}
+            Search Flights
           </button>
         </form>
       </div>
@@ -1,4 +1,4 @@
-import { useEffect } from 'react'
+import { useEffect, useState } from 'react'
 import { useParams, useNavigate, useLocation } from 'react-router-dom'
 import { useUserEmail, useBooking } from '../hooks'
 
@@ -9,6 +9,8 @@ export default function PaymentPage() {
   const { passengers, offer, foodPreference = false } = location.state || {}
   const [userEmail] = useUserEmail()
   const { createBooking, createBookingLoading: loading } = useBooking(userEmail)
+  // One key per visit: paying again after an error or timeout cannot book twice
+  const [idempotencyKey] = useState(() => crypto.randomUUID())
 
   useEffect(() => {
     if (!passengers || !offer) {
@@ -27,6 +29,7 @@ export default function PaymentPage() {
   const handlePayment = async () => {
     try {
       const booking = await createBooking({
+        idempotencyKey,
         offer_id: offerId,
         user_email: userEmail,
         passengers: passengers.map((p) => ({